@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Backfill decentralization_history from archived snapshots.
+
+Lists archived `top_validators-*.json`, `top_subnets-*.json` and
+`distribution-*.json` (plus optional `distribution_balances-*.bin` and
+`taostats_entry-*.json`) snapshots in R2 or a local directory, pairs them by
+UTC date and recomputes `calculate_composite_score` for each day in a process
+pool. The day's taostats entry supplies the circulating supply the wallet
+Nakamoto coefficient is measured against, as in the live job; days without
+one fall back to the sample sum, and each entry records the basis it used
+(`wallet_nakamoto_basis`).
+
+Results are merged into `decentralization_history` by date, so the job is
+idempotent: days whose entry already carries the current SCORE_VERSION are
+skipped, and a version bump in fetch_decentralization.py replays the whole
+window.
+
+Environment variables:
+  R2_ENDPOINT, R2_BUCKET, R2_ACCESS_KEY_ID, R2_SECRET_ACCESS_KEY, R2_PREFIX
+  CF_ACCOUNT_ID, CF_API_TOKEN, CF_KV_NAMESPACE_ID (or CF_METRICS_NAMESPACE_ID)
+  BACKFILL_DAYS       Days to replay (default: 365)
+  BACKFILL_WORKERS    Process pool size (default: CPU count)
+
+Usage:
+  python .github/scripts/backfill_decentralization_history.py [--from-dir DIR] [--days N] [--force] [--dry-run]
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+from bisect import bisect_right
+from datetime import datetime, timezone, timedelta
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from fetch_decentralization import (
+    SCORE_VERSION,
+    get_from_kv,
+    put_to_kv,
+    load_wallet_balances,
+    analyze_wallets,
+    circulating_supply_from,
+    analyze_validators,
+    analyze_subnets,
+    calculate_composite_score,
+    bootstrap_confidence_intervals,
+    build_history_entry,
+    merge_history_entries,
+)
+
+
+def _int_env(name, default):
+    v = os.getenv(name)
+    if v is None:
+        return default
+    v2 = v.strip()
+    if v2 == '':
+        return default
+    try:
+        return int(v2)
+    except Exception:
+        print(f"Warning: environment variable {name} is invalid ({v!r}), using default {default}", file=sys.stderr)
+        return default
+
+
+BACKFILL_DAYS = _int_env('BACKFILL_DAYS', 365)
+BACKFILL_WORKERS = _int_env('BACKFILL_WORKERS', os.cpu_count() or 2)
+
+# Archive file names written by the fetch workflows: <kind>-YYYYMMDDTHHMMSSZ.<ext>
+SNAPSHOT_RE = re.compile(
+    r'(?:^|/)(top_validators|top_subnets|distribution|distribution_balances|taostats_entry)-(\d{8})T(\d{6})Z\.(?:json|bin)$'
+)
+SNAPSHOT_KINDS = ('top_validators', 'top_subnets', 'distribution', 'distribution_balances', 'taostats_entry')
+REQUIRED_KINDS = ('top_validators', 'top_subnets', 'distribution')
+
+# How many days a snapshot may be carried forward (distribution runs weekly)
+MAX_STALENESS_DAYS = {
+    'top_validators': 1,
+    'top_subnets': 1,
+    'distribution': 8,
+    'distribution_balances': 8,
+    'taostats_entry': 1,
+}
+
+
+def list_dir_snapshots(directory: str) -> List[str]:
+    """List archived snapshot files in a local directory."""
+    return [os.path.join(directory, f) for f in sorted(os.listdir(directory)) if SNAPSHOT_RE.search(f)]
+
+
+def make_r2_client():
+    """Create an S3 client for the R2 archive bucket."""
+    try:
+        import boto3
+        from botocore.client import Config
+    except Exception as e:
+        print('boto3 is required to list R2 snapshots. Install with `pip install boto3`.', file=sys.stderr)
+        print('Error:', e, file=sys.stderr)
+        sys.exit(3)
+
+    missing = [n for n in ('R2_ENDPOINT', 'R2_BUCKET', 'R2_ACCESS_KEY_ID', 'R2_SECRET_ACCESS_KEY') if not os.getenv(n)]
+    if missing:
+        print(f"❌ Missing R2 environment variables: {', '.join(missing)}", file=sys.stderr)
+        sys.exit(2)
+
+    return boto3.client(
+        's3',
+        endpoint_url=os.getenv('R2_ENDPOINT'),
+        aws_access_key_id=os.getenv('R2_ACCESS_KEY_ID'),
+        aws_secret_access_key=os.getenv('R2_SECRET_ACCESS_KEY'),
+        config=Config(signature_version='s3v4', max_pool_connections=32)
+    )
+
+
+def list_r2_snapshots(s3, bucket: str, prefix: str) -> List[str]:
+    """List archived snapshot object keys in R2 (paginated)."""
+    keys = []
+    paginator = s3.get_paginator('list_objects_v2')
+    for kind in SNAPSHOT_KINDS:
+        full_prefix = f"{prefix}/{kind}-" if prefix else f"{kind}-"
+        for page in paginator.paginate(Bucket=bucket, Prefix=full_prefix):
+            for obj in page.get('Contents', []):
+                if SNAPSHOT_RE.search(obj['Key']):
+                    keys.append(obj['Key'])
+    return keys
+
+
+def latest_per_day(keys: List[str]) -> Dict[str, Dict[str, str]]:
+    """Group snapshot keys by kind and UTC date, keeping the last snapshot of each day."""
+    daily: Dict[str, Dict[str, Tuple[str, str]]] = {}
+    for key in keys:
+        m = SNAPSHOT_RE.search(key)
+        if not m:
+            continue
+        kind, ymd, hms = m.groups()
+        date = f"{ymd[:4]}-{ymd[4:6]}-{ymd[6:]}"
+        current = daily.setdefault(kind, {}).get(date)
+        if current is None or hms > current[0]:
+            daily[kind][date] = (hms, key)
+    return {kind: {d: v[1] for d, v in dates.items()} for kind, dates in daily.items()}
+
+
+def pair_by_date(daily: Dict[str, Dict[str, str]], start: str, end: str) -> List[Tuple[str, Dict[str, str]]]:
+    """
+    Pair snapshots for every date in [start, end].
+
+    Each kind uses the latest snapshot on or before the date, within its
+    MAX_STALENESS_DAYS. Days missing any required kind are skipped.
+    """
+    paired = []
+    sorted_dates = {kind: sorted(dates) for kind, dates in daily.items()}
+    day = datetime.strptime(start, "%Y-%m-%d")
+    last = datetime.strptime(end, "%Y-%m-%d")
+    while day <= last:
+        date = day.strftime("%Y-%m-%d")
+        inputs = {}
+        for kind, dates in sorted_dates.items():
+            candidate = _latest_on_or_before(dates, date)
+            if candidate is None:
+                continue
+            age = (day - datetime.strptime(candidate, "%Y-%m-%d")).days
+            if age <= MAX_STALENESS_DAYS.get(kind, 1):
+                inputs[kind] = daily[kind][candidate]
+        if all(k in inputs for k in REQUIRED_KINDS):
+            paired.append((date, inputs))
+        day += timedelta(days=1)
+    return paired
+
+
+def _latest_on_or_before(sorted_dates: List[str], date: str) -> Optional[str]:
+    i = bisect_right(sorted_dates, date)
+    return sorted_dates[i - 1] if i else None
+
+
+def score_day(task: Tuple[str, Dict[str, bytes]]) -> Dict:
+    """Recompute the decentralization history entry for one day (runs in a worker process)."""
+    date, blobs = task
+    distribution = json.loads(blobs['distribution'])
+    validators = json.loads(blobs['top_validators'])
+    subnets = json.loads(blobs['top_subnets'])
+    balances = load_wallet_balances(distribution, blobs.get('distribution_balances'))
+
+    latest = json.loads(blobs['taostats_entry']) if blobs.get('taostats_entry') else None
+
+    wallet_analysis = analyze_wallets(distribution, balances, circulating_supply_from(latest))
+    validator_analysis = analyze_validators(validators)
+    subnet_analysis = analyze_subnets(subnets)
+    composite = calculate_composite_score(wallet_analysis, validator_analysis, subnet_analysis)
+    bootstrap = bootstrap_confidence_intervals(validators, subnets, wallet_analysis.get("wallet_score", 50))
+    if bootstrap.get("resamples"):
+        composite["confidence_interval"] = bootstrap["composite_score"]
+    return build_history_entry(date, composite, wallet_analysis, validator_analysis, subnet_analysis)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill decentralization_history from archived snapshots")
+    parser.add_argument('--from-dir', help="Read snapshots from a local directory instead of R2")
+    parser.add_argument('--days', type=int, default=BACKFILL_DAYS, help="Days to replay (default: %(default)s)")
+    parser.add_argument('--workers', type=int, default=BACKFILL_WORKERS, help="Process pool size (default: %(default)s)")
+    parser.add_argument('--force', action='store_true', help="Recompute days already at the current SCORE_VERSION")
+    parser.add_argument('--dry-run', action='store_true', help="Print merged history instead of writing to KV")
+    args = parser.parse_args()
+
+    print("🔁 Decentralization History Backfill", file=sys.stderr)
+    print("=" * 55, file=sys.stderr)
+    t_start = time.perf_counter()
+
+    cf_acc = os.getenv('CF_ACCOUNT_ID')
+    cf_token = os.getenv('CF_API_TOKEN')
+    cf_ns = os.getenv('CF_KV_NAMESPACE_ID') or os.getenv('CF_METRICS_NAMESPACE_ID')
+    have_kv = all([cf_acc, cf_token, cf_ns])
+    if not have_kv and not args.dry_run:
+        print("❌ Missing Cloudflare KV credentials (use --dry-run to skip the KV write)", file=sys.stderr)
+        sys.exit(1)
+
+    # 1) List archived snapshots
+    if args.from_dir:
+        keys = list_dir_snapshots(args.from_dir)
+
+        def read(key: str) -> bytes:
+            with open(key, 'rb') as f:
+                return f.read()
+    else:
+        s3 = make_r2_client()
+        bucket = os.getenv('R2_BUCKET')
+        prefix = os.getenv('R2_PREFIX', '').strip().strip('/')
+        keys = list_r2_snapshots(s3, bucket, prefix)
+
+        def read(key: str) -> bytes:
+            return s3.get_object(Bucket=bucket, Key=key)['Body'].read()
+
+    daily = latest_per_day(keys)
+    print(f"📂 {len(keys)} snapshots: " + ", ".join(f"{k}={len(v)} days" for k, v in sorted(daily.items())), file=sys.stderr)
+
+    # 2) Pair by date and drop days already at the current score version
+    end = datetime.now(timezone.utc).date()
+    start = end - timedelta(days=args.days - 1)
+    paired = pair_by_date(daily, start.isoformat(), end.isoformat())
+
+    history = (get_from_kv(cf_acc, cf_token, cf_ns, 'decentralization_history') if have_kv else None) or {"entries": []}
+    entries = history.get("entries", [])
+    current = {e.get("date") for e in entries if e.get("version") == SCORE_VERSION}
+    todo = [(d, inputs) for d, inputs in paired if args.force or d not in current]
+    print(f"📅 {len(paired)} days with complete inputs, {len(todo)} to recompute (score v{SCORE_VERSION})", file=sys.stderr)
+
+    if not todo:
+        print("✅ History already up to date", file=sys.stderr)
+        return
+
+    # 3) Download each needed snapshot once (I/O bound -> threads)
+    needed = sorted({key for _, inputs in todo for key in inputs.values()})
+    t_dl = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        blobs = dict(zip(needed, pool.map(read, needed)))
+    print(f"⬇️  Loaded {len(needed)} snapshots in {time.perf_counter() - t_dl:.1f}s", file=sys.stderr)
+
+    # 4) Recompute scores (CPU bound -> processes)
+    tasks = [(d, {kind: blobs[key] for kind, key in inputs.items()}) for d, inputs in todo]
+    t_cpu = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        new_entries = list(pool.map(score_day, tasks, chunksize=max(1, len(tasks) // (4 * max(1, args.workers)))))
+    print(f"🧮 Recomputed {len(new_entries)} days in {time.perf_counter() - t_cpu:.2f}s ({args.workers} workers)", file=sys.stderr)
+
+    # 5) Merge by date (idempotent) and store
+    merged = merge_history_entries(entries, new_entries)
+    history_data = {
+        "entries": merged,
+        "last_updated": datetime.now(timezone.utc).isoformat(),
+        "_source": "decentralization_calculator"
+    }
+
+    if args.dry_run:
+        print(json.dumps(history_data, indent=2))
+    else:
+        put_to_kv(cf_acc, cf_token, cf_ns, 'decentralization_history', json.dumps(history_data).encode('utf-8'))
+
+    print(f"✅ History: {len(merged)} entries (backfill took {time.perf_counter() - t_start:.1f}s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -110,7 +110,8 @@ else:
         print('Error:', e)
         sys.exit(3)
 
-    url = f"https://api.cloudflare.com/client/v4/accounts/{CF_ACCOUNT_ID}/r2/buckets/{R2_BUCKET}/objects/{key_name}"
+    api_base = (os.environ.get('CF_API_BASE') or 'https://api.cloudflare.com/client/v4').rstrip('/')
+    url = f"{api_base}/accounts/{CF_ACCOUNT_ID}/r2/buckets/{R2_BUCKET}/objects/{key_name}"
     headers = {
         'Authorization': f'Bearer {CF_API_TOKEN}',
         'Content-Type': 'application/octet-stream'
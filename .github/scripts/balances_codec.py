@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Compact binary codec for sorted wallet balance lists.
+
+Used by fetch_distribution.py to publish the sampled balances to KV
+(`distribution_balances`) and by fetch_decentralization.py to compute exact
+wallet-level Gini / Nakamoto / HHI without another Taostats crawl.
+
+Format (taob-v1, little endian):
+    magic     4 bytes  b'TAOB'
+    version   u8       1
+    decimals  u8       quantization (balance * 10**decimals, rounded)
+    count     u32      number of balances
+    body      varint   first balance, then the gaps to each next (descending) balance
+
+Descending order keeps every gap non-negative, and gaps in the long tail are
+tiny, so most balances cost 1-2 bytes instead of 8 (float64) or ~10 (JSON).
+
+Usage:
+    python .github/scripts/balances_codec.py [count]   # size / decode-time benchmark
+"""
+
+import sys
+import json
+import time
+import struct
+import hashlib
+from typing import Dict, Optional
+
+import numpy as np
+
+MAGIC = b'TAOB'
+VERSION = 1
+FORMAT = 'taob-v1'
+HEADER = struct.Struct('<4sBBI')
+DEFAULT_DECIMALS = 3  # 0.001 TAO resolution
+
+# Ranks at which the sketch records balance and cumulative share
+SKETCH_RANKS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000,
+                10000, 20000, 50000, 100000, 200000, 500000, 1000000]
+
+_MAX_VARINT_BYTES = 10  # 64-bit values need at most 10 groups of 7 bits
+
+
+def _encode_varints(values: np.ndarray) -> bytes:
+    """LEB128-encode an array of non-negative int64 values (vectorized)."""
+    v = values.astype(np.uint64)
+    groups = np.empty((v.size, _MAX_VARINT_BYTES), dtype=np.uint8)
+    for k in range(_MAX_VARINT_BYTES):
+        groups[:, k] = (v >> np.uint64(7 * k)) & np.uint64(0x7F)
+    # Number of 7-bit groups per value: up to the last non-zero group (at least 1)
+    nonzero = groups != 0
+    last = _MAX_VARINT_BYTES - 1 - np.argmax(nonzero[:, ::-1], axis=1)
+    lengths = np.where(nonzero.any(axis=1), last + 1, 1)
+    col = np.arange(_MAX_VARINT_BYTES)
+    keep = col[None, :] < lengths[:, None]
+    cont = col[None, :] < (lengths[:, None] - 1)
+    groups = groups | (cont.astype(np.uint8) << np.uint8(7))
+    return groups[keep].tobytes()
+
+
+def _decode_varints(buf: bytes, count: int) -> np.ndarray:
+    """Decode `count` LEB128 varints from buf (vectorized)."""
+    if count == 0:
+        return np.zeros(0, dtype=np.int64)
+    b = np.frombuffer(buf, dtype=np.uint8)
+    ends = np.flatnonzero((b & 0x80) == 0)
+    if ends.size < count:
+        raise ValueError(f"Truncated balances artifact: {ends.size}/{count} values")
+    ends = ends[:count]
+    b = b[:ends[-1] + 1]
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    # Position of each byte inside its varint
+    group_id = np.repeat(np.arange(count), ends - starts + 1)
+    pos = np.arange(b.size) - starts[group_id]
+    contrib = (b & 0x7F).astype(np.uint64) << (7 * pos).astype(np.uint64)
+    return np.add.reduceat(contrib, starts).astype(np.int64)
+
+
+def encode_balances(balances, decimals: int = DEFAULT_DECIMALS) -> bytes:
+    """Quantize, sort descending and delta/varint-encode a list of TAO balances."""
+    arr = np.asarray(balances, dtype=np.float64).ravel()
+    q = np.rint(arr * (10 ** decimals)).astype(np.int64)
+    q = np.sort(q[q > 0])[::-1]
+    if q.size:
+        gaps = np.empty_like(q)
+        gaps[0] = q[0]
+        gaps[1:] = q[:-1] - q[1:]
+        body = _encode_varints(gaps)
+    else:
+        body = b''
+    return HEADER.pack(MAGIC, VERSION, decimals, int(q.size)) + body
+
+
+def decode_balances(blob: bytes) -> np.ndarray:
+    """Decode a taob-v1 artifact into a descending float64 array of TAO balances."""
+    if len(blob) < HEADER.size:
+        raise ValueError("Balances artifact too short")
+    magic, version, decimals, count = HEADER.unpack_from(blob)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"Unsupported balances artifact ({magic!r} v{version})")
+    gaps = _decode_varints(blob[HEADER.size:], count)
+    if count == 0:
+        return np.zeros(0, dtype=np.float64)
+    q = gaps[0] - np.cumsum(np.concatenate(([0], gaps[1:])))
+    return q.astype(np.float64) / (10 ** decimals)
+
+
+def build_sketch(blob: bytes, balances: Optional[np.ndarray] = None) -> Dict:
+    """
+    Small JSON summary stored next to the artifact in the `distribution` payload.
+
+    Lets readers verify the artifact (sha256/count) and approximate the
+    top-holder curve (balance + cumulative share at log-spaced ranks) without
+    decoding it.
+    """
+    if balances is None:
+        balances = decode_balances(blob)
+    _, _, decimals, count = HEADER.unpack_from(blob)
+    total = float(balances.sum()) if count else 0.0
+    cumsum = np.cumsum(balances) if count else balances
+    curve = []
+    for rank in SKETCH_RANKS:
+        if rank > count:
+            break
+        curve.append([rank, round(float(balances[rank - 1]), 3),
+                      round(float(cumsum[rank - 1]) / total, 4) if total > 0 else 0.0])
+    return {
+        "format": FORMAT,
+        "bytes": len(blob),
+        "count": int(count),
+        "decimals": int(decimals),
+        "sum": round(total, 3),
+        "sha256": hashlib.sha256(blob).hexdigest(),
+        "top_curve": curve,
+    }
+
+
+def benchmark(count: int = 20000, repeats: int = 5) -> Dict:
+    """Compare artifact size and encode/decode time against float64 and JSON."""
+    rng = np.random.default_rng(42)
+    # Pareto-like tail resembling TAO balances (0.1 TAO .. ~1M TAO)
+    balances = np.sort(0.1 * (rng.pareto(0.9, count) + 1))[::-1]
+    balances = np.minimum(balances, 1_500_000.0)
+
+    encode_s = min(_timed(lambda: encode_balances(balances)) for _ in range(repeats))
+    blob = encode_balances(balances)
+    decode_s = min(_timed(lambda: decode_balances(blob)) for _ in range(repeats))
+    json_blob = json.dumps([round(float(b), 3) for b in balances]).encode('utf-8')
+    json_s = min(_timed(lambda: json.loads(json_blob)) for _ in range(repeats))
+
+    decoded = decode_balances(blob)
+    max_err = float(np.max(np.abs(decoded - np.rint(balances * 10 ** DEFAULT_DECIMALS) / 10 ** DEFAULT_DECIMALS))) if count else 0.0
+    return {
+        "count": count,
+        "artifact_bytes": len(blob),
+        "bytes_per_balance": round(len(blob) / max(count, 1), 3),
+        "float64_bytes": int(balances.nbytes),
+        "json_bytes": len(json_blob),
+        "encode_ms": round(encode_s * 1000, 2),
+        "decode_ms": round(decode_s * 1000, 2),
+        "json_decode_ms": round(json_s * 1000, 2),
+        "max_abs_error_tao": max_err,
+    }
+
+
+def _timed(fn) -> float:
+    t0 = time.perf_counter()
+    fn()
+    return time.perf_counter() - t0
+
+
+if __name__ == "__main__":
+    sizes = [int(a) for a in sys.argv[1:]] or [20000, 200000, 2000000]
+    for n in sizes:
+        print(json.dumps(benchmark(n)))
@@ -0,0 +1,750 @@
+#!/usr/bin/env python3
+"""
+Long-running collector: every fetcher on its schedule in one warm process.
+
+Each GitHub workflow cold-starts Python, reinstalls dependencies, imports
+bittensor and reconnects to the chain for a few seconds of work. The
+collector runs the same scripts as scheduled tasks inside one process
+instead, so that is paid once:
+
+  * scripts run in-process (runpy, as `__main__`), so sibling modules,
+    bittensor and the pooled HTTP/KV sessions (http_client.py,
+    kv_client.py) stay imported and warm, and all Taostats calls share one
+    token bucket and monthly budget
+  * `bittensor.Subtensor(...)` is shared per worker thread and network, so
+    the substrate websocket stays open between runs (it is dropped and
+    reopened after a failed run)
+  * every task keeps its workflow's cron cadence (interval + offset, UTC
+    aligned) plus up to COLLECTOR_JITTER_SECONDS of random delay, runs on a
+    small worker pool and never overlaps itself
+  * the workflow's publishing steps (KV uploads of stdout/files, Worker
+    POSTs with direct-KV fallback, per-run R2 archives) are steps of the
+    task, so a task publishes exactly what its workflow did
+  * derived stages (pipeline.py) also run right after a task publishing
+    one of their trigger inputs (pipeline.TRIGGERS) succeeds, and any stage
+    run whose input hashes match its last successful run is skipped
+  * per-task timing and last-success status go to COLLECTOR_STATUS_FILE
+    after every run, and to GET /status when a status port is set
+
+The scripts stay plain one-shot CLIs; the workflows keep working and skip
+their scheduled runs when the repository variable COLLECTOR_DAEMON is
+`true` (manual dispatch always runs). The R2 backup workflows are not
+covered and keep running on their own schedule.
+
+The collector needs the union of the workflows' secrets in its
+environment (CF_*, TAOSTATS_API_KEY, CMC_API_TOKEN, R2_*, CF_WORKER_*).
+
+Usage:
+  python .github/scripts/collector.py run [--only a,b] [--now] [--status-port 8790]
+  python .github/scripts/collector.py once TASK [TASK ...]   # run now, in order
+  python .github/scripts/collector.py list                   # cadence and next run per task
+
+Environment variables:
+  COLLECTOR_WORKERS         Tasks running at the same time (default: 4)
+  COLLECTOR_JITTER_SECONDS  Max random delay per run, capped at 10% of the interval (default: 20)
+  COLLECTOR_STATUS_FILE     Status JSON (default: .github/data/collector_status.json)
+  COLLECTOR_STATUS_PORT     Serve the status JSON on this port (default: 0 = off)
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import runpy
+import random
+import shutil
+import signal
+import argparse
+import threading
+import subprocess
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(os.path.dirname(SCRIPTS_DIR))
+if SCRIPTS_DIR not in sys.path:
+    sys.path.insert(0, SCRIPTS_DIR)
+
+import http_client  # noqa: E402
+from kv_client import get_client as get_kv_client  # noqa: E402
+from pipeline import STAGES, PipelineState, dependents, input_hashes  # noqa: E402
+from rate_limiter import TAOSTATS_HOST, budget  # noqa: E402
+
+
+def _int_env(name, default):
+    v = os.getenv(name)
+    if v is None:
+        return default
+    v2 = v.strip()
+    if v2 == '':
+        return default
+    try:
+        return int(v2)
+    except Exception:
+        print(f"Warning: environment variable {name} is invalid ({v!r}), using default {default}", file=sys.stderr)
+        return default
+
+
+COLLECTOR_WORKERS = _int_env('COLLECTOR_WORKERS', 4)
+COLLECTOR_JITTER_SECONDS = _int_env('COLLECTOR_JITTER_SECONDS', 20)
+COLLECTOR_STATUS_FILE = os.getenv('COLLECTOR_STATUS_FILE', os.path.join('.github', 'data', 'collector_status.json'))
+COLLECTOR_STATUS_PORT = _int_env('COLLECTOR_STATUS_PORT', 0)
+R2_ARCHIVE_DAYS_FILE = os.path.join('.github', 'data', 'r2_archive_days.json')
+MINUTE, HOUR, DAY = 60, 3600, 86400
+
+# Per-step env the workflows set inline; identical for every task, so set once
+WORKFLOW_ENV_DEFAULTS = {
+    'MAX_HISTORY_ENTRIES': '672',
+    'FORCE_ISSUANCE_ON_KV_FAIL': '0',
+    'NETWORK': 'finney',
+}
+
+
+class StepFailed(Exception):
+    pass
+
+
+# === In-process script execution ===
+
+class _StdoutRouter(io.TextIOBase):
+    """sys.stdout replacement: threads running a script write to their own buffer."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    def _target(self):
+        return getattr(self.local, 'buffer', None) or self.stream
+
+    def capture(self, buffer: Optional[io.StringIO]):
+        self.local.buffer = buffer
+
+    def write(self, s):
+        return self._target().write(s)
+
+    def flush(self):
+        self._target().flush()
+
+    def isatty(self):
+        return False
+
+    @property
+    def encoding(self):
+        return getattr(self.stream, 'encoding', 'utf-8')
+
+
+_stdout = _StdoutRouter(sys.stdout)
+
+
+def run_script(name: str) -> (int, str):
+    """Run a script as `__main__` in this process; (exit code, captured stdout)."""
+    path = os.path.join(SCRIPTS_DIR, name)
+    buffer = io.StringIO()
+    _stdout.capture(buffer)
+    sys.argv = [path]  # scripts run without arguments, so concurrent runs agree on argv
+    try:
+        runpy.run_path(path, run_name='__main__')
+        code = 0
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            code = e.code or 0
+        else:
+            print(e.code, file=sys.stderr)
+            code = 1
+    finally:
+        _stdout.capture(None)
+    return code, buffer.getvalue()
+
+
+_subtensors = threading.local()
+
+
+def share_subtensor():
+    """Make bittensor.Subtensor(...) return one connection per worker thread and arguments."""
+    try:
+        import bittensor as bt
+    except ImportError:
+        print("⚠️ bittensor not installed; chain tasks will fall back as in CI", file=sys.stderr)
+        return
+    if getattr(bt.Subtensor, '_collector_shared', False):
+        return
+    original = bt.Subtensor
+
+    def shared(*args, **kwargs):
+        cache = getattr(_subtensors, 'cache', None)
+        if cache is None:
+            cache = _subtensors.cache = {}
+        key = repr((args, sorted(kwargs.items())))
+        if key not in cache:
+            cache[key] = original(*args, **kwargs)
+        return cache[key]
+
+    shared._collector_shared = True
+    bt.Subtensor = shared
+
+
+def drop_subtensors():
+    """Close this thread's shared connections (after a failed run) so the next run reconnects."""
+    for subtensor in (getattr(_subtensors, 'cache', None) or {}).values():
+        try:
+            subtensor.close()
+        except Exception:
+            pass
+    _subtensors.cache = {}
+
+
+# === Steps (one per workflow step) ===
+
+def _fresh_file(ctx: Dict, path: str) -> Optional[str]:
+    """`path` if this run wrote it (files from earlier runs are never re-published)."""
+    try:
+        return path if os.path.getmtime(path) >= ctx['started'] - 1 else None
+    except OSError:
+        return None
+
+
+def _stdout_payload(text: str) -> Optional[str]:
+    """The JSON a script printed: the whole stdout, else its last JSON line."""
+    text = text.strip()
+    for candidate in [text] + text.splitlines()[::-1]:
+        try:
+            json.loads(candidate)
+            return candidate
+        except ValueError:
+            continue
+    return None
+
+
+def py(script: str, publishes_stdout: bool = False) -> Callable:
+    """Run a script; its stdout feeds the next steps, or is logged when it is only progress output."""
+    def step(ctx):
+        code, out = run_script(script)
+        ctx['stdout'] = out
+        if out and not publishes_stdout:
+            sys.stderr.write(out)
+        if code != 0:
+            raise StepFailed(f"exited {code}")
+    step.label = script
+    return step
+
+
+def sh(script: str) -> Callable:
+    def step(ctx):
+        sys.stdout.flush()
+        code = subprocess.run(['bash', os.path.join(SCRIPTS_DIR, script)], cwd=REPO_ROOT).returncode
+        if code != 0:
+            raise StepFailed(f"exited {code}")
+    step.label = script
+    return step
+
+
+def kv(key: str, source: str = 'stdout', optional: bool = False, require: Optional[str] = None,
+       content_type: str = 'application/json') -> Callable:
+    """PUT the previous step's stdout JSON (or a file this run wrote) to KV `key`."""
+    def step(ctx):
+        data = None
+        if source == 'stdout':
+            payload = _stdout_payload(ctx.get('stdout') or '')
+            if payload is not None and (not require or require in (json.loads(payload) or {})):
+                data = payload.encode('utf-8')
+        elif _fresh_file(ctx, source):
+            with open(source, 'rb') as f:
+                data = f.read()
+        if data is None:
+            if optional:
+                print(f"⏭️ {key}: nothing new to publish", file=sys.stderr)
+                return
+            raise StepFailed(f"no {source} output to publish as {key}")
+        client = get_kv_client()
+        if client is None or not client.put_bytes(key, data, content_type=content_type):
+            raise StepFailed(f"KV write of {key} failed")
+    step.label = f"kv:{key}"
+    return step
+
+
+def call(fn: Callable) -> Callable:
+    def step(ctx):
+        fn(ctx)
+    step.label = fn.__name__
+    return step
+
+
+def _archived_days() -> Dict[str, str]:
+    try:
+        with open(R2_ARCHIVE_DAYS_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def archive(source: str, prefix: str, optional: bool = False, daily: bool = False) -> Callable:
+    """
+    R2 archive (ENABLE_R2=true): copy to <prefix>-<UTC timestamp>, upload, remove.
+
+    `daily` archives only the first successful run of each UTC day (the
+    day is remembered in R2_ARCHIVE_DAYS_FILE), like the workflows do.
+    """
+    def step(ctx):
+        if os.getenv('ENABLE_R2', 'false').lower() != 'true':
+            return
+        now = datetime.now(timezone.utc)
+        ts = now.strftime('%Y%m%dT%H%M%SZ')
+        if daily and _archived_days().get(prefix) == now.strftime('%Y%m%d'):
+            return
+        if source == 'stdout':
+            payload = _stdout_payload(ctx.get('stdout') or '')
+            if payload is None:
+                raise StepFailed(f"no stdout to archive as {prefix}")
+            name = f"{prefix}-{ts}.json"
+            with open(name, 'w') as f:
+                f.write(payload)
+        else:
+            if not _fresh_file(ctx, source):
+                if optional:
+                    return
+                raise StepFailed(f"{source} missing; nothing to archive")
+            name = f"{prefix}-{ts}{os.path.splitext(source)[1]}"
+            shutil.copyfile(source, name)
+        try:
+            sys.stdout.flush()
+            code = subprocess.run([sys.executable, os.path.join(SCRIPTS_DIR, 'backup-issuance-history-r2.py'), name],
+                                  cwd=REPO_ROOT).returncode
+        finally:
+            os.remove(name)
+        if code != 0:
+            raise StepFailed(f"R2 archive of {name} exited {code}")
+        if daily:
+            days = _archived_days()
+            days[prefix] = now.strftime('%Y%m%d')
+            os.makedirs(os.path.dirname(R2_ARCHIVE_DAYS_FILE) or '.', exist_ok=True)
+            with open(R2_ARCHIVE_DAYS_FILE, 'w') as f:
+                json.dump(days, f, indent=2)
+    step.label = f"r2:{prefix}"
+    return step
+
+
+def worker(path: Optional[str], source: str, fallback: List[Callable], gate: Optional[str] = None) -> Callable:
+    """
+    POST a file to the Worker (CF_WORKER_URL, or its origin + path); run `fallback` if that fails.
+
+    With `gate`, a failed Worker POST only falls back when that env var is
+    'true' (the fallback would race the Worker's own writes); without a
+    Worker URL the fallback always runs, as in the workflows.
+    """
+    def step(ctx):
+        if not _fresh_file(ctx, source):
+            print(f"⏭️ No fresh {source}; skipping", file=sys.stderr)
+            return
+        base = os.getenv('CF_WORKER_URL', '').strip()
+        if base:
+            parts = urlsplit(base)
+            if path is None and 'bittensor-ath-atl' in (parts.hostname or ''):
+                raise StepFailed("CF_WORKER_URL points to worker 'bittensor-ath-atl', which is unrelated")
+            url = base if path is None else f"{parts.scheme}://{parts.netloc}{path}"
+            headers = {'Content-Type': 'application/json'}
+            if os.getenv('CF_WORKER_WRITE_TOKEN'):
+                headers['X-WRITE-TOKEN'] = os.environ['CF_WORKER_WRITE_TOKEN']
+            with open(source, 'rb') as f:
+                body = f.read()
+            try:
+                resp = http_client.request('POST', url, data=body, headers=headers, retries=0)
+                if resp.status_code == 200:
+                    return
+                print(f"⚠️ Worker POST {url} returned {resp.status_code}", file=sys.stderr)
+            except Exception as e:
+                print(f"⚠️ Worker POST {url} failed ({e})", file=sys.stderr)
+            if gate and os.getenv(gate, 'false').lower() != 'true':
+                raise StepFailed(f"Worker POST failed; set {gate}=true to allow the direct KV write")
+            print("↪️ Using direct KV write", file=sys.stderr)
+        for fb in fallback:
+            fb(ctx)
+    step.label = f"worker:{path or source}"
+    return step
+
+
+def append_taostats_history(ctx):
+    """`taostats_history_store.py append taostats_latest.json`, in-process."""
+    from taostats_history_store import _as_list, _kv_config, append_entries, history_entry
+    cfg = _kv_config()
+    if cfg is None:
+        raise StepFailed("CF credentials missing for the taostats history append")
+    with open('taostats_latest.json') as f:
+        payload = json.load(f)
+    if append_entries(cfg, [history_entry(p) for p in _as_list(payload)]) is None:
+        raise StepFailed("taostats history append failed")
+
+
+def publish_ath_atl(ctx):
+    """Write tao_ath_atl.json to KV unless the stored entry is newer (compare_timestamps.py semantics)."""
+    if not _fresh_file(ctx, 'tao_ath_atl.json'):
+        raise StepFailed("tao_ath_atl.json was not written")
+    with open('tao_ath_atl.json', 'rb') as f:
+        data = f.read()
+    client = get_kv_client()
+    if client is None:
+        raise StepFailed("CF credentials missing")
+
+    def parse(value):
+        try:
+            return datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+        except ValueError:
+            return None
+
+    new = parse(json.loads(data).get('updated'))
+    existing = client.get_json('tao_ath_atl')
+    current = parse(existing.get('updated')) if isinstance(existing, dict) else None
+    if new and current:
+        try:
+            if new <= current:
+                print(f"⏭️ tao_ath_atl: stored entry is newer or equal ({current.isoformat()})", file=sys.stderr)
+                return
+        except TypeError:
+            pass  # naive vs aware: write, as the workflow does on parse errors
+    if not client.put_bytes('tao_ath_atl', data):
+        raise StepFailed("KV write of tao_ath_atl failed")
+
+
+def fold_http_budget(ctx):
+    """`rate_limiter.py fold`: this process's budget is the one that folds, so its view stays current."""
+    if budget().fold() is None:
+        raise StepFailed("request budget fold failed")
+
+
+# === Tasks ===
+
+class Task:
+    """One workflow: its steps and cron cadence (`interval` seconds, starting `offset` after UTC midnight)."""
+
+    def __init__(self, name: str, interval: int, offset: int, steps: List[Callable], workflow: str):
+        self.name = name
+        self.interval = interval
+        self.offset = offset
+        self.steps = steps
+        self.workflow = workflow
+        self.running = False
+        self.rerun = False
+        self.next_run: Optional[float] = None
+        self.stats = {"runs": 0, "ok": 0, "failed": 0, "skipped_overlap": 0, "skipped_unchanged": 0, "last_start": None,
+                      "last_duration_ms": None, "avg_duration_ms": None, "last_success": None,
+                      "last_error": None, "consecutive_failures": 0}
+        self._total_ms = 0.0
+
+    def slot_after(self, now: float) -> float:
+        """First cadence slot at or after `now`."""
+        k = -(-(now - self.offset) // self.interval)
+        return self.offset + k * self.interval
+
+    def schedule(self, now: float, jitter: float = COLLECTOR_JITTER_SECONDS):
+        slot = self.slot_after(now + 1)
+        self.next_run = slot + random.uniform(0, min(jitter, self.interval * 0.1))
+
+    def run(self) -> bool:
+        ctx = {'started': time.time(), 'stdout': ''}
+        t0 = time.perf_counter()
+        self.stats["last_start"] = datetime.now(timezone.utc).isoformat()
+        print(f"▶️ {self.name}", file=sys.stderr)
+        error = None
+        try:
+            for step in self.steps:
+                step(ctx)
+        except Exception as e:
+            error = f"{getattr(step, 'label', '?')}: {e}"
+        ms = (time.perf_counter() - t0) * 1000
+        self._total_ms += ms
+        s = self.stats
+        s["runs"] += 1
+        s["last_duration_ms"] = round(ms)
+        s["avg_duration_ms"] = round(self._total_ms / s["runs"])
+        if error is None:
+            s["ok"] += 1
+            s["last_success"] = datetime.now(timezone.utc).isoformat()
+            s["consecutive_failures"] = 0
+            print(f"✅ {self.name} in {ms / 1000:.1f}s", file=sys.stderr)
+        else:
+            s["failed"] += 1
+            s["last_error"] = error
+            s["consecutive_failures"] += 1
+            drop_subtensors()
+            print(f"❌ {self.name} failed after {ms / 1000:.1f}s: {error}", file=sys.stderr)
+        return error is None
+
+
+def every(minutes: int = 0, hours: int = 0, days: int = 0):
+    return minutes * MINUTE + hours * HOUR + days * DAY
+
+
+# Cadences mirror the workflow crons (offsets are from 00:00 UTC; 1970-01-01 was a Thursday)
+TASKS = [
+    Task('taostats', every(minutes=5), 0, [
+        py('fetch_taostats.py'),
+        kv('taostats_latest', 'taostats_latest.json'),
+        worker(None, 'taostats_latest.json', [call(append_taostats_history)], gate='ALLOW_KV_PUT_FALLBACK'),
+        archive('taostats_latest.json', 'taostats_entry'),
+    ], 'publish-taostats.yml'),
+    Task('network', every(minutes=5), 2 * MINUTE, [
+        py('fetch_network.py'),
+        sh('push_network_metrics.sh'),
+        sh('push_issuance_history.sh'),
+        worker('/api/network-history', 'network_latest.json', [
+            py('merge-network-history.py'),
+            kv('network_history', '/tmp/network_history_merged.json'),
+        ]),
+    ], 'publish-network.yml'),
+    Task('taostats_aggregates', every(minutes=5), 4 * MINUTE,
+         [py('compute_taostats_aggregates.py')], 'compute-taostats-aggregates.yml'),
+    Task('dex', every(minutes=15), 0, [py('fetch_dex.py')], 'fetch-dex.yml'),
+    Task('downsample_series', every(minutes=30), 11 * MINUTE,
+         [py('downsample_series.py')], 'downsample-series.yml'),
+    Task('top_history', every(minutes=30), 19 * MINUTE,
+         [py('publish_top_history.py')], 'publish-top-history.yml'),
+    Task('price_history', every(hours=1), 7 * MINUTE, [
+        py('fetch_price_history.py', publishes_stdout=True),
+        kv('price_history'),
+    ], 'fetch-price-history.yml'),
+    Task('block_time', every(hours=1), 12 * MINUTE, [
+        py('fetch_block_time.py', publishes_stdout=True),
+        kv('block_time', optional=True, require='avg_block_time'),
+    ], 'fetch-block-time.yml'),
+    Task('top_validators', every(hours=1), 31 * MINUTE, [
+        py('validator_snapshot.py'),
+        archive('.github/data/top_validators.json', 'top_validators', optional=True, daily=True),
+    ], 'fetch-top-validators.yml'),
+    Task('top_wallets', every(hours=1), 37 * MINUTE, [
+        py('fetch_top_wallets.py', publishes_stdout=True),
+        kv('top_wallets'),
+        kv('top_wallets_index', 'top_wallets_index.json', optional=True),
+    ], 'fetch-top-wallets.yml'),
+    Task('top_subnets', every(hours=1), 53 * MINUTE, [
+        py('clear_kv.py'),
+        py('fetch_top_subnets.py'),
+        archive('.github/data/top_subnets.json', 'top_subnets', optional=True, daily=True),
+    ], 'fetch-top-subnets.yml'),
+    Task('ath_atl', every(hours=3), 14 * MINUTE, [
+        py('fetch_ath_atl.py'),
+        call(publish_ath_atl),
+    ], 'publish-ath-athl.yml'),
+    Task('cmc', every(hours=6), 15 * MINUTE, [py('fetch_cmc.py')], 'fetch-cmc.yml'),
+    Task('fear_and_greed', every(hours=12), 6 * HOUR + 15 * MINUTE,
+         [py('fetch_fear_and_greed_index.py')], 'fetch-fear-greed-index.yml'),
+    Task('decentralization', every(days=1), 4 * HOUR,
+         [py('fetch_decentralization.py')], 'fetch-decentralization.yml'),
+    Task('http_budget', every(hours=1), 58 * MINUTE, [call(fold_http_budget)], 'fold-http-budget.yml'),
+    Task('distribution', every(days=7), 3 * DAY + 3 * HOUR, [
+        py('fetch_distribution.py', publishes_stdout=True),
+        kv('distribution'),
+        kv('distribution_balances', 'distribution_balances.bin', optional=True,
+           content_type='application/octet-stream'),
+        archive('stdout', 'distribution'),
+        archive('distribution_balances.bin', 'distribution_balances', optional=True),
+    ], 'fetch-distribution.yml'),
+]
+
+
+# === Daemon ===
+
+class Collector:
+    def __init__(self, tasks: List[Task], workers: int = COLLECTOR_WORKERS,
+                 status_file: Optional[str] = COLLECTOR_STATUS_FILE):
+        self.tasks = {t.name: t for t in tasks}
+        self.workers = max(1, workers)
+        self.status_file = status_file
+        self.started = time.time()
+        self.stop = threading.Event()
+        self.lock = threading.Lock()
+        self.pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='collector')
+        self.pipeline = PipelineState()
+
+    def status(self) -> Dict:
+        with self.lock:
+            tasks = {name: {**t.stats, "interval_s": t.interval, "running": t.running,
+                            "next_run": datetime.fromtimestamp(t.next_run, timezone.utc).isoformat()
+                            if t.next_run else None}
+                     for name, t in self.tasks.items()}
+        return {
+            "started_at": datetime.fromtimestamp(self.started, timezone.utc).isoformat(),
+            "uptime_s": round(time.time() - self.started),
+            "tasks": tasks,
+            "http": http_client.summary(),
+            "taostats_budget_remaining": budget().remaining(TAOSTATS_HOST),
+            "_timestamp": datetime.now(timezone.utc).isoformat(),
+        }
+
+    def write_status(self):
+        if not self.status_file:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.status_file) or '.', exist_ok=True)
+            with open(self.status_file + '.tmp', 'w') as f:
+                json.dump(self.status(), f, indent=2)
+            os.replace(self.status_file + '.tmp', self.status_file)
+        except OSError as e:
+            print(f"⚠️ Failed to write collector status: {e}", file=sys.stderr)
+
+    def submit(self, task: Task, force: bool = False, queue: bool = False) -> Optional[Future]:
+        """Start `task` on the pool. If it is running, rerun it afterwards (`queue`) or skip (None)."""
+        with self.lock:
+            if task.running:
+                task.rerun = task.rerun or queue
+                return None
+            task.running = True
+        try:
+            return self.pool.submit(self._run, task, force)
+        except RuntimeError:  # pool shut down while stopping
+            with self.lock:
+                task.running = False
+            return None
+
+    def _stage_due(self, task: Task, force: bool) -> (bool, Optional[Dict]):
+        """Whether a pipeline stage must run, and the input hashes to record if it succeeds."""
+        try:
+            hashes = input_hashes(task.name, self.pipeline.kv)
+        except Exception as e:
+            print(f"⚠️ {task.name}: cannot hash inputs ({e}); running", file=sys.stderr)
+            return True, None
+        changed = self.pipeline.changed(task.name, hashes)
+        if changed:
+            print(f"🔁 {task.name}: inputs changed ({', '.join(changed)})", file=sys.stderr)
+        elif force:
+            print(f"🔁 {task.name}: inputs unchanged, forced", file=sys.stderr)
+        else:
+            task.stats["skipped_unchanged"] += 1
+            print(f"⏭️ {task.name}: inputs unchanged since {self.pipeline.last(task.name)['ran_at']}", file=sys.stderr)
+            return False, hashes
+        return True, hashes
+
+    def _run(self, task: Task, force: bool = False) -> bool:
+        ok = True
+        try:
+            due, hashes = self._stage_due(task, force) if task.name in STAGES else (True, None)
+            if due:
+                ok = task.run()
+                if ok and hashes:
+                    self.pipeline.record(task.name, hashes)
+                if ok:
+                    for stage in dependents(task.name):
+                        if stage in self.tasks:
+                            self.submit(self.tasks[stage], queue=True)
+        finally:
+            with self.lock:
+                rerun, task.rerun = task.rerun, False
+                task.running = False
+            if rerun:
+                self.submit(task)
+            budget().flush()
+            self.write_status()
+        return ok
+
+    def run_stages(self, force: bool = False) -> bool:
+        """Run every task once (pipeline stages only when their inputs changed), in parallel."""
+        futures = [self.submit(task, force) for task in self.tasks.values()]
+        ok = all(f.result() for f in futures if f is not None)
+        self.pool.shutdown(wait=True)
+        return ok
+
+    def run_forever(self, run_now: bool = False):
+        now = time.time()
+        for task in self.tasks.values():
+            task.schedule(now)
+            if run_now:
+                task.next_run = now
+        self.write_status()
+        while not self.stop.is_set():
+            now = time.time()
+            for task in sorted(self.tasks.values(), key=lambda t: t.next_run):
+                if task.next_run > now:
+                    break
+                task.schedule(now)
+                if self.submit(task) is None:
+                    task.stats["skipped_overlap"] += 1
+                    print(f"⏭️ {task.name} still running; skipping this slot", file=sys.stderr)
+            wait = min(t.next_run for t in self.tasks.values()) - time.time()
+            self.stop.wait(max(0.05, min(wait, 30.0)))
+        print("🛑 Stopping: waiting for running tasks", file=sys.stderr)
+        self.pool.shutdown(wait=True)
+
+    def serve_status(self, port: int):
+        collector = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                body = json.dumps(collector.status(), indent=2).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        server = ThreadingHTTPServer(('0.0.0.0', port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        print(f"📊 Collector status on http://0.0.0.0:{server.server_address[1]}/status", file=sys.stderr)
+        return server
+
+
+def _prepare_process():
+    """Run from the repo root with the env every workflow step had, and stdout routed per task."""
+    os.chdir(REPO_ROOT)
+    ns = os.getenv('CF_KV_NAMESPACE_ID') or os.getenv('CF_METRICS_NAMESPACE_ID')
+    if ns:
+        os.environ.setdefault('CF_KV_NAMESPACE_ID', ns)
+        os.environ.setdefault('CF_METRICS_NAMESPACE_ID', ns)
+    for key, value in WORKFLOW_ENV_DEFAULTS.items():
+        os.environ.setdefault(key, value)
+    sys.stdout = _stdout
+
+
+def _select(names: Optional[List[str]]) -> List[Task]:
+    if not names:
+        return TASKS
+    known = {t.name: t for t in TASKS}
+    unknown = [n for n in names if n not in known]
+    if unknown:
+        raise SystemExit(f"Unknown task(s): {', '.join(unknown)} (known: {', '.join(known)})")
+    return [known[n] for n in names]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('command', choices=['run', 'once', 'list'])
+    parser.add_argument('tasks', nargs='*')
+    parser.add_argument('--only', default='', help='comma-separated task names (run)')
+    parser.add_argument('--now', action='store_true', help='run every task immediately, then on schedule')
+    parser.add_argument('--workers', type=int, default=COLLECTOR_WORKERS)
+    parser.add_argument('--status-port', type=int, default=COLLECTOR_STATUS_PORT)
+    opts = parser.parse_args()
+
+    if opts.command == 'list':
+        now = time.time()
+        print(f"{'task':22} {'every':>8} {'next run (UTC)':>20}  workflow")
+        for t in _select(opts.tasks):
+            print(f"{t.name:22} {t.interval // MINUTE:>7}m "
+                  f"{datetime.fromtimestamp(t.slot_after(now), timezone.utc):%Y-%m-%d %H:%M}  {t.workflow}")
+        return
+
+    _prepare_process()
+    share_subtensor()
+    if opts.command == 'once':
+        if not opts.tasks:
+            parser.error("once needs at least one task name")
+        ok = all([t.run() for t in _select(opts.tasks)])
+        print(json.dumps({t.name: t.stats for t in _select(opts.tasks)}, indent=2), file=sys.stderr)
+        sys.exit(0 if ok else 1)
+
+    collector = Collector(_select([n for n in opts.only.split(',') if n]), workers=opts.workers)
+    if opts.status_port:
+        collector.serve_status(opts.status_port)
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: collector.stop.set())
+    print(f"🚜 Collector: {len(collector.tasks)} tasks, {collector.workers} workers", file=sys.stderr)
+    collector.run_forever(run_now=opts.now)
+    collector.write_status()
+
+
+if __name__ == "__main__":
+    main()
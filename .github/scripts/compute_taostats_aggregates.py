@@ -6,15 +6,41 @@ This script is intended to run in CI (GitHub Actions) with the following env var
   - CF_API_TOKEN
   - CF_METRICS_NAMESPACE_ID
 
-It fetches `taostats_history` from KV, computes simple aggregates (MA, stddev, percent change,
+It reads the taostats history from KV, computes simple aggregates (MA, stddev, percent change,
 confidence) and writes the result to KV key `taostats_aggregates` for fast UI access.
+
+History timestamps are parsed once into sorted epoch/price/volume arrays;
+window cut points and the "24h ago" neighbour come from bisect and the
+window means from prefix sums, so a run is one parse plus O(log n) lookups.
+
+Runs are incremental: a rolling-window state (`taostats_aggregates_state`)
+is stored beside the aggregates and only samples newer than it are read from
+the daily `taostats_history_YYYY-MM-DD` chunks. All retained chunks
+(taostats_history_store.py) are read only when the state is missing, has
+another schema, or is older than AGG_FULL_RECOMPUTE_HOURS.
+
+The same new samples also update the multi-resolution chart series
+(`taostats_series_5m/1h/4h/1d`, see taostats_series.py).
+
+Usage:
+  python .github/scripts/compute_taostats_aggregates.py              # incremental run
+  python .github/scripts/compute_taostats_aggregates.py --full       # force full recompute
+  python .github/scripts/compute_taostats_aggregates.py --verify     # incremental vs batch check
+  python .github/scripts/compute_taostats_aggregates.py --benchmark [N ...]
 """
 import os
 import sys
 import json
 import math
-from datetime import datetime, timezone
-import requests
+import time
+from bisect import bisect_left
+from collections import deque
+from itertools import accumulate
+from datetime import datetime, timezone, timedelta
+
+from kv_client import client as kv_client
+from taostats_history_store import CHUNK_RETENTION_DAYS, load_recent_history
+from taostats_series import publish_series
 
 
 def _int_env(name, default):
@@ -31,37 +57,11 @@ def _int_env(name, default):
 
 
 def fetch_kv_json(account_id, api_token, namespace_id, key):
-    url = f"https://api.cloudflare.com/client/v4/accounts/{account_id}/storage/kv/namespaces/{namespace_id}/values/{key}"
-    headers = {"Authorization": f"Bearer {api_token}"}
-    resp = requests.get(url, headers=headers, timeout=30)
-    if resp.status_code == 200:
-        text = resp.text
-        if not text:
-            return None
-        try:
-            return json.loads(text)
-        except Exception:
-            # KV may contain raw JSON string; try to parse loosely
-            try:
-                return json.loads(resp.content.decode('utf-8'))
-            except Exception:
-                return None
-    elif resp.status_code == 404:
-        return None
-    else:
-        print(f"Warning: fetch_kv_json got status={resp.status_code} for key={key}", file=sys.stderr)
-        return None
+    return kv_client(account_id, api_token, namespace_id).get_json(key)
 
 
 def put_kv_json(account_id, api_token, namespace_id, key, obj):
-    url = f"https://api.cloudflare.com/client/v4/accounts/{account_id}/storage/kv/namespaces/{namespace_id}/values/{key}"
-    headers = {
-        "Authorization": f"Bearer {api_token}",
-        "Content-Type": "application/json",
-    }
-    data = json.dumps(obj)
-    resp = requests.put(url, headers=headers, data=data.encode('utf-8'), timeout=30)
-    return resp.status_code in (200, 204)
+    return kv_client(account_id, api_token, namespace_id).put_json(key, obj, compact=False)
 
 
 def mean(values):
@@ -79,46 +79,92 @@ def stddev(values, ddof=0):
     return math.sqrt(var)
 
 
+def _epoch(ts):
+    return datetime.fromisoformat(ts.replace('Z', '+00:00')).timestamp()
+
+
+def parse_history(history):
+    """Parse history once into parallel arrays sorted by time.
+
+    Returns dict with `epoch`, `timestamp`, `volume`, `entry_price` (every
+    entry, price None when missing) and `price_epoch`, `price` (entries with
+    a numeric price). Entries whose timestamp cannot be parsed are skipped.
+    """
+    rows = []
+    for e in history:
+        if not e:
+            continue
+        ts = e.get('_timestamp')
+        try:
+            t = _epoch(ts)
+        except Exception:
+            continue
+        try:
+            vol = float(e.get('volume_24h') or 0.0)
+        except (TypeError, ValueError):
+            vol = 0.0
+        price = None
+        if e.get('price') is not None:
+            try:
+                price = float(e.get('price'))
+            except (TypeError, ValueError):
+                pass
+        rows.append((t, ts, vol, price))
+    rows.sort(key=lambda r: r[0])
+    priced = [(t, p) for (t, _, _, p) in rows if p is not None]
+    return {
+        'epoch': [r[0] for r in rows],
+        'timestamp': [r[1] for r in rows],
+        'volume': [r[2] for r in rows],
+        'entry_price': [r[3] for r in rows],
+        'price_epoch': [t for (t, _) in priced],
+        'price': [p for (_, p) in priced],
+    }
+
+
+def prefix_sums(values):
+    """P[i] = sum(values[:i]) (P[0] = 0)."""
+    return [0.0] + list(accumulate(values))
+
+
+def window_mean(prefix, epochs, cutoff):
+    """Mean of the values with epoch >= cutoff (epochs sorted), via bisect + prefix sums."""
+    start = bisect_left(epochs, cutoff)
+    n = len(epochs) - start
+    return (prefix[-1] - prefix[start]) / n if n > 0 else None
+
+
+def nearest_index(epochs, target):
+    """Index of the entry closest to target; ties go to the earliest entry."""
+    i = bisect_left(epochs, target)
+    if i == 0:
+        j = 0
+    elif i == len(epochs):
+        j = i - 1
+    else:
+        j = i - 1 if target - epochs[i - 1] <= epochs[i] - target else i
+    # First of several entries sharing that epoch
+    return bisect_left(epochs, epochs[j])
+
+
 def compute_aggregates(history):
     # Expect history as list of objects with volume_24h and _timestamp
     if not history or not isinstance(history, list):
         return None
-    # normalize: filter entries that have numeric volume
-    vols = [ (e.get('_timestamp'), float(e.get('volume_24h') or 0.0)) for e in history if e ]
-    if not vols:
+    # Parse every timestamp exactly once into sorted parallel arrays
+    parsed = parse_history(history)
+    epochs = parsed['epoch']
+    only_vols = parsed['volume']
+    price_epochs = parsed['price_epoch']
+    prices = parsed['price']
+    if not only_vols:
         return None
-    # keep order: assume history oldest->newest; if not, sort by timestamp
-    try:
-        vols = sorted(vols, key=lambda x: x[0])
-    except Exception:
-        pass
-    
-    # Also extract prices for price_24h_pct calculation
-    prices = []
-    for e in history:
-        if e and e.get('price') is not None:
-            try:
-                prices.append((e.get('_timestamp'), float(e.get('price'))))
-            except:
-                pass
-    try:
-        prices = sorted(prices, key=lambda x: x[0])
-    except Exception:
-        pass
     
     # Calculate actual time span in hours
-    hours_of_data = 0
-    try:
-        first_ts = vols[0][0]
-        last_ts = vols[-1][0]
-        first_dt = datetime.fromisoformat(first_ts.replace('Z', '+00:00'))
-        last_dt = datetime.fromisoformat(last_ts.replace('Z', '+00:00'))
-        hours_of_data = (last_dt - first_dt).total_seconds() / 3600
-    except Exception:
-        pass
+    hours_of_data = (epochs[-1] - epochs[0]) / 3600
     
-    only_vols = [v for (_, v) in vols]
     N = len(only_vols)
+    vol_prefix = prefix_sums(only_vols)
 
     # Calculate MAs using available data
     # Use time-based logic: show MA if we have enough time coverage
@@ -128,33 +174,50 @@ def compute_aggregates(history):
     ma_short = mean(last_3) if last_3 else None
     ma_med = mean(last_10) if last_10 else None
 
-    # 3-day MA: calculate mean of only last 72 hours of data
-    ma_3d = None
-    if hours_of_data >= 72:
-        try:
-            last_ts = vols[-1][0]
-            last_dt = datetime.fromisoformat(last_ts.replace('Z', '+00:00'))
-            cutoff_3d = last_dt.timestamp() - (72 * 3600)
-            vols_3d = [v for (ts, v) in vols if datetime.fromisoformat(ts.replace('Z', '+00:00')).timestamp() >= cutoff_3d]
-            ma_3d = mean(vols_3d) if vols_3d else None
-        except Exception:
-            pass
-
-    # 7-day MA: calculate mean of only last 168 hours of data
-    ma_7d = None
-    if hours_of_data >= 168:
-        try:
-            last_ts = vols[-1][0]
-            last_dt = datetime.fromisoformat(last_ts.replace('Z', '+00:00'))
-            cutoff_7d = last_dt.timestamp() - (168 * 3600)
-            vols_7d = [v for (ts, v) in vols if datetime.fromisoformat(ts.replace('Z', '+00:00')).timestamp() >= cutoff_7d]
-            ma_7d = mean(vols_7d) if vols_7d else None
-        except Exception:
-            pass
+    # 3-day / 7-day MA: mean of only the last 72 / 168 hours of data
+    ma_3d = window_mean(vol_prefix, epochs, epochs[-1] - 72 * 3600) if hours_of_data >= 72 else None
+    ma_7d = window_mean(vol_prefix, epochs, epochs[-1] - 168 * 3600) if hours_of_data >= 168 else None
     
     sd_med = stddev(last_10) if len(last_10) >= 2 else None
 
-    last_volume = only_vols[-1]
+    # Entry closest to 24h ago (binary search) for the 24h deltas
+    old_price = None
+    if len(prices) >= 2 and hours_of_data >= 20:
+        old_price = prices[nearest_index(price_epochs, price_epochs[-1] - 24 * 3600)]
+    old_volume = None
+    if N >= 2 and hours_of_data >= 20:
+        old_volume = only_vols[nearest_index(epochs, epochs[-1] - 24 * 3600)]
+
+    return finish_aggregates({
+        'count': N,
+        'hours_of_data': hours_of_data,
+        'last_volume': only_vols[-1],
+        'last_price': prices[-1] if prices else None,
+        'ma_short': ma_short,
+        'ma_med': ma_med,
+        'ma_3d': ma_3d,
+        'ma_7d': ma_7d,
+        'sd_med': sd_med,
+        'old_price': old_price,
+        'old_volume': old_volume,
+        'sample_timestamps': parsed['timestamp'][-10:],
+    })
+
+
+def finish_aggregates(stats):
+    """Derive pct changes, 24h deltas, volume signal, trend and confidence from window stats.
+
+    Shared by the batch path (compute_aggregates) and the incremental state path.
+    """
+    N = stats['count']
+    hours_of_data = stats['hours_of_data']
+    last_volume = stats['last_volume']
+    ma_short = stats['ma_short']
+    ma_med = stats['ma_med']
+    ma_3d = stats['ma_3d']
+    ma_7d = stats['ma_7d']
+    sd_med = stats['sd_med']
+
     pct_change_vs_ma_short = None
     if ma_short and ma_short != 0:
         pct_change_vs_ma_short = (last_volume - ma_short) / ma_short
@@ -181,53 +244,19 @@ def compute_aggregates(history):
         confidence = 'high'
 
     # === Calculate price_24h_pct from history ===
-    # Find entry closest to 24h ago and compare with current price
+    # Compare current price with the entry closest to 24h ago
     price_24h_pct = None
-    current_price = prices[-1][1] if prices else None
-    if prices and len(prices) >= 2 and hours_of_data >= 20:
-        try:
-            now = datetime.fromisoformat(prices[-1][0].replace('Z', '+00:00'))
-            target_time = now.timestamp() - (24 * 3600)  # 24h ago
-            
-            # Find closest entry to 24h ago
-            old_price = None
-            min_diff = float('inf')
-            for ts, price in prices:
-                entry_time = datetime.fromisoformat(ts.replace('Z', '+00:00')).timestamp()
-                diff = abs(entry_time - target_time)
-                if diff < min_diff:
-                    min_diff = diff
-                    old_price = price
-            
-            if old_price and old_price > 0:
-                price_24h_pct = ((current_price - old_price) / old_price) * 100
-        except Exception as e:
-            print(f"Warning: price_24h_pct calculation failed: {e}", file=sys.stderr)
-            price_24h_pct = None
+    current_price = stats['last_price']
+    old_price = stats['old_price']
+    if old_price and old_price > 0:
+        price_24h_pct = ((current_price - old_price) / old_price) * 100
 
     # === Calculate volume_change_24h from history ===
     # Compare current volume with volume from ~24h ago
     volume_change_24h = None
-    if vols and len(vols) >= 2 and hours_of_data >= 20:
-        try:
-            now = datetime.fromisoformat(vols[-1][0].replace('Z', '+00:00'))
-            target_time = now.timestamp() - (24 * 3600)  # 24h ago
-            
-            # Find closest entry to 24h ago
-            old_volume = None
-            min_diff = float('inf')
-            for ts, vol in vols:
-                entry_time = datetime.fromisoformat(ts.replace('Z', '+00:00')).timestamp()
-                diff = abs(entry_time - target_time)
-                if diff < min_diff:
-                    min_diff = diff
-                    old_volume = vol
-            
-            if old_volume and old_volume > 0:
-                volume_change_24h = ((last_volume - old_volume) / old_volume) * 100
-        except Exception as e:
-            print(f"Warning: volume_change_24h calculation failed: {e}", file=sys.stderr)
-            volume_change_24h = None
+    old_volume = stats['old_volume']
+    if old_volume and old_volume > 0:
+        volume_change_24h = ((last_volume - old_volume) / old_volume) * 100
 
     # === Calculate volume_signal based on price and volume changes ===
     volume_signal = None
@@ -313,12 +342,281 @@ def compute_aggregates(history):
         'trend_direction': trend_direction,
         'confidence': confidence,
         'hours_of_data': round(hours_of_data, 1),
-        'sample_timestamps': [t for (t, _) in vols[-10:]],
+        'sample_timestamps': stats['sample_timestamps'],
     }
     return aggregates
 
 
+# === Incremental rolling-window state (KV `taostats_aggregates_state`) ===
+# The state holds everything the aggregates need: a 10-sample ring, 3d / 7d
+# windows with running sums, and the samples around "24h ago" for the deltas.
+# Each run applies only samples newer than `last_epoch` (O(1) amortized per
+# sample) read from the Worker's daily chunks instead of the whole history.
+# `count`, `first_epoch` (hours_of_data) and `price_count` cover the same
+# CHUNK_RETENTION_DAYS calendar days the full recompute loads, via per-day
+# buckets evicted like the window sums.
+STATE_KEY = 'taostats_aggregates_state'
+STATE_SCHEMA = 2
+FULL_RECOMPUTE_HOURS = _int_env('AGG_FULL_RECOMPUTE_HOURS', 24)  # periodic resync (float drift, late inserts)
+STALE_MINUTES = _int_env('AGG_STALE_MINUTES', 30)  # no new chunk samples for this long -> full recompute
+MAX_CHUNK_DAYS = 3  # larger gaps -> full recompute
+WINDOW_24H = 24 * 3600
+WINDOW_3D = 72 * 3600
+WINDOW_7D = 168 * 3600
+VERIFY_REL_TOL = 1e-9
+VERIFY_KEYS = ('count', 'last_volume', 'last_price', 'ma_short', 'ma_med', 'ma_3d', 'ma_7d', 'sd_med',
+               'price_24h_pct', 'volume_change_24h', 'volume_signal', 'trend_direction', 'confidence',
+               'hours_of_data', 'sample_timestamps')
+
+
+def new_state():
+    return {
+        'schema': STATE_SCHEMA,
+        'count': 0,
+        'first_epoch': None,
+        'last_epoch': None,
+        'recent': deque(maxlen=10),  # [timestamp, volume] of the last 10 samples
+        'win_3d': deque(),           # [epoch, volume] within 72h of the last sample
+        'win_7d': deque(),           # [epoch, volume] within 168h of the last sample
+        'sum_3d': 0.0,
+        'sum_7d': 0.0,
+        'vol_24h': deque(),          # [epoch, volume] from the last sample <= 24h ago onward
+        'price_24h': deque(),        # [epoch, price] same, priced samples only
+        'price_count': 0,
+        'last_price': None,
+        'days': deque(),             # [UTC day, samples, priced samples, first epoch] within the retention window
+        'resynced_at': None,
+    }
+
+
+def _push_window(win, epoch, value, span):
+    """Append to a time window and evict expired samples; returns the evicted sum."""
+    win.append([epoch, value])
+    evicted = 0.0
+    cutoff = epoch - span
+    while win[0][0] < cutoff:
+        evicted += win.popleft()[1]
+    return evicted
+
+
+def _push_nearest(ring, epoch, value):
+    """Keep only the samples that can still be "closest to 24h ago"."""
+    if ring and ring[-1][0] == epoch:
+        return  # batch picks the first of equal timestamps
+    ring.append([epoch, value])
+    target = epoch - WINDOW_24H
+    while len(ring) >= 2 and ring[1][0] <= target:
+        ring.popleft()
+
+
+def _nearest(ring, target):
+    """Value closest to target (ties -> earlier), same rule as nearest_index()."""
+    first = ring[0]
+    if len(ring) == 1 or first[0] > target:
+        return first[1]
+    second = ring[1]
+    return first[1] if target - first[0] <= second[0] - target else second[1]
+
+
+def _push_day(state, epoch, priced):
+    """Count the sample in its UTC day and drop days outside the retention window."""
+    day = int(epoch // 86400)
+    days = state['days']
+    if days and days[-1][0] == day:
+        days[-1][1] += 1
+        days[-1][2] += int(priced)
+    else:
+        days.append([day, 1, int(priced), epoch])
+    while days[0][0] <= day - CHUNK_RETENTION_DAYS:
+        _, n, n_priced, _ = days.popleft()
+        state['count'] -= n
+        state['price_count'] -= n_priced
+    state['first_epoch'] = days[0][3]
+
+
+def retained_history(history):
+    """Entries within CHUNK_RETENTION_DAYS calendar days of the newest one (what load_recent_history returns)."""
+    epochs = parse_history(history)['epoch']
+    if not epochs:
+        return history
+    cutoff = (int(epochs[-1] // 86400) - CHUNK_RETENTION_DAYS + 1) * 86400
+    kept = []
+    for e in history:
+        try:
+            if e and _epoch(e.get('_timestamp')) >= cutoff:
+                kept.append(e)
+        except Exception:
+            continue
+    return kept
+
+
+def apply_sample(state, epoch, ts, vol, price):
+    """Fold one sample (newer than state['last_epoch']) into the state."""
+    state['count'] += 1
+    state['last_epoch'] = epoch
+    _push_day(state, epoch, price is not None)
+    state['recent'].append([ts, vol])
+    state['sum_3d'] += vol - _push_window(state['win_3d'], epoch, vol, WINDOW_3D)
+    state['sum_7d'] += vol - _push_window(state['win_7d'], epoch, vol, WINDOW_7D)
+    _push_nearest(state['vol_24h'], epoch, vol)
+    if price is not None:
+        state['price_count'] += 1
+        state['last_price'] = price
+        _push_nearest(state['price_24h'], epoch, price)
+
+
+def state_from_history(history):
+    """Full recompute: build the state by replaying the whole history."""
+    state = new_state()
+    parsed = parse_history(history)
+    for sample in zip(parsed['epoch'], parsed['timestamp'], parsed['volume'], parsed['entry_price']):
+        apply_sample(state, *sample)
+    state['resynced_at'] = datetime.now(timezone.utc).isoformat()
+    return state
+
+
+def aggregates_from_state(state):
+    """Aggregates from the rolling state (same output as compute_aggregates)."""
+    if not state or not state['count']:
+        return None
+    hours_of_data = (state['last_epoch'] - state['first_epoch']) / 3600
+    vols = [v for (_, v) in state['recent']]
+    last_3 = vols[-3:]
+    last_epoch = state['last_epoch']
+
+    old_price = None
+    if state['price_count'] >= 2 and hours_of_data >= 20:
+        price_ring = state['price_24h']
+        old_price = _nearest(price_ring, price_ring[-1][0] - WINDOW_24H)
+    old_volume = None
+    if state['count'] >= 2 and hours_of_data >= 20:
+        old_volume = _nearest(state['vol_24h'], last_epoch - WINDOW_24H)
+
+    return finish_aggregates({
+        'count': state['count'],
+        'hours_of_data': hours_of_data,
+        'last_volume': vols[-1],
+        'last_price': state['last_price'],
+        'ma_short': mean(last_3),
+        'ma_med': mean(vols),
+        'ma_3d': state['sum_3d'] / len(state['win_3d']) if hours_of_data >= 72 else None,
+        'ma_7d': state['sum_7d'] / len(state['win_7d']) if hours_of_data >= 168 else None,
+        'sd_med': stddev(vols) if len(vols) >= 2 else None,
+        'old_price': old_price,
+        'old_volume': old_volume,
+        'sample_timestamps': [t for (t, _) in state['recent']],
+    })
+
+
+def dump_state(state):
+    return {k: list(v) if isinstance(v, deque) else v for k, v in state.items()}
+
+
+def load_state(raw):
+    """Restore a persisted state; None if missing or from another schema."""
+    if not isinstance(raw, dict) or raw.get('schema') != STATE_SCHEMA:
+        return None
+    state = new_state()
+    for k, v in raw.items():
+        if isinstance(state.get(k), deque):
+            state[k].extend(v)
+        else:
+            state[k] = v
+    return state
+
+
+def compare_aggregates(a, b, keys=VERIFY_KEYS):
+    """List of keys where two aggregates differ (floats within VERIFY_REL_TOL)."""
+    diffs = []
+    for k in keys:
+        x, y = a.get(k), b.get(k)
+        if isinstance(x, float) and isinstance(y, float):
+            if not math.isclose(x, y, rel_tol=VERIFY_REL_TOL, abs_tol=1e-9):
+                diffs.append(k)
+        elif x != y:
+            diffs.append(k)
+    return diffs
+
+
+def verify_equivalence(history, splits=5):
+    """Replay history in several incremental batches and compare with the batch computation."""
+    parsed = parse_history(history)
+    n = len(parsed['epoch'])
+    state = new_state()
+    bounds = [round(i * n / splits) for i in range(splits + 1)]
+    samples = list(zip(parsed['epoch'], parsed['timestamp'], parsed['volume'], parsed['entry_price']))
+    for lo, hi in zip(bounds, bounds[1:]):
+        for sample in samples[lo:hi]:
+            apply_sample(state, *sample)
+        state = load_state(json.loads(json.dumps(dump_state(state))))  # round-trip through JSON like KV
+    return compare_aggregates(compute_aggregates(retained_history(history)), aggregates_from_state(state))
+
+
+def synthetic_history(n, step_seconds=600):
+    """Synthetic taostats_history (10-minute samples) for benchmarks."""
+    start = 1_700_000_000
+    return [{
+        '_timestamp': datetime.fromtimestamp(start + i * step_seconds, timezone.utc).isoformat().replace('+00:00', 'Z'),
+        'price': 400 + 50 * math.sin(i / 500),
+        'volume_24h': 1e8 + 2e7 * math.cos(i / 300),
+    } for i in range(n)]
+
+
+def benchmark(sizes=(10_000, 1_000_000), repeats=3):
+    """Per-run cost of compute_aggregates (parse + aggregates) at several history sizes."""
+    for n in sizes:
+        history = synthetic_history(n)
+        best = float('inf')
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            compute_aggregates(history)
+            best = min(best, time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        parse_history(history)
+        parse_s = time.perf_counter() - t0
+        print(json.dumps({'entries': n, 'run_ms': round(best * 1000, 1), 'parse_ms': round(parse_s * 1000, 1)}))
+
+
+def fetch_new_samples(account_id, api_token, namespace_id, state):
+    """Samples newer than state['last_epoch'] from the Worker's daily chunks.
+
+    Returns None when a full recompute is needed (gap longer than
+    MAX_CHUNK_DAYS, or chunks not being written for STALE_MINUTES).
+    """
+    last = state['last_epoch']
+    start = datetime.fromtimestamp(last, timezone.utc).date()
+    days = (datetime.now(timezone.utc).date() - start).days
+    if days >= MAX_CHUNK_DAYS:
+        return None
+    keys = [f"taostats_history_{(start + timedelta(days=i)).isoformat()}" for i in range(days + 1)]
+    chunks = kv_client(account_id, api_token, namespace_id).get_many(keys)
+    entries = []
+    for key in keys:
+        chunk = chunks.get(key)
+        if isinstance(chunk, dict):
+            chunk = [chunk]
+        entries.extend(chunk or [])
+    parsed = parse_history(entries)
+    samples = [s for s in zip(parsed['epoch'], parsed['timestamp'], parsed['volume'], parsed['entry_price']) if s[0] > last]
+    if not samples and time.time() - last > STALE_MINUTES * 60:
+        return None
+    return samples
+
+
+def _needs_resync(state):
+    try:
+        resynced = datetime.fromisoformat(state.get('resynced_at'))
+    except (TypeError, ValueError):
+        return True
+    return (datetime.now(timezone.utc) - resynced).total_seconds() > FULL_RECOMPUTE_HOURS * 3600
+
+
 def main():
+    if '--benchmark' in sys.argv[1:]:
+        sizes = [int(a) for a in sys.argv[2:]] or [10_000, 1_000_000]
+        benchmark(sizes)
+        return
+
     CF_ACCOUNT_ID = os.getenv('CF_ACCOUNT_ID')
     CF_API_TOKEN = os.getenv('CF_API_TOKEN')
     CF_KV_NAMESPACE_ID = os.getenv('CF_METRICS_NAMESPACE_ID')
@@ -327,29 +625,73 @@ def main():
         print('CF_ACCOUNT_ID, CF_API_TOKEN, CF_METRICS_NAMESPACE_ID are required', file=sys.stderr)
         sys.exit(1)
 
-    history = fetch_kv_json(CF_ACCOUNT_ID, CF_API_TOKEN, CF_KV_NAMESPACE_ID, 'taostats_history')
-    if history is None:
-        print('No taostats_history found in KV; nothing to aggregate')
-        # still write an empty aggregates object with timestamp
-        now_iso = datetime.now(timezone.utc).isoformat()
-        empty = {
-            '_generated_at': now_iso,
-            'last_updated': now_iso,
-            'count': 0
-        }
-        put_kv_json(CF_ACCOUNT_ID, CF_API_TOKEN, CF_KV_NAMESPACE_ID, 'taostats_aggregates', empty)
-        sys.exit(0)
-
-    aggregates = compute_aggregates(history)
+    if '--verify' in sys.argv[1:]:
+        # Equivalence check: incremental replay (with JSON round-trips) vs batch
+        history = load_recent_history((CF_ACCOUNT_ID, CF_API_TOKEN, CF_KV_NAMESPACE_ID))
+        diffs = verify_equivalence(history or [])
+        print(f"Incremental vs batch: {'OK' if not diffs else 'MISMATCH ' + ', '.join(diffs)}")
+        sys.exit(1 if diffs else 0)
+
+    # 1) Incremental path: persisted state + only the new samples from the daily chunks
+    state = None
+    if '--full' not in sys.argv[1:]:
+        state = load_state(fetch_kv_json(CF_ACCOUNT_ID, CF_API_TOKEN, CF_KV_NAMESPACE_ID, STATE_KEY))
+        if state is None:
+            print('No aggregates state (or schema changed); full recompute')
+        elif _needs_resync(state):
+            print(f'State older than {FULL_RECOMPUTE_HOURS}h; full recompute')
+            state = None
+    samples = fetch_new_samples(CF_ACCOUNT_ID, CF_API_TOKEN, CF_KV_NAMESPACE_ID, state) if state else None
+
+    if samples is not None:
+        for sample in samples:
+            apply_sample(state, *sample)
+        aggregates = aggregates_from_state(state)
+        mode = 'incremental'
+        series_samples = [(e, p, v) for e, _, v, p in samples]
+    else:
+        # 2) Full recompute from the whole history
+        history = load_recent_history((CF_ACCOUNT_ID, CF_API_TOKEN, CF_KV_NAMESPACE_ID))
+        if history is None:
+            print('No taostats history chunks (or legacy taostats_history) in KV; nothing to aggregate')
+            # still write an empty aggregates object with timestamp
+            now_iso = datetime.now(timezone.utc).isoformat()
+            empty = {
+                '_generated_at': now_iso,
+                'last_updated': now_iso,
+                'count': 0
+            }
+            put_kv_json(CF_ACCOUNT_ID, CF_API_TOKEN, CF_KV_NAMESPACE_ID, 'taostats_aggregates', empty)
+            sys.exit(0)
+
+        aggregates = compute_aggregates(history)
+        state = state_from_history(history)
+        samples = []
+        mode = 'full'
+        parsed = parse_history(history)
+        series_samples = list(zip(parsed['epoch'], parsed['entry_price'], parsed['volume']))
+        if aggregates is not None:
+            diffs = compare_aggregates(aggregates, aggregates_from_state(state) or {})
+            if diffs:
+                print(f"Warning: rebuilt state differs from batch on {', '.join(diffs)}", file=sys.stderr)
+
     if aggregates is None:
         print('Failed to compute aggregates', file=sys.stderr)
         sys.exit(1)
+    aggregates['_mode'] = mode
 
-    ok = put_kv_json(CF_ACCOUNT_ID, CF_API_TOKEN, CF_KV_NAMESPACE_ID, 'taostats_aggregates', aggregates)
+    # Aggregates and state go out in one bulk write
+    kv = kv_client(CF_ACCOUNT_ID, CF_API_TOKEN, CF_KV_NAMESPACE_ID)
+    ok = kv.put_many({'taostats_aggregates': aggregates, STATE_KEY: dump_state(state)},
+                     compact=False, compress_keys=[STATE_KEY])
     if not ok:
-        print('Failed to write taostats_aggregates to KV', file=sys.stderr)
+        print('Failed to write taostats_aggregates / state to KV', file=sys.stderr)
         sys.exit(1)
-    print('Aggregates written to KV: count=', aggregates.get('count'))
+    print(f'Aggregates written to KV ({mode}, +{len(samples)} samples): count=', aggregates.get('count'))
+
+    # 3) Chart series (5m/1h/4h/1d); each only takes samples newer than its last bucket
+    applied = publish_series((CF_ACCOUNT_ID, CF_API_TOKEN, CF_KV_NAMESPACE_ID), series_samples)
+    print('Series updated: ' + ', '.join(f'{r} +{n}' for r, n in applied.items()))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Publish LTTB-downsampled variants of the chart-bound time series.
+
+For every series below, the raw history is loaded once and reduced with
+lttb.py to each size in LTTB_SIZES (200/500/1000 points):
+
+  taostats_history   daily chunks   -> taostats_history_lttb_{7,30}d_{n}
+  network_history    daily chunks   -> network_history_lttb_{7,30}d_{n}
+  issuance_history   daily chunks   -> issuance_history_lttb_{7,30}d_{n}
+  price_history      one key        -> price_history_lttb_{n} (every range)
+
+Variants keep the raw row format, so the Worker endpoints return them as-is
+when called with `?points=200|500|1000` and fall back to the raw history
+otherwise. Rows are ranked on all charted fields of a series at once.
+
+Environment variables:
+  CF_ACCOUNT_ID, CF_API_TOKEN, CF_KV_NAMESPACE_ID (or CF_METRICS_NAMESPACE_ID)
+
+Usage:
+  python .github/scripts/downsample_series.py [series ...]
+  python .github/scripts/downsample_series.py --benchmark   # raw vs downsampled bytes per chart load
+"""
+
+import sys
+import json
+import time
+from datetime import datetime, timezone, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from lttb import LTTB_SIZES, lttb_indices
+from taostats_history_store import _as_list, _epoch, _kv_config, kv_get, kv_get_many, kv_put_many
+
+WINDOWS = (7, 30)  # days; matches the `days` the history endpoints serve
+
+# name -> (chunk key prefix, legacy key, x field, charted y fields)
+CHUNKED_SERIES = {
+    'taostats_history': ('taostats_history_', 'taostats_history', '_timestamp', ['price', 'volume_24h']),
+    'network_history': ('network_history_', 'network_history', '_timestamp',
+                        ['totalIssuanceHuman', 'emission', 'validators', 'totalNeurons', 'subnets']),
+    'issuance_history': ('issuance_history_', 'issuance_history', 'ts', ['issuance']),
+}
+PRICE_HISTORY_KEY = 'price_history'
+
+
+def _compact_len(obj) -> int:
+    return len(json.dumps(obj, separators=(',', ':')).encode('utf-8'))
+
+
+def _x_value(row: Dict, field: str) -> Optional[float]:
+    value = row.get(field)
+    if isinstance(value, (int, float)):
+        return float(value)
+    return _epoch(value)
+
+
+def _y_value(row: Dict, field: str) -> float:
+    try:
+        return float(row.get(field))
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def load_chunked(cfg, prefix: str, legacy_key: str, x_field: str, days: int) -> Tuple[List[Dict], int]:
+    """Rows of the last `days` daily chunks (legacy key as fallback), sorted and de-duplicated by x.
+
+    Also returns the bytes a Worker GET reads from KV for that range.
+    """
+    today = datetime.now(timezone.utc).date()
+    keys = [f"{prefix}{(today - timedelta(days=i)).isoformat()}" for i in range(days)]
+    chunks = kv_get_many(cfg, keys)
+    rows: List[Dict] = []
+    read_bytes = 0
+    for key in keys:
+        chunk = chunks.get(key)
+        if chunk is not None:
+            read_bytes += _compact_len(chunk)
+            rows.extend(_as_list(chunk))
+    if not rows:
+        legacy = kv_get(cfg, legacy_key)
+        if legacy is not None:
+            read_bytes += _compact_len(legacy)
+            rows = _as_list(legacy)
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=days)).timestamp()
+    by_x = {}
+    for row in rows:
+        x = _x_value(row, x_field) if isinstance(row, dict) else None
+        if x is not None and x >= cutoff:
+            by_x[x] = row
+    return [by_x[x] for x in sorted(by_x)], read_bytes
+
+
+def downsample(rows: List[Dict], x_field: str, y_fields: List[str]) -> Dict[int, List[Dict]]:
+    """{n: rows} for every LTTB size."""
+    x = np.array([_x_value(r, x_field) for r in rows], dtype=np.float64)
+    y = np.array([[_y_value(r, f) for f in y_fields] for r in rows], dtype=np.float64).reshape(len(rows), len(y_fields))
+    return {n: [rows[i] for i in lttb_indices(x, y, n)] for n in LTTB_SIZES}
+
+
+def downsample_price_history(data: Dict) -> Dict[int, Dict]:
+    """price_history ({data: {range: [[ts_ms, price], ...]}}) -> {n: same shape, every range downsampled}."""
+    out = {}
+    ranges = data.get('data') or {}
+    indices = {}
+    for key, points in ranges.items():
+        arr = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        indices[key] = {n: lttb_indices(arr[:, 0], arr[:, 1], n) for n in LTTB_SIZES}
+    for n in LTTB_SIZES:
+        variant = {k: v for k, v in data.items() if k != 'data'}
+        variant['data'] = {key: [ranges[key][i] for i in indices[key][n]] for key in ranges}
+        variant['_downsampled'] = f"lttb-{n}"
+        out[n] = variant
+    return out
+
+
+def publish_chunked(cfg, name: str, report: List[Dict]):
+    prefix, legacy, x_field, y_fields = CHUNKED_SERIES[name]
+    for days in WINDOWS:
+        rows, read_bytes = load_chunked(cfg, prefix, legacy, x_field, days)
+        if not rows:
+            print(f"⚠️ {name}: no rows for {days}d", file=sys.stderr)
+            continue
+        t0 = time.perf_counter()
+        variants = downsample(rows, x_field, y_fields)
+        took = (time.perf_counter() - t0) * 1000
+        if cfg is not None:
+            kv_put_many(cfg, {f"{name}_lttb_{days}d_{n}": kept for n, kept in variants.items()})
+        for n, kept in variants.items():
+            key = f"{name}_lttb_{days}d_{n}"
+            report.append({"key": key, "raw_points": len(rows), "points": len(kept),
+                           "raw_read_bytes": read_bytes, "raw_payload_bytes": _compact_len(rows),
+                           "bytes": _compact_len(kept)})
+        print(f"📉 {name} {days}d: {len(rows)} rows -> {', '.join(str(n) for n in variants)} in {took:.1f}ms", file=sys.stderr)
+
+
+def publish_price_history(cfg, report: List[Dict], data: Optional[Dict] = None):
+    data = data if data is not None else kv_get(cfg, PRICE_HISTORY_KEY)
+    if not isinstance(data, dict) or not data.get('data'):
+        print("⚠️ price_history: nothing to downsample", file=sys.stderr)
+        return
+    raw_bytes = _compact_len(data)
+    variants = downsample_price_history(data)
+    if cfg is not None:
+        kv_put_many(cfg, {f"{PRICE_HISTORY_KEY}_lttb_{n}": variant for n, variant in variants.items()})
+    for n, variant in variants.items():
+        key = f"{PRICE_HISTORY_KEY}_lttb_{n}"
+        report.append({"key": key, "raw_points": sum(len(v) for v in data['data'].values()),
+                       "points": sum(len(v) for v in variant['data'].values()),
+                       "raw_read_bytes": raw_bytes, "raw_payload_bytes": raw_bytes, "bytes": _compact_len(variant)})
+
+
+def synthetic_rows(days: int = 30, step_seconds: int = 300) -> List[Dict]:
+    """Taostats-like history (5-minute samples) for the offline benchmark."""
+    rng = np.random.default_rng(3)
+    n = days * 86400 // step_seconds
+    start = datetime.now(timezone.utc).timestamp() - n * step_seconds
+    price = 400 + np.cumsum(rng.normal(0, 0.8, n))
+    volume = 8e7 + np.cumsum(rng.normal(0, 2e5, n))
+    return [{"_timestamp": datetime.fromtimestamp(start + i * step_seconds, timezone.utc).isoformat(),
+             "price": round(float(price[i]), 4), "volume_24h": round(float(volume[i]), 2)} for i in range(n)]
+
+
+def print_report(report: List[Dict]):
+    print(f"{'key':42} {'points':>13} {'KV read before':>15} {'after':>9} {'saved':>7}")
+    for r in report:
+        saved = 1 - r['bytes'] / r['raw_read_bytes'] if r['raw_read_bytes'] else 0.0
+        print(f"{r['key']:42} {r['raw_points']:>6}->{r['points']:<6} {r['raw_read_bytes']:>15,} {r['bytes']:>9,} {saved:>7.1%}")
+
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    cfg = _kv_config()
+    report: List[Dict] = []
+
+    if '--benchmark' in sys.argv[1:] and cfg is None:
+        # Offline: 30 days of 5-minute taostats samples, read as one chunk per day
+        rows = synthetic_rows()
+        per_day = len(rows) // 30
+        for days in WINDOWS:
+            window = rows[-days * per_day:]
+            for n, kept in downsample(window, '_timestamp', ['price', 'volume_24h']).items():
+                report.append({"key": f"synthetic_taostats_lttb_{days}d_{n}", "raw_points": len(window),
+                               "points": len(kept), "raw_read_bytes": _compact_len(window),
+                               "raw_payload_bytes": _compact_len(window), "bytes": _compact_len(kept)})
+        print_report(report)
+        return
+
+    if cfg is None:
+        print("❌ CF_ACCOUNT_ID, CF_API_TOKEN and CF_KV_NAMESPACE_ID are required", file=sys.stderr)
+        sys.exit(1)
+
+    names = args or list(CHUNKED_SERIES) + [PRICE_HISTORY_KEY]
+    for name in names:
+        if name in CHUNKED_SERIES:
+            publish_chunked(cfg, name, report)
+        elif name == PRICE_HISTORY_KEY:
+            publish_price_history(cfg, report)
+        else:
+            print(f"⚠️ Unknown series {name}", file=sys.stderr)
+    print_report(report)
+
+
+if __name__ == "__main__":
+    main()
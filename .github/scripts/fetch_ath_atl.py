@@ -1,8 +1,9 @@
-import requests
 import json
 import os
 from datetime import datetime
 
+from http_client import get as http_get
+
 COINGECKO_API = 'https://api.coingecko.com/api/v3/coins/bittensor'
 
 def _int_env(name, default):
@@ -35,7 +36,7 @@ def rotate_backups(pattern='tao_ath_atl-', keep=KEEP_BACKUPS):
 
 def fetch_ath_atl():
     try:
-        res = requests.get(COINGECKO_API, timeout=10)
+        res = http_get(COINGECKO_API, timeout=10, cache=True, allow_stale=True)
         res.raise_for_status()
         data = res.json()
         ath = data.get('market_data', {}).get('ath', {}).get('usd')
@@ -50,8 +51,11 @@ def fetch_ath_atl():
             'atl': atl,
             'atl_date': atl_date,
             'source': 'coingecko',
-            'updated': datetime.utcnow().isoformat() + 'Z'
+            # when CoinGecko last sent this data (older than this run for a stale cache copy)
+            'updated': datetime.utcfromtimestamp(res.fetched_at).isoformat() + 'Z'
         }
+        if res.from_cache == 'stale':
+            print(f"CoinGecko unavailable, using cached data from {result['updated']}")
         # Write canonical file
         with open('tao_ath_atl.json', 'w') as f:
             json.dump(result, f, indent=2)
@@ -7,11 +7,10 @@ Calculates average time between the last N blocks.
 import os
 import sys
 import json
-import time
-import random
-import requests
 from datetime import datetime, timezone
 
+from http_client import BudgetExceeded, get as http_get
+
 TAOSTATS_API_KEY = os.getenv('TAOSTATS_API_KEY')
 BLOCK_URL = "https://api.taostats.io/api/block/v1"
 
@@ -39,41 +38,14 @@ def fetch_block_time(num_blocks=25, max_attempts=4):
         
         while len(all_blocks) < num_blocks:
             url = f"{BLOCK_URL}?limit={per_page}&page={page}"
-            # Retry loop to handle transient errors and rate limits
-            resp = None
-            for attempt in range(1, max_attempts + 1):
-                try:
-                    resp = requests.get(url, headers=headers, timeout=30)
-                    if resp.status_code == 429:
-                        # Respect Retry-After header if present
-                        rate_limited = True
-                        ra = resp.headers.get('Retry-After')
-                        try:
-                            delay = int(ra)
-                        except Exception:
-                            # exponential backoff with jitter
-                            delay = min(2 ** attempt + random.random(), 60)
-                        print(f"⚠️  Rate limited (429). Waiting {delay:.1f}s before retry (attempt {attempt}/{max_attempts})...", file=sys.stderr)
-                        time.sleep(delay)
-                        continue
-                    resp.raise_for_status()
-                    break
-                except requests.RequestException as e:
-                    if attempt == max_attempts:
-                        raise
-                    backoff = min(2 ** attempt + random.random(), 60)
-                    print(f"⚠️  Request failed (attempt {attempt}/{max_attempts}): {e}. Backing off {backoff:.1f}s...", file=sys.stderr)
-                    time.sleep(backoff)
-                    continue
-
-            if resp is None:
-                # Shouldn't happen, but guard
-                break
+            # The shared HTTP layer paces Taostats calls and retries 429s / errors
+            resp = http_get(url, headers=headers, timeout=30, retries=max_attempts - 1)
 
             # Check if we're still rate limited after all retries
             if resp.status_code == 429:
                 print("❌ Still rate limited after all retries", file=sys.stderr)
                 return None, True
+            resp.raise_for_status()
 
             data = resp.json()
             
@@ -161,6 +133,9 @@ def fetch_block_time(num_blocks=25, max_attempts=4):
         
         return result, rate_limited
         
+    except BudgetExceeded as e:
+        print(f"⚠️  {e}", file=sys.stderr)
+        return None, True
     except Exception as e:
         print(f"❌ Failed to fetch blocks: {e}", file=sys.stderr)
         return None, False
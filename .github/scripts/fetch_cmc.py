@@ -1,15 +1,39 @@
 # CoinMarketCap API fetcher for Bittensor-Labs
 # Modular CMC data fetcher - stores various CMC data in Cloudflare KV
 # Uses CMC_API_TOKEN secret
+#
+# The endpoints are independent, so they are fetched concurrently and the
+# job waits at most CMC_DEADLINE_SECONDS for all of them. Whatever has
+# arrived by then is published; late or failed sections are None and listed
+# in `_missing`.
 
 import os
 import sys
-import json
-import requests
+import time
+import queue
+import threading
 from datetime import datetime, timezone
 
+from http_client import get as http_get
+from kv_client import client as kv_client
+
 CMC_BASE_URL = "https://pro-api.coinmarketcap.com"
 
+
+def _float_env(name, default):
+    v = os.getenv(name)
+    if v is None or v.strip() == '':
+        return default
+    try:
+        return float(v)
+    except Exception:
+        print(f"Warning: environment variable {name} is invalid ({v!r}), using default {default}", file=sys.stderr)
+        return default
+
+
+CMC_TIMEOUT = _float_env('CMC_TIMEOUT', 15.0)                     # per request
+CMC_DEADLINE_SECONDS = _float_env('CMC_DEADLINE_SECONDS', 20.0)   # whole fan-out
+
 def get_headers(api_key):
     return {
         "X-CMC_PRO_API_KEY": api_key,
@@ -19,7 +43,7 @@ def get_headers(api_key):
 def fetch_fear_and_greed(api_key):
     """Fetch CMC Fear & Greed Index"""
     url = f"{CMC_BASE_URL}/v3/fear-and-greed/latest"
-    resp = requests.get(url, headers=get_headers(api_key), timeout=15)
+    resp = http_get(url, headers=get_headers(api_key), timeout=CMC_TIMEOUT, retries=1)
     if resp.status_code != 200:
         raise Exception(f"CMC F&G API error: {resp.status_code} - {resp.text}")
     data = resp.json()
@@ -31,7 +55,7 @@ def fetch_tao_quote(api_key):
     """Fetch TAO price/market data from CMC"""
     url = f"{CMC_BASE_URL}/v2/cryptocurrency/quotes/latest"
     params = {"symbol": "TAO", "convert": "USD"}
-    resp = requests.get(url, headers=get_headers(api_key), params=params, timeout=15)
+    resp = http_get(url, headers=get_headers(api_key), params=params, timeout=CMC_TIMEOUT, retries=1)
     if resp.status_code != 200:
         raise Exception(f"CMC Quote API error: {resp.status_code} - {resp.text}")
     data = resp.json()
@@ -42,7 +66,7 @@ def fetch_tao_quote(api_key):
 def fetch_global_metrics(api_key):
     """Fetch global crypto market metrics from CMC"""
     url = f"{CMC_BASE_URL}/v1/global-metrics/quotes/latest"
-    resp = requests.get(url, headers=get_headers(api_key), timeout=15)
+    resp = http_get(url, headers=get_headers(api_key), timeout=CMC_TIMEOUT, retries=1)
     if resp.status_code != 200:
         raise Exception(f"CMC Global API error: {resp.status_code} - {resp.text}")
     data = resp.json()
@@ -63,6 +87,56 @@ def fetch_global_metrics(api_key):
 #         raise Exception("No data in CMC Trending response")
 #     return data['data']
 
+# Result key -> fetcher; every source is independent of the others
+SOURCES = {
+    'fear_and_greed': fetch_fear_and_greed,
+    'tao_quote': fetch_tao_quote,
+    'global_metrics': fetch_global_metrics,
+}
+
+
+def fetch_all(api_key, deadline=CMC_DEADLINE_SECONDS):
+    """
+    Run every SOURCES fetcher concurrently and wait at most `deadline` seconds.
+
+    Returns (data, errors): data maps each finished source to its payload,
+    errors maps failed or late sources to the reason. Workers are daemon
+    threads, so a source still hanging at the deadline cannot keep the job
+    (or the interpreter) alive.
+    """
+    done = queue.Queue()
+
+    def run(name, fetch):
+        t0 = time.perf_counter()
+        try:
+            done.put((name, fetch(api_key), None, time.perf_counter() - t0))
+        except Exception as e:
+            done.put((name, None, e, time.perf_counter() - t0))
+
+    for name, fetch in SOURCES.items():
+        threading.Thread(target=run, args=(name, fetch), name=f"cmc-{name}", daemon=True).start()
+
+    data, errors = {}, {}
+    end = time.monotonic() + deadline
+    while len(data) + len(errors) < len(SOURCES):
+        remaining = end - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            name, payload, error, elapsed = done.get(timeout=remaining)
+        except queue.Empty:
+            break
+        if error is None:
+            data[name] = payload
+        else:
+            errors[name] = str(error)
+        print(f"  {name}: {'ok' if error is None else 'failed'} in {elapsed * 1000:.0f}ms", file=sys.stderr)
+    for name in SOURCES:
+        if name not in data and name not in errors:
+            errors[name] = f"no response within {deadline:g}s deadline"
+    return data, errors
+
+
 def calculate_season(btc_dominance):
     """Calculate market season based on BTC dominance"""
     if btc_dominance is None:
@@ -75,14 +149,7 @@ def calculate_season(btc_dominance):
         return {'season': 'neutral', 'label': 'Neutral', 'btc_dominance': btc_dominance}
 
 def put_kv_json(account_id, api_token, namespace_id, key, obj):
-    url = f"https://api.cloudflare.com/client/v4/accounts/{account_id}/storage/kv/namespaces/{namespace_id}/values/{key}"
-    headers = {
-        "Authorization": f"Bearer {api_token}",
-        "Content-Type": "application/json",
-    }
-    data = json.dumps(obj)
-    resp = requests.put(url, headers=headers, data=data.encode('utf-8'), timeout=30)
-    return resp.status_code in (200, 204)
+    return kv_client(account_id, api_token, namespace_id).put_json(key, obj, compact=False)
 
 def main():
     # Environment variables
@@ -101,9 +168,14 @@ def main():
     now_iso = datetime.now(timezone.utc).isoformat()
     results = {}
 
-    # Fetch Fear & Greed
+    t0 = time.perf_counter()
+    raw, errors = fetch_all(cmc_key)
+    for name, error in errors.items():
+        print(f"CMC {name} fetch failed: {error}", file=sys.stderr)
+
+    # Fear & Greed
     try:
-        fng = fetch_fear_and_greed(cmc_key)
+        fng = raw['fear_and_greed']
         results['fear_and_greed'] = {
             'value': fng.get('value'),
             'value_classification': fng.get('value_classification'),
@@ -112,12 +184,13 @@ def main():
         }
         print(f"CMC F&G: {fng.get('value')} ({fng.get('value_classification')})")
     except Exception as e:
-        print(f"CMC F&G fetch failed: {e}", file=sys.stderr)
+        if 'fear_and_greed' not in errors:
+            print(f"CMC F&G parse failed: {e}", file=sys.stderr)
         results['fear_and_greed'] = None
 
-    # Fetch TAO quote (optional - for additional price source)
+    # TAO quote (optional - for additional price source)
     try:
-        tao = fetch_tao_quote(cmc_key)
+        tao = raw['tao_quote']
         quote = tao.get('quote', {}).get('USD', {})
         results['tao_quote'] = {
             'price': quote.get('price'),
@@ -130,13 +203,14 @@ def main():
         }
         print(f"CMC TAO: ${quote.get('price'):.2f}")
     except Exception as e:
-        print(f"CMC TAO quote fetch failed: {e}", file=sys.stderr)
+        if 'tao_quote' not in errors:
+            print(f"CMC TAO quote parse failed: {e}", file=sys.stderr)
         results['tao_quote'] = None
 
-    # Fetch global metrics (optional)
+    # Global metrics (optional)
     btc_dominance = None
     try:
-        global_data = fetch_global_metrics(cmc_key)
+        global_data = raw['global_metrics']
         quote = global_data.get('quote', {}).get('USD', {})
         btc_dominance = global_data.get('btc_dominance')
         results['global_metrics'] = {
@@ -150,7 +224,8 @@ def main():
         }
         print(f"CMC Global: BTC dominance {btc_dominance:.1f}%")
     except Exception as e:
-        print(f"CMC Global metrics fetch failed: {e}", file=sys.stderr)
+        if 'global_metrics' not in errors:
+            print(f"CMC Global metrics parse failed: {e}", file=sys.stderr)
         results['global_metrics'] = None
 
     # Calculate season indicator from BTC dominance
@@ -166,8 +241,12 @@ def main():
     # NOTE: Trending endpoint requires Startup tier ($79/mo) - skipped
     # results['trending'] = None
 
-    # Store in KV
+    # Store in KV (partial results are published; missing sections are None)
     results['_timestamp'] = now_iso
+    results['_missing'] = sorted(errors)
+    results['_fetch_ms'] = round((time.perf_counter() - t0) * 1000)
+    if errors:
+        print(f"Publishing partial CMC data (missing: {', '.join(sorted(errors))})", file=sys.stderr)
     ok = put_kv_json(account_id, cf_token, namespace_id, 'cmc_data', results)
     if not ok:
         print("Failed to write CMC data to KV", file=sys.stderr)
@@ -4,77 +4,207 @@ Calculate Network Decentralization Score for Bittensor.
 
 Reads existing KV data (distribution, validators, subnets) and computes:
 - Gini coefficients (wealth inequality)
-- Nakamoto coefficients (min entities for 51% control)
-- Concentration metrics (Top 10, Top 100)
+- Nakamoto coefficients (min entities for 33% / 51% / 67% control)
+- Concentration metrics (Top 10, Top 100, HHI, Theil, Lorenz curve)
 - Composite decentralization score
 
-No additional API calls needed - uses cached KV data.
+No additional API calls needed - uses cached KV data (including the
+compact `distribution_balances` artifact for exact wallet-level metrics).
 """
 
 import os
 import sys
 import json
-import urllib.request
-import urllib.error
+import time
+import hashlib
 from datetime import datetime, timezone
 from typing import List, Dict, Optional, Tuple
 
+import numpy as np
+
+from balances_codec import decode_balances
+from kv_client import client as kv_client
+
+# Control thresholds reported for every Nakamoto coefficient (33% = halt, 51% = control, 67% = finality)
+NAKAMOTO_THRESHOLDS = (0.33, 0.51, 0.67)
+# Lorenz curve resolution (number of population segments)
+LORENZ_POINTS = 20
+
+# Bump whenever score weights/inputs change (history entries record it, see backfill_decentralization_history.py)
+SCORE_VERSION = "1.5.0"  # 1.5.0: wallet Nakamoto measured against circulating supply
+# Daily history entries kept in decentralization_history
+HISTORY_MAX_DAYS = 365
+
+# Score weights (shared by the point estimate and the bootstrap)
+VALIDATOR_WEIGHTS = {"nakamoto": 0.55, "gini": 0.45}
+SUBNET_WEIGHTS = {"hhi": 0.35, "nakamoto": 0.35, "top_5": 0.30}
+COMPOSITE_WEIGHTS = {"wallet": 0.30, "validator": 0.30, "subnet": 0.40}
+VALIDATOR_NAKAMOTO_GOOD = 50  # 50 validators for 51% is good
+SUBNET_NAKAMOTO_GOOD = 20     # 20 subnets for 51% is good
+
+
+def _int_env(name, default):
+    v = os.getenv(name)
+    if v is None:
+        return default
+    v2 = v.strip()
+    if v2 == '':
+        return default
+    try:
+        return int(v2)
+    except Exception:
+        print(f"Warning: environment variable {name} is invalid ({v!r}), using default {default}", file=sys.stderr)
+        return default
+
+
+# Bootstrap confidence intervals: resamples per run, capped so resamples * n stays bounded
+BOOTSTRAP_RESAMPLES = _int_env('BOOTSTRAP_RESAMPLES', 2000)
+BOOTSTRAP_MAX_CELLS = _int_env('BOOTSTRAP_MAX_CELLS', 5_000_000)
+BOOTSTRAP_SEED = _int_env('BOOTSTRAP_SEED', 42)  # fixed seed keeps history replays reproducible
+BOOTSTRAP_LEVEL = 0.95
+
 
 def get_from_kv(account: str, token: str, namespace: str, key: str) -> Optional[Dict]:
     """Fetch a value from Cloudflare KV."""
-    url = f'https://api.cloudflare.com/client/v4/accounts/{account}/storage/kv/namespaces/{namespace}/values/{key}'
-    req = urllib.request.Request(url, method='GET', headers={
-        'Authorization': f'Bearer {token}',
-        'Accept': 'application/json'
-    })
+    return kv_client(account, token, namespace).get_json(key)
+
+
+def load_wallet_balances(distribution_data: Dict, blob: Optional[bytes]) -> Optional[np.ndarray]:
+    """
+    Decode the compact balances artifact published by fetch_distribution.py.
+
+    The artifact is only used if it matches the sketch stored in the
+    `distribution` payload (same sha256), so a stale or partial upload never
+    mixes with a newer distribution snapshot.
+    """
+    if not blob:
+        return None
+    sketch = (distribution_data or {}).get("balances_artifact") or {}
+    expected = sketch.get("sha256")
+    if expected and hashlib.sha256(blob).hexdigest() != expected:
+        print("⚠️ Balances artifact does not match distribution sketch - ignoring", file=sys.stderr)
+        return None
     try:
-        with urllib.request.urlopen(req, timeout=15) as resp:
-            if resp.status == 200:
-                return json.loads(resp.read())
-    except Exception as e:
-        print(f"⚠️ Failed to fetch {key} from KV: {e}", file=sys.stderr)
-    return None
+        return decode_balances(blob)
+    except ValueError as e:
+        print(f"⚠️ Failed to decode balances artifact: {e}", file=sys.stderr)
+        return None
 
 
 def put_to_kv(account: str, token: str, namespace: str, key: str, data: bytes) -> bool:
     """Store a value in Cloudflare KV."""
-    url = f'https://api.cloudflare.com/client/v4/accounts/{account}/storage/kv/namespaces/{namespace}/values/{key}'
-    req = urllib.request.Request(url, data=data, method='PUT', headers={
-        'Authorization': f'Bearer {token}',
-        'Content-Type': 'application/json'
-    })
-    try:
-        with urllib.request.urlopen(req, timeout=20) as resp:
-            if resp.status in (200, 201):
-                print(f"✅ KV PUT OK ({key})")
-                return True
-    except Exception as e:
-        print(f"⚠️ KV PUT failed: {e}", file=sys.stderr)
+    if kv_client(account, token, namespace).put_bytes(key, data):
+        print(f"✅ KV PUT OK ({key})")
+        return True
     return False
 
 
-def calculate_gini(values: List[float]) -> float:
+def concentration_metrics(
+    values,
+    total: Optional[float] = None,
+    thresholds: Tuple[float, ...] = NAKAMOTO_THRESHOLDS,
+    top_ns: Tuple[int, ...] = (5, 10, 100),
+    lorenz_points: int = LORENZ_POINTS,
+) -> Dict:
     """
-    Calculate Gini coefficient (0 = perfect equality, 1 = maximum inequality).
+    Compute every concentration metric from a single descending sort.
 
-    Formula: G = (2 * sum(i * x_i)) / (n * sum(x_i)) - (n + 1) / n
-    Where values are sorted ascending and i is 1-indexed.
+    The values are sorted once and all metrics are derived from the shared
+    cumulative sum C (C_k = sum of the k largest values):
+    - Gini:     2 * sum(C) / (n * sum) - (n + 1) / n
+    - Nakamoto: first k where C_k / total >= threshold (binary search)
+    - Top-N:    C_N / sum
+    - Lorenz:   bottom share at p = 1 - C_(n - p*n) / sum
+    - HHI and Theil from the normalized shares
+
+    Args:
+        values: Stakes/balances/emissions (list or NumPy array, non-negative)
+        total: Optional total for the Nakamoto thresholds. If None, uses sum(values).
+               IMPORTANT: For validators, pass actual total_stake, not just sum of top N!
+        thresholds: Control thresholds for the Nakamoto coefficients
+        top_ns: Entity counts for the top-N concentration shares
+        lorenz_points: Number of Lorenz-curve segments (returns lorenz_points + 1 points)
+
+    Scales to millions of entries (one O(n log n) sort, everything else O(n)).
     """
-    if not values or len(values) < 2:
-        return 0.0
+    arr = np.asarray(values, dtype=np.float64).ravel()
+    n = int(arr.size)
 
-    sorted_values = sorted(values)
-    n = len(sorted_values)
-    total = sum(sorted_values)
+    result = {
+        "count": n,
+        "sum": 0.0,
+        "gini": 0.0,
+        "hhi": 1.0,
+        "theil": 0.0,
+        "nakamoto": {_threshold_key(t): 0 for t in thresholds},
+        "top_concentration": {str(k): 0.0 for k in top_ns},
+        "lorenz": [],
+    }
+    if n == 0:
+        return result
+
+    desc = np.sort(arr)[::-1]
+    cumsum = np.cumsum(desc)
+    value_sum = float(cumsum[-1])
+    result["sum"] = value_sum
 
+    if total is None or total <= 0:
+        total = value_sum
+
+    # Nakamoto: minimum entities whose cumulative share reaches each threshold
     if total == 0:
-        return 0.0
+        result["nakamoto"] = {_threshold_key(t): n for t in thresholds}
+    else:
+        cum_share = cumsum / total
+        result["nakamoto"] = {
+            _threshold_key(t): min(int(np.searchsorted(cum_share, t, side='left')) + 1, n)
+            for t in thresholds
+        }
+
+    if value_sum == 0:
+        return result
+
+    if n >= 2:
+        gini = (2 * float(cumsum.sum())) / (n * value_sum) - (n + 1) / n
+        result["gini"] = round(max(0.0, min(1.0, gini)), 4)
+
+    shares = desc / value_sum
+    result["hhi"] = round(float(np.dot(shares, shares)), 6)
+
+    # Theil T index: mean of (x/mu) * ln(x/mu), zero balances contribute 0
+    ratios = shares[shares > 0] * n
+    result["theil"] = round(float(np.dot(ratios, np.log(ratios)) / n), 4)
+
+    result["top_concentration"] = {
+        str(k): round(float(cumsum[min(k, n) - 1]) / value_sum, 4) for k in top_ns
+    }
+
+    # Lorenz curve: cumulative wealth share held by the bottom p of entities
+    if lorenz_points > 0:
+        padded = np.concatenate(([0.0], cumsum))
+        pop = np.linspace(0.0, 1.0, lorenz_points + 1)
+        bottom_counts = np.rint(pop * n).astype(np.int64)
+        wealth = 1.0 - padded[n - bottom_counts] / value_sum
+        result["lorenz"] = [[round(float(p), 4), round(float(w), 4)] for p, w in zip(pop, wealth)]
 
-    # Calculate using the standard formula
-    cumsum = sum((i + 1) * v for i, v in enumerate(sorted_values))
-    gini = (2 * cumsum) / (n * total) - (n + 1) / n
+    return result
+
+
+def _threshold_key(threshold: float) -> str:
+    """Format a control threshold as a percentage key (0.51 -> "51")."""
+    return str(int(round(threshold * 100)))
+
+
+def calculate_gini(values: List[float]) -> float:
+    """
+    Calculate Gini coefficient (0 = perfect equality, 1 = maximum inequality).
 
-    return round(max(0.0, min(1.0, gini)), 4)
+    Formula: G = (2 * sum(i * x_i)) / (n * sum(x_i)) - (n + 1) / n
+    Where values are sorted ascending and i is 1-indexed.
+    """
+    if not len(values) or len(values) < 2:
+        return 0.0
+    return concentration_metrics(values, lorenz_points=0)["gini"]
 
 
 def calculate_nakamoto(values: List[float], threshold: float = 0.51, total: float = None) -> int:
@@ -89,25 +219,10 @@ def calculate_nakamoto(values: List[float], threshold: float = 0.51, total: floa
         total: Optional total to calculate against. If None, uses sum(values).
                IMPORTANT: For validators, pass actual total_stake, not just sum of top N!
     """
-    if not values:
+    if not len(values):
         return 0
-
-    sorted_desc = sorted(values, reverse=True)
-
-    # Use provided total, or fall back to sum of values
-    if total is None or total <= 0:
-        total = sum(sorted_desc)
-
-    if total == 0:
-        return len(sorted_desc)
-
-    cumulative = 0.0
-    for i, v in enumerate(sorted_desc):
-        cumulative += v
-        if cumulative / total >= threshold:
-            return i + 1
-
-    return len(sorted_desc)
+    metrics = concentration_metrics(values, total=total, thresholds=(threshold,), lorenz_points=0)
+    return metrics["nakamoto"][_threshold_key(threshold)]
 
 
 def calculate_hhi(shares: List[float]) -> float:
@@ -119,35 +234,19 @@ def calculate_hhi(shares: List[float]) -> float:
 
     For decentralization: lower is better.
     """
-    if not shares:
-        return 1.0
-
-    # Normalize to ensure shares sum to 1
-    total = sum(shares)
-    if total == 0:
+    if not len(shares):
         return 1.0
-
-    normalized = [s / total for s in shares]
-    hhi = sum(s ** 2 for s in normalized)
-
-    return round(hhi, 6)
+    return concentration_metrics(shares, lorenz_points=0)["hhi"]
 
 
 def calculate_top_concentration(values: List[float], top_n: int = 10) -> float:
     """
     Calculate what percentage of total is held by top N entities.
     """
-    if not values:
-        return 0.0
-
-    sorted_desc = sorted(values, reverse=True)
-    total = sum(sorted_desc)
-
-    if total == 0:
+    if not len(values):
         return 0.0
-
-    top_sum = sum(sorted_desc[:top_n])
-    return round(top_sum / total, 4)
+    metrics = concentration_metrics(values, top_ns=(top_n,), lorenz_points=0)
+    return metrics["top_concentration"][str(top_n)]
 
 
 def score_from_gini(gini: float) -> float:
@@ -182,12 +281,31 @@ def score_from_hhi(hhi: float) -> float:
     return round((1 - hhi) * 100, 1)
 
 
-def analyze_wallets(distribution_data: Dict) -> Dict:
-    """Analyze wallet distribution for decentralization metrics."""
+def circulating_supply_from(latest) -> Optional[float]:
+    """Circulating supply (TAO) from a `taostats_latest` payload, None when unavailable."""
+    if isinstance(latest, list):
+        latest = latest[-1] if latest else None
+    try:
+        supply = float((latest or {}).get("circulating_supply") or 0)
+    except (TypeError, ValueError):
+        return None
+    return supply if supply > 0 else None
+
+
+def analyze_wallets(distribution_data: Dict, balances: Optional[np.ndarray] = None,
+                    circulating_supply: Optional[float] = None) -> Dict:
+    """
+    Analyze wallet distribution for decentralization metrics.
+
+    With the raw balance sample (distribution_balances artifact) the wallet
+    score uses exact Gini / Nakamoto like the validator score. Without it we
+    fall back to the bracket-based whale estimate.
 
-    # We don't have raw balances in KV, but we have percentile thresholds
-    # For Gini/Nakamoto we'd need the actual balance list
-    # Let's use what we have: brackets and percentiles
+    Nakamoto thresholds are measured against the circulating supply when it
+    is known (TAO outside the sample counts towards the total, as with the
+    validators' total_stake); otherwise against the sample sum, which
+    understates the coefficient. `nakamoto_basis` records which was used.
+    """
 
     result = {
         "source": "distribution",
@@ -220,16 +338,67 @@ def analyze_wallets(distribution_data: Dict) -> Dict:
         "percentage": whale_pct
     }
 
+    if balances is not None and len(balances) >= 2:
+        # Exact metrics over the sampled balances (top wallets by balance)
+        sample_sum = float(np.sum(balances))
+        use_supply = bool(circulating_supply) and circulating_supply > sample_sum
+        metrics = concentration_metrics(balances, total=circulating_supply if use_supply else None,
+                                        top_ns=(10, 100))
+        gini = metrics["gini"]
+        nakamoto = metrics["nakamoto"]["51"]
+
+        result["method"] = "balances"
+        result["balances_count"] = metrics["count"]
+        result["balances_sum"] = round(metrics["sum"], 2)
+        result["gini"] = gini
+        result["nakamoto_coefficient"] = nakamoto
+        result["nakamoto_thresholds"] = metrics["nakamoto"]
+        result["nakamoto_basis"] = "circulating_supply" if use_supply else "sample"
+        if use_supply:
+            result["circulating_supply"] = round(circulating_supply, 2)
+        result["hhi"] = metrics["hhi"]
+        result["theil"] = metrics["theil"]
+        result["top_10_concentration"] = metrics["top_concentration"]["10"]
+        result["top_100_concentration"] = metrics["top_concentration"]["100"]
+        result["lorenz"] = metrics["lorenz"]
+
+        # Same weighting as the validator score: Nakamoto 55%, Gini 45%
+        gini_score = score_from_gini(gini)
+        nakamoto_score = score_from_nakamoto(nakamoto, max_good=100)  # 100 wallets for 51% is good
+        result["wallet_score"] = round(nakamoto_score * 0.55 + gini_score * 0.45, 1)
+        return result
+
     # Estimate a "wallet concentration score" based on available data
     # Lower whale concentration = more decentralized
     # If 0.07% hold >10k TAO, that's fairly concentrated
     # Score: 100 - (whale_pct * 100) with some scaling
     whale_score = max(0, 100 - (whale_pct * 500))  # Scale: 0.2% whales = 0 score
+    result["method"] = "brackets"
     result["wallet_score"] = round(whale_score, 1)
 
     return result
 
 
+def _validator_stakes(validator_data: Dict) -> List[float]:
+    """
+    Positive validator stakes (TAO) from a top_validators payload.
+
+    Uses the full snapshot stake vector (`all_stakes`) when present and
+    falls back to the top N list for older payloads.
+    """
+    all_stakes = validator_data.get("all_stakes")
+    if all_stakes:
+        return [s for s in all_stakes if s and s > 0]
+    validators = validator_data.get("top_validators", []) or []
+    return [v.get("stake", 0) for v in validators if v.get("stake", 0) > 0]
+
+
+def _subnet_emissions(subnet_data: Dict) -> List[float]:
+    """Positive daily emission estimates from a top_subnets payload."""
+    all_subnets = subnet_data.get("all_subnets", []) or []
+    return [s.get("estimated_emission_daily", 0) for s in all_subnets if s.get("estimated_emission_daily", 0) > 0]
+
+
 def analyze_validators(validator_data: Dict) -> Dict:
     """Analyze validator stake distribution for decentralization metrics."""
 
@@ -248,24 +417,34 @@ def analyze_validators(validator_data: Dict) -> Dict:
         return result
 
     # Extract stakes
-    stakes = [v.get("stake", 0) for v in validators if v.get("stake", 0) > 0]
+    stakes = _validator_stakes(validator_data)
 
     if stakes:
-        # Calculate metrics
-        gini = calculate_gini(stakes)
+        # Calculate all metrics from a single sort
         # IMPORTANT: Use total_stake from API, not just sum of top 100!
-        # This gives the TRUE Nakamoto coefficient against all network stake
-        nakamoto = calculate_nakamoto(stakes, total=total_stake)
+        # This gives the TRUE Nakamoto coefficient against all network stake.
+        # With a complete snapshot (`all_stakes`), Gini covers every validator too.
+        metrics = concentration_metrics(stakes, total=total_stake, top_ns=(10,))
+        gini = metrics["gini"]
+        nakamoto = metrics["nakamoto"]["51"]
+
+        result["validators_analyzed"] = len(stakes)
+        result["stake_coverage"] = round(metrics["sum"] / total_stake, 4) if total_stake else None
+        result["complete_set"] = bool(validator_data.get("complete"))
 
         result["gini"] = gini
         result["nakamoto_coefficient"] = nakamoto
+        result["nakamoto_thresholds"] = metrics["nakamoto"]
+        result["theil"] = metrics["theil"]
+        result["top_10_stake_concentration"] = metrics["top_concentration"]["10"]
+        result["lorenz"] = metrics["lorenz"]
 
         # Composite validator score (Nakamoto + Gini only)
         gini_score = score_from_gini(gini)
-        nakamoto_score = score_from_nakamoto(nakamoto, max_good=50)  # 50 validators for 51% is good
+        nakamoto_score = score_from_nakamoto(nakamoto, max_good=VALIDATOR_NAKAMOTO_GOOD)
 
         # Weight: Nakamoto most important (55%), Gini secondary (45%)
-        validator_score = (nakamoto_score * 0.55 + gini_score * 0.45)
+        validator_score = (nakamoto_score * VALIDATOR_WEIGHTS["nakamoto"] + gini_score * VALIDATOR_WEIGHTS["gini"])
         result["validator_score"] = round(validator_score, 1)
     else:
         result["validator_score"] = 50.0
@@ -290,24 +469,30 @@ def analyze_subnets(subnet_data: Dict) -> Dict:
         return result
 
     # Extract emission shares
-    emissions = [s.get("estimated_emission_daily", 0) for s in all_subnets if s.get("estimated_emission_daily", 0) > 0]
+    emissions = _subnet_emissions(subnet_data)
 
     if emissions:
-        # Calculate HHI for emission distribution
-        hhi = calculate_hhi(emissions)
-        nakamoto = calculate_nakamoto(emissions)
-        top_5_conc = calculate_top_concentration(emissions, 5)
+        # Calculate HHI, Nakamoto and Top-5 share for emission distribution from a single sort
+        metrics = concentration_metrics(emissions, top_ns=(5,))
+        hhi = metrics["hhi"]
+        nakamoto = metrics["nakamoto"]["51"]
+        top_5_conc = metrics["top_concentration"]["5"]
 
         result["emission_hhi"] = hhi
         result["nakamoto_coefficient"] = nakamoto
+        result["nakamoto_thresholds"] = metrics["nakamoto"]
         result["top_5_emission_concentration"] = top_5_conc
+        result["emission_gini"] = metrics["gini"]
+        result["emission_theil"] = metrics["theil"]
+        result["lorenz"] = metrics["lorenz"]
 
         # Composite subnet score
         hhi_score = score_from_hhi(hhi)
-        nakamoto_score = score_from_nakamoto(nakamoto, max_good=20)  # 20 subnets for 51% is good
+        nakamoto_score = score_from_nakamoto(nakamoto, max_good=SUBNET_NAKAMOTO_GOOD)
         conc_score = (1 - top_5_conc) * 100
 
-        subnet_score = (hhi_score * 0.35 + nakamoto_score * 0.35 + conc_score * 0.30)
+        subnet_score = (hhi_score * SUBNET_WEIGHTS["hhi"] + nakamoto_score * SUBNET_WEIGHTS["nakamoto"]
+                        + conc_score * SUBNET_WEIGHTS["top_5"])
         result["subnet_score"] = round(subnet_score, 1)
     else:
         result["subnet_score"] = 50.0
@@ -331,9 +516,9 @@ def calculate_composite_score(wallet_analysis: Dict, validator_analysis: Dict, s
 
     # Weighting: Subnets are TAO's core differentiator
     composite = (
-        wallet_score * 0.30 +
-        validator_score * 0.30 +
-        subnet_score * 0.40
+        wallet_score * COMPOSITE_WEIGHTS["wallet"] +
+        validator_score * COMPOSITE_WEIGHTS["validator"] +
+        subnet_score * COMPOSITE_WEIGHTS["subnet"]
     )
 
     # Determine rating
@@ -353,15 +538,149 @@ def calculate_composite_score(wallet_analysis: Dict, validator_analysis: Dict, s
         "rating": rating,
         "components": {
             "wallet_score": wallet_score,
-            "wallet_weight": 0.30,
+            "wallet_weight": COMPOSITE_WEIGHTS["wallet"],
             "validator_score": validator_score,
-            "validator_weight": 0.30,
+            "validator_weight": COMPOSITE_WEIGHTS["validator"],
             "subnet_score": subnet_score,
-            "subnet_weight": 0.40
+            "subnet_weight": COMPOSITE_WEIGHTS["subnet"]
         }
     }
 
 
+def _bootstrap_matrix(values, resamples: int, rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Draw bootstrap resamples (rows) of values in one pass.
+
+    Returns the rows sorted descending and their cumulative sums, so every
+    metric below is computed column-wise without Python loops.
+    """
+    arr = np.asarray(values, dtype=np.float64)
+    idx = rng.integers(0, arr.size, size=(resamples, arr.size))
+    rows = np.sort(arr[idx], axis=1)[:, ::-1]
+    return rows, np.cumsum(rows, axis=1)
+
+
+def _nakamoto_rows(cumsum: np.ndarray, totals: np.ndarray, threshold: float = 0.51) -> np.ndarray:
+    """Per-row Nakamoto coefficient (same rule as concentration_metrics)."""
+    n = cumsum.shape[1]
+    below = (cumsum / totals[:, None]) < threshold
+    return np.minimum(below.sum(axis=1) + 1, n)
+
+
+def bootstrap_validator_scores(stakes, total_stake: float, resamples: int, rng: np.random.Generator) -> np.ndarray:
+    """Bootstrap distribution of validator_score (Nakamoto + Gini)."""
+    rows, cumsum = _bootstrap_matrix(stakes, resamples, rng)
+    n = rows.shape[1]
+    sums = cumsum[:, -1]
+    gini = np.clip(2 * cumsum.sum(axis=1) / (n * sums) - (n + 1) / n, 0.0, 1.0) if n >= 2 else np.zeros(resamples)
+    # Stake outside the sample (beyond the top N) scales with each resample
+    base = float(np.sum(stakes))
+    totals = sums * (total_stake / base) if total_stake and total_stake > base else sums
+    nakamoto = _nakamoto_rows(cumsum, totals)
+    nakamoto_score = np.minimum(nakamoto / VALIDATOR_NAKAMOTO_GOOD, 1.0) * 100
+    gini_score = (1 - gini) * 100
+    return nakamoto_score * VALIDATOR_WEIGHTS["nakamoto"] + gini_score * VALIDATOR_WEIGHTS["gini"]
+
+
+def bootstrap_subnet_scores(emissions, resamples: int, rng: np.random.Generator) -> np.ndarray:
+    """Bootstrap distribution of subnet_score (HHI + Nakamoto + Top-5 share)."""
+    rows, cumsum = _bootstrap_matrix(emissions, resamples, rng)
+    n = rows.shape[1]
+    sums = cumsum[:, -1]
+    shares = rows / sums[:, None]
+    hhi = np.einsum('ij,ij->i', shares, shares)
+    nakamoto = _nakamoto_rows(cumsum, sums)
+    top_5 = cumsum[:, min(5, n) - 1] / sums
+    hhi_score = (1 - hhi) * 100
+    nakamoto_score = np.minimum(nakamoto / SUBNET_NAKAMOTO_GOOD, 1.0) * 100
+    conc_score = (1 - top_5) * 100
+    return (hhi_score * SUBNET_WEIGHTS["hhi"] + nakamoto_score * SUBNET_WEIGHTS["nakamoto"]
+            + conc_score * SUBNET_WEIGHTS["top_5"])
+
+
+def _interval(samples: np.ndarray, level: float = BOOTSTRAP_LEVEL) -> Dict:
+    """Percentile confidence interval summary for a bootstrap sample."""
+    alpha = (1 - level) / 2
+    low, high = np.quantile(samples, [alpha, 1 - alpha])
+    return {
+        "low": round(float(low), 1),
+        "high": round(float(high), 1),
+        "std": round(float(np.std(samples)), 2),
+        "level": level,
+    }
+
+
+def bootstrap_confidence_intervals(validator_data: Dict, subnet_data: Dict, wallet_score: float,
+                                   resamples: int = BOOTSTRAP_RESAMPLES, seed: int = BOOTSTRAP_SEED) -> Dict:
+    """
+    Bootstrap confidence intervals for validator_score, subnet_score and composite_score.
+
+    Validators are only the top N from Taostats and subnet emissions are
+    estimates, so both are resampled with replacement (all resamples in one
+    NumPy pass per component). The wallet score is treated as fixed. The
+    number of resamples is capped so resamples * n <= BOOTSTRAP_MAX_CELLS,
+    keeping the cost per run bounded; the elapsed time is reported.
+    """
+    t0 = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    stakes = _validator_stakes(validator_data)
+    emissions = _subnet_emissions(subnet_data)
+    result = {"resamples": 0}
+    if len(stakes) < 2 or len(emissions) < 2 or resamples <= 0:
+        return result
+
+    resamples = max(1, min(resamples, BOOTSTRAP_MAX_CELLS // max(len(stakes), len(emissions))))
+    v_scores = bootstrap_validator_scores(stakes, validator_data.get("total_stake", 0), resamples, rng)
+    s_scores = bootstrap_subnet_scores(emissions, resamples, rng)
+    composite = (wallet_score * COMPOSITE_WEIGHTS["wallet"] + v_scores * COMPOSITE_WEIGHTS["validator"]
+                 + s_scores * COMPOSITE_WEIGHTS["subnet"])
+
+    result.update({
+        "validator_score": _interval(v_scores),
+        "subnet_score": _interval(s_scores),
+        "composite_score": _interval(composite),
+        "resamples": resamples,
+        "elapsed_ms": round((time.perf_counter() - t0) * 1000, 1),
+    })
+    return result
+
+
+def build_history_entry(date: str, composite: Dict, wallet_analysis: Dict,
+                        validator_analysis: Dict, subnet_analysis: Dict) -> Dict:
+    """Build the compact daily entry stored in decentralization_history."""
+    entry = {
+        "date": date,
+        "score": composite["composite_score"],
+        "rating": composite["rating"],
+        "wallet_score": wallet_analysis.get("wallet_score"),
+        "validator_score": validator_analysis.get("validator_score"),
+        "subnet_score": subnet_analysis.get("subnet_score"),
+        "wallet_nakamoto": wallet_analysis.get("nakamoto_coefficient"),
+        "validator_nakamoto": validator_analysis.get("nakamoto_coefficient"),
+        "subnet_nakamoto": subnet_analysis.get("nakamoto_coefficient"),
+        "wallet_nakamoto_basis": wallet_analysis.get("nakamoto_basis"),
+        "version": SCORE_VERSION,
+    }
+    ci = composite.get("confidence_interval")
+    if ci:
+        entry["score_low"] = ci["low"]
+        entry["score_high"] = ci["high"]
+    return entry
+
+
+def merge_history_entries(entries: List[Dict], new_entries: List[Dict]) -> List[Dict]:
+    """
+    Merge daily entries into history (idempotent).
+
+    New entries replace existing ones with the same date; result is sorted
+    newest first and trimmed to HISTORY_MAX_DAYS.
+    """
+    by_date = {e.get("date"): e for e in entries if e.get("date")}
+    for e in new_entries:
+        by_date[e["date"]] = e
+    return sorted(by_date.values(), key=lambda x: x.get("date", ""), reverse=True)[:HISTORY_MAX_DAYS]
+
+
 def main():
     print("🔍 Bittensor Network Decentralization Score Calculator", file=sys.stderr)
     print("=" * 55, file=sys.stderr)
@@ -375,17 +694,25 @@ def main():
         print("❌ Missing Cloudflare KV credentials", file=sys.stderr)
         sys.exit(1)
 
-    # Fetch existing data from KV
+    # Fetch existing data from KV: every JSON input in one bulk read, the binary artifact separately
     print("\n📊 Fetching data from KV...", file=sys.stderr)
+    kv = kv_client(cf_acc, cf_token, cf_ns)
+    inputs = kv.get_many(['distribution', 'top_validators', 'top_subnets', 'decentralization_history',
+                          'taostats_latest'])
 
-    distribution_data = get_from_kv(cf_acc, cf_token, cf_ns, 'distribution')
-    validator_data = get_from_kv(cf_acc, cf_token, cf_ns, 'top_validators')
-    subnet_data = get_from_kv(cf_acc, cf_token, cf_ns, 'top_subnets')
+    distribution_data = inputs['distribution']
+    balances_key = ((distribution_data or {}).get('balances_artifact') or {}).get('key', 'distribution_balances')
+    wallet_balances = load_wallet_balances(distribution_data, kv.get_bytes(balances_key))
+    validator_data = inputs['top_validators']
+    subnet_data = inputs['top_subnets']
 
     # Analyze each dimension
     print("\n🔢 Analyzing wallet distribution...", file=sys.stderr)
-    wallet_analysis = analyze_wallets(distribution_data or {})
-    print(f"   Wallet Score: {wallet_analysis.get('wallet_score', 'N/A')}", file=sys.stderr)
+    wallet_analysis = analyze_wallets(distribution_data or {}, wallet_balances,
+                                      circulating_supply_from(inputs['taostats_latest']))
+    print(f"   Wallet Score: {wallet_analysis.get('wallet_score', 'N/A')} ({wallet_analysis.get('method')})", file=sys.stderr)
+    if wallet_analysis.get('gini'):
+        print(f"   Gini: {wallet_analysis['gini']}, Nakamoto: {wallet_analysis.get('nakamoto_coefficient')}", file=sys.stderr)
 
     print("\n🔢 Analyzing validator distribution...", file=sys.stderr)
     validator_analysis = analyze_validators(validator_data or {})
@@ -403,8 +730,19 @@ def main():
     print("\n📈 Calculating composite score...", file=sys.stderr)
     composite = calculate_composite_score(wallet_analysis, validator_analysis, subnet_analysis)
 
+    # Bootstrap confidence intervals (validators = top N only, subnet emissions = estimates)
+    bootstrap = bootstrap_confidence_intervals(validator_data or {}, subnet_data or {}, wallet_analysis.get("wallet_score", 50))
+    if bootstrap.get("resamples"):
+        validator_analysis["validator_score_ci"] = bootstrap["validator_score"]
+        subnet_analysis["subnet_score_ci"] = bootstrap["subnet_score"]
+        composite["confidence_interval"] = bootstrap["composite_score"]
+        print(f"   {bootstrap['resamples']} bootstrap resamples in {bootstrap['elapsed_ms']} ms", file=sys.stderr)
+
     print(f"\n{'='*55}", file=sys.stderr)
     print(f"🎯 Network Decentralization Score: {composite['composite_score']}/100", file=sys.stderr)
+    if composite.get("confidence_interval"):
+        ci = composite["confidence_interval"]
+        print(f"   {int(ci['level'] * 100)}% CI: {ci['low']} - {ci['high']}", file=sys.stderr)
     print(f"   Rating: {composite['rating']}", file=sys.stderr)
     print(f"{'='*55}", file=sys.stderr)
 
@@ -414,55 +752,39 @@ def main():
         "score": composite["composite_score"],
         "rating": composite["rating"],
         "components": composite["components"],
+        "score_ci": composite.get("confidence_interval"),
+        "bootstrap": {k: bootstrap[k] for k in ("resamples", "elapsed_ms") if k in bootstrap},
         "wallet_analysis": wallet_analysis,
         "validator_analysis": validator_analysis,
         "subnet_analysis": subnet_analysis,
         "last_updated": now_iso,
         "_source": "decentralization_calculator",
-        "_version": "1.3.0"
+        "_version": SCORE_VERSION
     }
 
-    # Save to KV
-    print("\n💾 Saving to KV...", file=sys.stderr)
-    data = json.dumps(result).encode('utf-8')
-    put_to_kv(cf_acc, cf_token, cf_ns, 'decentralization_score', data)
-
-    # Save to history (append daily entry)
-    print("📜 Updating history...", file=sys.stderr)
+    # Update history (append daily entry)
+    print("\n📜 Updating history...", file=sys.stderr)
     today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
-    history_entry = {
-        "date": today,
-        "score": composite["composite_score"],
-        "rating": composite["rating"],
-        "wallet_score": wallet_analysis.get("wallet_score"),
-        "validator_score": validator_analysis.get("validator_score"),
-        "subnet_score": subnet_analysis.get("subnet_score"),
-        "validator_nakamoto": validator_analysis.get("nakamoto_coefficient"),
-        "subnet_nakamoto": subnet_analysis.get("nakamoto_coefficient"),
-    }
-
-    # Fetch existing history
-    history = get_from_kv(cf_acc, cf_token, cf_ns, 'decentralization_history') or {"entries": []}
-    entries = history.get("entries", [])
+    history_entry = build_history_entry(today, composite, wallet_analysis, validator_analysis, subnet_analysis)
 
-    # Update or append today's entry (avoid duplicates)
-    existing_dates = {e.get("date") for e in entries}
-    if today in existing_dates:
-        entries = [e if e.get("date") != today else history_entry for e in entries]
-    else:
-        entries.append(history_entry)
-
-    # Keep last 365 days
-    entries = sorted(entries, key=lambda x: x.get("date", ""), reverse=True)[:365]
+    # Update or append today's entry in the history read above (avoid duplicates)
+    history = inputs['decentralization_history'] or {"entries": []}
+    entries = merge_history_entries(history.get("entries", []), [history_entry])
 
     history_data = {
         "entries": entries,
         "last_updated": now_iso,
         "_source": "decentralization_calculator"
     }
-    put_to_kv(cf_acc, cf_token, cf_ns, 'decentralization_history', json.dumps(history_data).encode('utf-8'))
     print(f"   History: {len(entries)} entries", file=sys.stderr)
 
+    # Save score and history to KV in one bulk write
+    print("💾 Saving to KV...", file=sys.stderr)
+    if kv.put_many({'decentralization_score': result, 'decentralization_history': history_data}, compact=False):
+        print("✅ KV PUT OK (decentralization_score, decentralization_history)")
+    else:
+        print("⚠️ KV PUT failed for decentralization_score / decentralization_history", file=sys.stderr)
+
     # Output JSON
     print(json.dumps(result, indent=2))
 
@@ -4,23 +4,27 @@
 
 import os
 import sys
-import json
-import requests
 from datetime import datetime, timezone
 
+from http_client import get as http_get
+from kv_client import client as kv_client
+
 # wTAO contract address on Ethereum
 WTAO_CONTRACT = "0x77E06c9eCCf2E797fd462A92B6D7642EF85b0A44"
 
 def fetch_dexscreener_pairs():
-    """Fetch wTAO pairs from DexScreener (free API, no key needed)"""
+    """Fetch wTAO pairs from DexScreener (free API, no key needed); also returns when they were fetched"""
     url = f"https://api.dexscreener.com/latest/dex/tokens/{WTAO_CONTRACT}"
-    resp = requests.get(url, timeout=15)
+    resp = http_get(url, timeout=15, cache=True, allow_stale=True)
     if resp.status_code != 200:
         raise Exception(f"DexScreener API error: {resp.status_code}")
     data = resp.json()
     if not data or 'pairs' not in data:
         raise Exception("No pairs in DexScreener response")
-    return data['pairs'], 'dexscreener'
+    fetched_at = datetime.fromtimestamp(resp.fetched_at, timezone.utc).isoformat()
+    if resp.from_cache == 'stale':
+        print(f"DexScreener unavailable, using cached pairs from {fetched_at}", file=sys.stderr)
+    return data['pairs'], 'dexscreener', fetched_at
 
 def process_dexscreener_pairs(pairs):
     """Process DexScreener pairs into our standard format"""
@@ -56,14 +60,7 @@ def process_dexscreener_pairs(pairs):
     return processed, total_volume, total_liquidity
 
 def put_kv_json(account_id, api_token, namespace_id, key, obj):
-    url = f"https://api.cloudflare.com/client/v4/accounts/{account_id}/storage/kv/namespaces/{namespace_id}/values/{key}"
-    headers = {
-        "Authorization": f"Bearer {api_token}",
-        "Content-Type": "application/json",
-    }
-    data = json.dumps(obj)
-    resp = requests.put(url, headers=headers, data=data.encode('utf-8'), timeout=30)
-    return resp.status_code in (200, 204)
+    return kv_client(account_id, api_token, namespace_id).put_json(key, obj, compact=False)
 
 def main():
     # Environment variables (CMC key optional for DexScreener)
@@ -80,7 +77,7 @@ def main():
 
     # Fetch wTAO DEX pairs from DexScreener
     try:
-        raw_pairs, source = fetch_dexscreener_pairs()
+        raw_pairs, source, fetched_at = fetch_dexscreener_pairs()
         processed_pairs, total_volume, total_liquidity = process_dexscreener_pairs(raw_pairs)
 
         # Sort by volume and take top pairs
@@ -105,6 +102,7 @@ def main():
             print(f"DEX: wTAO price: ${best_pair.get('price_usd'):.2f}")
 
         results['_source'] = source
+        results['_timestamp'] = fetched_at
 
     except Exception as e:
         print(f"DexScreener fetch failed: {e}", file=sys.stderr)
@@ -113,8 +111,8 @@ def main():
         results['total_liquidity'] = 0
         results['_source'] = 'error'
 
-    # Add metadata
-    results['_timestamp'] = now_iso
+    # Add metadata (the fetch time of the pairs, so a stale cache copy keeps its age)
+    results.setdefault('_timestamp', now_iso)
 
     # Store in KV
     ok = put_kv_json(account_id, cf_token, namespace_id, 'dex_data', results)
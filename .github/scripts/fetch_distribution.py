@@ -4,6 +4,7 @@ Fetch TAO Distribution Statistics - Hybrid SDK/Taostats approach.
 - Uses Bittensor SDK for total wallet count (NumStakingColdkeys)
 - Uses Taostats API for top wallet balances (sample)
 - Calculates holder percentiles and wallet size brackets
+- Writes the balance sample as a compact binary artifact (see balances_codec.py)
 
 Rate limits (Taostats): 5 requests/min, 10k requests/month
 Strategy: Dynamic pages (25-100) based on SDK wallet count, run weekly
@@ -12,10 +13,11 @@ Strategy: Dynamic pages (25-100) based on SDK wallet count, run weekly
 import os
 import sys
 import json
-import time
-import requests
 from datetime import datetime, timezone
 
+from balances_codec import encode_balances, build_sketch
+from http_client import BudgetExceeded, get as http_get
+
 # Try to import bittensor SDK
 try:
     import bittensor as bt
@@ -32,6 +34,10 @@ NETWORK = os.getenv("NETWORK", "finney")
 BRACKETS = [100000, 50000, 10000, 1000, 500, 250, 100, 50, 25, 10, 5, 1, 0.1]
 PERCENTILES = [10, 5, 3, 1]  # Top X%
 
+# Compact binary balances artifact (read by fetch_decentralization.py)
+BALANCES_KV_KEY = "distribution_balances"
+BALANCES_FILE = "distribution_balances.bin"
+
 # Global to store total wallet count
 total_wallet_count = 0
 sdk_wallet_count = None  # From SDK if available
@@ -89,7 +95,8 @@ def fetch_wallets(max_pages=100, page_size=200):
 
     Taostats API returns max 200 per page.
     100 pages = 20k wallets = enough for Top 10% of ~200k total.
-    Respects rate limits: 13s between requests (5/min safe)
+    Pages are paced by the shared HTTP layer's Taostats token bucket (5/min),
+    which also retries 429s (honouring Retry-After) and transient errors.
     """
     global total_wallet_count
 
@@ -115,15 +122,7 @@ def fetch_wallets(max_pages=100, page_size=200):
         print(f"📊 Fetching page {page}/{max_pages}... ({len(all_balances)} wallets so far)", file=sys.stderr)
 
         try:
-            resp = requests.get(url, headers=headers, timeout=60)
-
-            # Handle rate limiting
-            if resp.status_code == 429:
-                retry_after = int(resp.headers.get('Retry-After', 60))
-                print(f"⚠️ Rate limited, waiting {retry_after}s...", file=sys.stderr)
-                time.sleep(retry_after)
-                continue
-
+            resp = http_get(url, headers=headers, timeout=60)
             resp.raise_for_status()
             data = resp.json()
             consecutive_errors = 0  # Reset on success
@@ -163,11 +162,12 @@ def fetch_wallets(max_pages=100, page_size=200):
 
             page += 1
 
-            # Rate limit: 5 requests/min = 12s between, use 13s to be safe
-            if page <= max_pages:
-                print(f"   ⏳ Rate limit pause (13s)...", file=sys.stderr)
-                time.sleep(13)
-
+        except BudgetExceeded as e:
+            print(f"⚠️ {e}", file=sys.stderr)
+            if len(all_balances) >= min_wallets_for_graceful:
+                print(f"🔄 Graceful degradation: Using {len(all_balances)} wallets already fetched", file=sys.stderr)
+                break
+            return None
         except Exception as e:
             consecutive_errors += 1
             print(f"⚠️ Error on page {page}: {e} (attempt {consecutive_errors}/{max_consecutive_errors})", file=sys.stderr)
@@ -181,10 +181,7 @@ def fetch_wallets(max_pages=100, page_size=200):
                     print(f"❌ Not enough data ({len(all_balances)} wallets) - need at least {min_wallets_for_graceful}", file=sys.stderr)
                     return None
             else:
-                # Wait longer and retry
-                retry_wait = 30 * consecutive_errors
-                print(f"   ⏳ Waiting {retry_wait}s before retry...", file=sys.stderr)
-                time.sleep(retry_wait)
+                # The HTTP layer already backed off between its own retries
                 continue
 
     print(f"✅ Fetched {len(all_balances)} wallets (estimated total: {total_wallet_count:,})", file=sys.stderr)
@@ -288,6 +285,14 @@ def main():
     # Calculate percentiles
     percentiles = calculate_percentiles(balances, total_wallets)
 
+    # Encode the raw balance sample as a compact binary artifact
+    artifact = encode_balances(balances)
+    with open(BALANCES_FILE, "wb") as f:
+        f.write(artifact)
+    balances_sketch = build_sketch(artifact)
+    balances_sketch["key"] = BALANCES_KV_KEY
+    print(f"📦 Balances artifact: {len(artifact):,} bytes for {balances_sketch['count']:,} wallets → {BALANCES_FILE}", file=sys.stderr)
+
     # Build result
     now_iso = datetime.now(timezone.utc).isoformat()
     result = {
@@ -297,6 +302,7 @@ def main():
         "sample_size": len(balances),
         "percentiles": percentiles,
         "brackets": brackets,
+        "balances_artifact": balances_sketch,
         "_source": "taostats",
         "_timestamp": now_iso,
         "last_updated": now_iso
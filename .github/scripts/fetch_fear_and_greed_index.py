@@ -4,14 +4,16 @@
 
 import os
 import sys
-import json
 import requests
 from datetime import datetime, timezone
 
+from http_client import get as http_get
+from kv_client import client as kv_client
+
 def fetch_fng_alternative():
     """Primary source: Alternative.me"""
     url = "https://api.alternative.me/fng/?limit=30&format=json"
-    resp = requests.get(url, timeout=15)
+    resp = http_get(url, timeout=15, cache=True)
     if resp.status_code != 200:
         raise Exception(f"Alternative.me API error: {resp.status_code}")
     data = resp.json()
@@ -86,14 +88,7 @@ def parse_fng(data):
     }
 
 def put_kv_json(account_id, api_token, namespace_id, key, obj):
-    url = f"https://api.cloudflare.com/client/v4/accounts/{account_id}/storage/kv/namespaces/{namespace_id}/values/{key}"
-    headers = {
-        "Authorization": f"Bearer {api_token}",
-        "Content-Type": "application/json",
-    }
-    data = json.dumps(obj)
-    resp = requests.put(url, headers=headers, data=data.encode('utf-8'), timeout=30)
-    return resp.status_code in (200, 204)
+    return kv_client(account_id, api_token, namespace_id).put_json(key, obj, compact=False)
 
 def main():
     account_id = os.getenv('CF_ACCOUNT_ID')
@@ -19,9 +19,10 @@ print a message and exit with code 0.
 """
 import os
 import sys
-import requests
 from datetime import datetime
 
+from kv_client import client as kv_client
+
 CF_ACCOUNT_ID = os.environ.get('CF_ACCOUNT_ID')
 CF_API_TOKEN = os.environ.get('CF_API_TOKEN')
 CF_KV_NAMESPACE_ID = os.environ.get('CF_KV_NAMESPACE_ID') or os.environ.get('CF_METRICS_NAMESPACE_ID')
@@ -30,26 +31,23 @@ if not CF_ACCOUNT_ID or not CF_API_TOKEN or not CF_KV_NAMESPACE_ID:
     print('Cloudflare KV credentials not fully provided; skipping issuance_history fetch.')
     sys.exit(0)
 
-URL = f"https://api.cloudflare.com/client/v4/accounts/{CF_ACCOUNT_ID}/storage/kv/namespaces/{CF_KV_NAMESPACE_ID}/values/issuance_history"
-headers = { 'Authorization': f'Bearer {CF_API_TOKEN}' }
+status, body = kv_client(CF_ACCOUNT_ID, CF_API_TOKEN, CF_KV_NAMESPACE_ID).read('issuance_history')
 
-try:
-    r = requests.get(URL, headers=headers, timeout=15)
-except Exception as e:
-    print('Error fetching issuance_history:', e)
+if status is None:
+    print('Error fetching issuance_history: no response from KV')
     sys.exit(1)
 
-if r.status_code == 404 or r.text == '':
+if status == 404 or body == b'':
     print('No issuance_history value found in KV (404 or empty).')
     sys.exit(0)
 
-if not r.ok:
-    print('Failed to fetch issuance_history:', r.status_code, r.text)
+if status != 200:
+    print('Failed to fetch issuance_history:', status)
     sys.exit(1)
 
 try:
     # assume the KV value is JSON or text; write raw
-    content = r.text
+    content = body.decode('utf-8')
     timestamp = datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')
     filename = f'issuance_history-{timestamp}.json'
     with open(filename, 'w') as f:
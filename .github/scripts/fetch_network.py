@@ -4,8 +4,8 @@ import os
 import sys
 from typing import Dict, Any, List
 from datetime import datetime, timezone, timedelta
-import urllib.request
-import urllib.error
+
+from kv_client import client as kv_client
 
 NETWORK = os.getenv("NETWORK", "finney")
 
@@ -103,44 +103,29 @@ def fetch_metrics() -> Dict[str, Any]:
         print(f"DEBUG: CF_ACCOUNT_ID={'set' if cf_account else 'missing'}, CF_API_TOKEN={'set' if cf_token else 'missing'}, CF_KV_NAMESPACE_ID={'set' if cf_kv_ns else 'missing'}", file=sys.stderr)
         if cf_account and cf_token and cf_kv_ns:
             # Read the issuance_history key directly to preserve history across runs
-            kv_url = f"https://api.cloudflare.com/client/v4/accounts/{cf_account}/storage/kv/namespaces/{cf_kv_ns}/values/issuance_history"
-            req = urllib.request.Request(kv_url, method='GET', headers={
-                'Authorization': f'Bearer {cf_token}'
-            })
-            try:
-                with urllib.request.urlopen(req, timeout=15) as resp:
-                    if resp.status == 200:
-                        # issuance_history is stored as a JSON array of snapshots
-                        try:
-                            body = resp.read()
-                            existing = json.loads(body)
-                            # Helpful CI debug: show type and length without printing full body
-                            if isinstance(existing, list):
-                                print(f"✅ KV read OK — {len(existing)} snapshots found", file=sys.stderr)
-                            else:
-                                print(f"✅ KV read OK — payload type={type(existing).__name__}", file=sys.stderr)
-                        except Exception as e:
-                            existing = None
-                            print(f"⚠️  Failed to parse KV JSON: {e}", file=sys.stderr)
-                        kv_read_ok = True
-            except urllib.error.HTTPError as e:
-                # 404: the key is not present; that's OK - we can create it
-                if getattr(e, 'code', None) == 404:
-                    # never seen before; start a new history
-                    existing = []
-                    print("ℹ️  KV read returned 404 — issuance_history key not found; starting a new history")
-                    kv_read_ok = True
-                else:
-                    # 403 or others: we cannot read KV - do not attempt to overwrite
-                    kv_read_ok = False
-                    print(f"⚠️  KV GET failed with HTTP Error {getattr(e,'code', None)}; skipping issuance_history update", file=sys.stderr)
-                    print(f"⚠️  KV GET failed with HTTP Error {getattr(e,'code', None)}; skipping issuance_history update", file=sys.stderr)
-            except Exception as e:
-                # network or other error when reading kv; do not try to overwrite
+            status, body = kv_client(cf_account, cf_token, cf_kv_ns).read('issuance_history')
+            if status == 200:
+                # issuance_history is stored as a JSON array of snapshots
+                try:
+                    existing = json.loads(body)
+                    # Helpful CI debug: show type and length without printing full body
+                    if isinstance(existing, list):
+                        print(f"✅ KV read OK — {len(existing)} snapshots found", file=sys.stderr)
+                    else:
+                        print(f"✅ KV read OK — payload type={type(existing).__name__}", file=sys.stderr)
+                except Exception as e:
+                    existing = None
+                    print(f"⚠️  Failed to parse KV JSON: {e}", file=sys.stderr)
+                kv_read_ok = True
+            elif status == 404:
+                # never seen before; start a new history
+                existing = []
+                print("ℹ️  KV read returned 404 — issuance_history key not found; starting a new history")
+                kv_read_ok = True
+            else:
+                # 403, network or other errors: we cannot read KV - do not attempt to overwrite
                 kv_read_ok = False
-                print(f"⚠️  KV GET failed: {str(e)}; skipping issuance_history update", file=sys.stderr)
-            except Exception:
-                pass
+                print(f"⚠️  KV GET failed ({status or 'no response'}); skipping issuance_history update", file=sys.stderr)
     except Exception:
         existing = None
 
@@ -667,21 +652,16 @@ def fetch_metrics() -> Dict[str, Any]:
 
             # Load existing halving history from KV
             halving_history = []
-            try:
-                kv_url = f"https://api.cloudflare.com/client/v4/accounts/{cf_account}/storage/kv/namespaces/{cf_kv_ns}/values/halving_history"
-                req = urllib.request.Request(kv_url, method='GET', headers={'Authorization': f'Bearer {cf_token}'})
-                with urllib.request.urlopen(req, timeout=15) as resp:
-                    if resp.status == 200:
-                        halving_history = json.loads(resp.read())
-                        if not isinstance(halving_history, list):
-                            halving_history = []
-            except urllib.error.HTTPError as e:
-                if getattr(e, 'code', None) == 404:
-                    halving_history = []  # No history yet
-                else:
-                    print(f"⚠️  Failed to read halving_history from KV: HTTP {getattr(e, 'code', None)}", file=sys.stderr)
-            except Exception as e:
-                print(f"⚠️  Failed to read halving_history from KV: {e}", file=sys.stderr)
+            status, body = kv_client(cf_account, cf_token, cf_kv_ns).read('halving_history')
+            if status == 200:
+                try:
+                    halving_history = json.loads(body)
+                except ValueError:
+                    halving_history = []
+                if not isinstance(halving_history, list):
+                    halving_history = []
+            elif status != 404:
+                print(f"⚠️  Failed to read halving_history from KV: {status or 'no response'}", file=sys.stderr)
 
             # Check which thresholds are already recorded
             recorded_thresholds = {h.get('threshold') for h in halving_history}
@@ -705,18 +685,10 @@ def fetch_metrics() -> Dict[str, Any]:
                 # Sort by threshold to maintain order
                 halving_history.sort(key=lambda x: x.get('threshold', 0))
 
-                try:
-                    kv_write_url = f"https://api.cloudflare.com/client/v4/accounts/{cf_account}/storage/kv/namespaces/{cf_kv_ns}/values/halving_history"
-                    data = json.dumps(halving_history).encode('utf-8')
-                    req = urllib.request.Request(kv_write_url, data=data, method='PUT', headers={
-                        'Authorization': f'Bearer {cf_token}',
-                        'Content-Type': 'application/json'
-                    })
-                    with urllib.request.urlopen(req, timeout=15) as resp:
-                        if resp.status in (200, 201):
-                            print(f"✅ Halving history saved to KV ({len(halving_history)} events)", file=sys.stderr)
-                except Exception as e:
-                    print(f"❌ Failed to save halving_history to KV: {e}", file=sys.stderr)
+                if kv_client(cf_account, cf_token, cf_kv_ns).put_json('halving_history', halving_history, compact=False):
+                    print(f"✅ Halving history saved to KV ({len(halving_history)} events)", file=sys.stderr)
+                else:
+                    print("❌ Failed to save halving_history to KV", file=sys.stderr)
 
             # Add last halving info to result for frontend
             if halving_history:
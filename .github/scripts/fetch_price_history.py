@@ -1,14 +1,34 @@
 #!/usr/bin/env python3
 """
 Fetch TAO price history from Taostats API for chart display.
-Stores multiple timeframes: 7d, 30d, 60d, 90d, 365d
+Stores multiple timeframes: 1d, 3d, 7d, 30d, 60d, 90d, 365d
+
+Candles are kept in a local candle store (`.github/data/price_candles.json`,
+mirrored to KV as `price_candles`) keyed by timestamp:
+
+  daily   daily OHLCV candles (up to CANDLE_DAILY_MAX_DAYS)
+  detail  detailed [ts, price] points for the last DETAIL_DAYS days
+
+Each run only asks Taostats for candles/points newer than the last stored
+one (the last daily candle is re-fetched because it is still forming), and
+every timeframe is sliced locally from the store. A warm run is one small
+OHLC request plus one small history request instead of 7 pagination chains.
+
+Besides the [ts, price] line series, every timeframe also gets UTC-aligned
+OHLCV candles (`ohlcv`, interval per timeframe in `ohlcv_interval`)
+resampled from the store by ohlcv_resampler.py, so candlestick views need no
+extra API calls.
 """
 
 import os
 import sys
 import json
-import requests
 from datetime import datetime, timezone, timedelta
+from typing import Dict, List, Optional
+
+from http_client import get as http_get
+from ohlcv_resampler import resample_candles, resample_ticks
+from taostats_history_store import _kv_config, kv_get, kv_put
 
 TAOSTATS_API_KEY = os.getenv("TAOSTATS_API_KEY")
 # OHLC endpoint for daily candles - better for longer timeframes
@@ -16,176 +36,222 @@ TAOSTATS_OHLC_URL = "https://api.taostats.io/api/price/ohlc/v1"
 # History endpoint for detailed data
 TAOSTATS_HISTORY_URL = "https://api.taostats.io/api/price/history/v1"
 
+CANDLE_STORE_KEY = "price_candles"
+CANDLE_STORE_PATH = ".github/data/price_candles.json"
+CANDLE_DAILY_MAX_DAYS = 400
+DETAIL_DAYS = 7
+MAX_PAGES = 10
 
-def fetch_price_history_ohlc(days: int):
-    """Fetch price history using OHLC endpoint (daily candles)."""
-    if not TAOSTATS_API_KEY:
-        print(f"❌ TAOSTATS_API_KEY not set", file=sys.stderr)
-        return None
-    
-    headers = {
+# Timeframe key -> days; short ranges come from the detailed points
+TIMEFRAMES = {"1": 1, "3": 3, "7": 7, "30": 30, "60": 60, "90": 90, "365": 365}
+# Candle interval per timeframe (ranges up to DETAIL_DAYS resample the detailed points)
+CANDLE_INTERVALS = {"1": "1h", "3": "1h", "7": "4h", "30": "1d", "60": "1d", "90": "1d", "365": "1d"}
+DAY_MS = 86_400_000
+
+
+def _headers():
+    return {
         "accept": "application/json",
         "Authorization": TAOSTATS_API_KEY
     }
-    
-    # Calculate timestamp range
-    now = datetime.now(timezone.utc)
-    start_ts = int((now - timedelta(days=days)).timestamp())
-    end_ts = int(now.timestamp())
-    
-    all_data = []
-    page = 1
-    
+
+
+def _ts_ms(ts) -> Optional[int]:
     try:
-        while True:
-            url = f"{TAOSTATS_OHLC_URL}?asset=tao&period=1d&timestamp_start={start_ts}&timestamp_end={end_ts}&limit=200&page={page}"
-            resp = requests.get(url, headers=headers, timeout=30)
-            resp.raise_for_status()
-            data = resp.json()
-            
-            if not data.get("data"):
-                break
-                
-            all_data.extend(data["data"])
-            
-            # Check for next page
-            pagination = data.get("pagination", {})
-            if pagination.get("next_page"):
-                page = pagination["next_page"]
-            else:
-                break
-        
-        if not all_data:
-            print(f"❌ No OHLC data for {days}d", file=sys.stderr)
-            return None
-        
-        # Convert to chart format: [[timestamp_ms, close_price], ...]
-        # Sort by timestamp ascending (oldest first)
-        chart_data = []
-        for item in all_data:
-            ts = item.get("timestamp")
-            close = item.get("close")
-            if ts and close:
-                # Parse timestamp and convert to milliseconds
-                try:
-                    dt = datetime.fromisoformat(ts.replace("Z", "+00:00"))
-                    ts_ms = int(dt.timestamp() * 1000)
-                    chart_data.append([ts_ms, float(close)])
-                except Exception as e:
-                    print(f"⚠️ Failed to parse timestamp {ts}: {e}", file=sys.stderr)
-        
-        # Sort ascending by timestamp
-        chart_data.sort(key=lambda x: x[0])
-        
-        print(f"✅ Fetched {len(chart_data)} OHLC points for {days}d", file=sys.stderr)
-        return chart_data
-        
+        return int(datetime.fromisoformat(ts.replace("Z", "+00:00")).timestamp() * 1000)
     except Exception as e:
-        print(f"❌ OHLC fetch failed for {days}d: {e}", file=sys.stderr)
+        print(f"⚠️ Failed to parse timestamp {ts}: {e}", file=sys.stderr)
         return None
 
 
-def fetch_price_history_detailed(days: int, limit: int = 200):
-    """Fetch price history using detailed history endpoint (for shorter timeframes)."""
-    if not TAOSTATS_API_KEY:
-        print(f"❌ TAOSTATS_API_KEY not set", file=sys.stderr)
-        return None
-    
-    headers = {
-        "accept": "application/json",
-        "Authorization": TAOSTATS_API_KEY
-    }
-    
-    # Calculate timestamp range
-    now = datetime.now(timezone.utc)
-    start_ts = int((now - timedelta(days=days)).timestamp())
-    end_ts = int(now.timestamp())
-    
-    try:
-        url = f"{TAOSTATS_HISTORY_URL}?asset=tao&timestamp_start={start_ts}&timestamp_end={end_ts}&limit={limit}"
-        resp = requests.get(url, headers=headers, timeout=30)
+def _fetch_pages(base_url: str, params: Dict) -> Optional[List[Dict]]:
+    """GET a paginated Taostats endpoint, following `pagination.next_page`."""
+    items = []
+    page = 1
+    for _ in range(MAX_PAGES):
+        resp = http_get(base_url, params={**params, "page": page}, headers=_headers(), timeout=30)
         resp.raise_for_status()
         data = resp.json()
-        
         if not data.get("data"):
-            print(f"❌ No history data for {days}d", file=sys.stderr)
-            return None
-        
-        # Convert to chart format
-        chart_data = []
-        for item in data["data"]:
-            ts = item.get("created_at") or item.get("timestamp")
-            price = item.get("price")
-            if ts and price:
-                try:
-                    dt = datetime.fromisoformat(ts.replace("Z", "+00:00"))
-                    ts_ms = int(dt.timestamp() * 1000)
-                    chart_data.append([ts_ms, float(price)])
-                except Exception as e:
-                    print(f"⚠️ Failed to parse timestamp {ts}: {e}", file=sys.stderr)
-        
-        # Sort ascending by timestamp
-        chart_data.sort(key=lambda x: x[0])
-        
-        print(f"✅ Fetched {len(chart_data)} detailed points for {days}d", file=sys.stderr)
-        return chart_data
-        
+            break
+        items.extend(data["data"])
+        next_page = (data.get("pagination") or {}).get("next_page")
+        if not next_page:
+            break
+        page = next_page
+    return items
+
+
+def fetch_ohlc_since(start_ts: int, end_ts: int) -> Optional[List[List]]:
+    """Daily OHLCV candles [ts_ms, open, high, low, close, volume] with start_ts <= ts <= end_ts."""
+    try:
+        items = _fetch_pages(TAOSTATS_OHLC_URL, {
+            "asset": "tao", "period": "1d",
+            "timestamp_start": start_ts, "timestamp_end": end_ts, "limit": 200,
+        })
     except Exception as e:
-        print(f"❌ Detailed fetch failed for {days}d: {e}", file=sys.stderr)
+        print(f"❌ OHLC fetch failed: {e}", file=sys.stderr)
         return None
+    candles = []
+    for item in items:
+        ts_ms = _ts_ms(item.get("timestamp")) if item.get("timestamp") else None
+        if ts_ms is None or not item.get("close"):
+            continue
+        close = float(item["close"])
+        candles.append([ts_ms,
+                        float(item.get("open") or close),
+                        float(item.get("high") or close),
+                        float(item.get("low") or close),
+                        close,
+                        float(item["volume"]) if item.get("volume") is not None else None])
+    print(f"✅ Fetched {len(candles)} OHLC candles since {datetime.fromtimestamp(start_ts, timezone.utc):%Y-%m-%d}", file=sys.stderr)
+    return candles
+
+
+def fetch_detailed_since(start_ts: int, end_ts: int) -> Optional[List[List]]:
+    """Detailed [ts_ms, price] points with start_ts <= ts <= end_ts."""
+    try:
+        items = _fetch_pages(TAOSTATS_HISTORY_URL, {
+            "asset": "tao", "timestamp_start": start_ts, "timestamp_end": end_ts, "limit": 200,
+        })
+    except Exception as e:
+        print(f"❌ Detailed fetch failed: {e}", file=sys.stderr)
+        return None
+    points = []
+    for item in items:
+        ts = item.get("created_at") or item.get("timestamp")
+        price = item.get("price")
+        if ts and price:
+            ts_ms = _ts_ms(ts)
+            if ts_ms is not None:
+                points.append([ts_ms, float(price)])
+    print(f"✅ Fetched {len(points)} detailed points since {datetime.fromtimestamp(start_ts, timezone.utc):%Y-%m-%d %H:%M}", file=sys.stderr)
+    return points
+
+
+def merge_rows(rows: List[List], new_rows: List[List], min_ts: int) -> List[List]:
+    """Upsert rows by timestamp (new wins), drop rows older than min_ts, sort ascending."""
+    by_ts = {r[0]: r for r in rows}
+    for r in new_rows:
+        by_ts[r[0]] = r
+    return [by_ts[t] for t in sorted(by_ts) if t >= min_ts]
+
+
+def load_candle_store() -> Dict:
+    """Candle store from the local file, else KV; empty store if neither exists."""
+    try:
+        with open(CANDLE_STORE_PATH) as f:
+            store = json.load(f)
+    except (FileNotFoundError, ValueError):
+        cfg = _kv_config()
+        store = kv_get(cfg, CANDLE_STORE_KEY) if cfg else None
+    if not isinstance(store, dict):
+        store = {}
+    store.setdefault("daily", [])
+    store.setdefault("detail", [])
+    return store
+
+
+def save_candle_store(store: Dict):
+    os.makedirs(os.path.dirname(CANDLE_STORE_PATH), exist_ok=True)
+    with open(CANDLE_STORE_PATH, "w") as f:
+        json.dump(store, f, separators=(",", ":"))
+    cfg = _kv_config()
+    if cfg:
+        kv_put(cfg, CANDLE_STORE_KEY, store, compress=True)
+
+
+def update_candle_store(store: Dict, now: Optional[datetime] = None) -> Dict:
+    """Fetch only what is newer than the store and merge it in (in place)."""
+    now = now or datetime.now(timezone.utc)
+    end_ts = int(now.timestamp())
+    now_ms = end_ts * 1000
+
+    daily = store["daily"]
+    # Re-fetch the last (still forming) daily candle; bootstrap with the full window
+    daily_start = daily[-1][0] // 1000 if daily else int((now - timedelta(days=CANDLE_DAILY_MAX_DAYS)).timestamp())
+    candles = fetch_ohlc_since(daily_start, end_ts)
+    if candles is not None:
+        store["daily"] = merge_rows(daily, candles, now_ms - CANDLE_DAILY_MAX_DAYS * DAY_MS)
+
+    detail = store["detail"]
+    detail_floor = int((now - timedelta(days=DETAIL_DAYS)).timestamp())
+    if detail and detail[0][0] // 1000 > detail_floor + 86_400:
+        detail = []  # window grew (DETAIL_DAYS raised): refetch it whole
+    detail_start = max(detail[-1][0] // 1000 + 1, detail_floor) if detail else detail_floor
+    points = fetch_detailed_since(detail_start, end_ts)
+    if points is not None:
+        store["detail"] = merge_rows(detail, points, now_ms - DETAIL_DAYS * DAY_MS)
+
+    store["_timestamp"] = now.isoformat()
+    return store
+
+
+def build_timeframes(store: Dict, now: Optional[datetime] = None) -> Dict[str, List[List]]:
+    """Slice every timeframe ([[ts_ms, price], ...]) out of the candle store."""
+    now_ms = int((now or datetime.now(timezone.utc)).timestamp() * 1000)
+    out = {}
+    for key, days in TIMEFRAMES.items():
+        cutoff = now_ms - days * DAY_MS
+        if days <= DETAIL_DAYS and store["detail"]:
+            series = [[t, p] for t, p in store["detail"] if t >= cutoff]
+        else:
+            series = [[c[0], c[4]] for c in store["daily"] if c[0] >= cutoff]
+        if series:
+            out[key] = series
+    return out
+
+
+def build_candles(store: Dict, now: Optional[datetime] = None) -> Dict[str, List[List]]:
+    """UTC-aligned OHLCV candles per timeframe ([[t_ms, o, h, l, c, v], ...])."""
+    now_ms = int((now or datetime.now(timezone.utc)).timestamp() * 1000)
+    out = {}
+    for key, days in TIMEFRAMES.items():
+        interval = CANDLE_INTERVALS[key]
+        cutoff = now_ms - days * DAY_MS
+        if days <= DETAIL_DAYS and store["detail"]:
+            points = [pt for pt in store["detail"] if pt[0] >= cutoff]
+            candles = resample_ticks([pt[0] for pt in points], [pt[1] for pt in points], interval)
+        else:
+            candles = resample_candles([c for c in store["daily"] if c[0] >= cutoff], interval)
+        if candles:
+            out[key] = candles
+    return out
 
 
 def main():
-    """Fetch all timeframes and save to JSON."""
-    
-    # Define timeframes to fetch
-    timeframes = {
-        "1": 1,
-        "3": 3,
-        "7": 7,
-        "30": 30,
-        "60": 60,
-        "90": 90,
-        "365": 365
-    }
-    
+    """Update the candle store and derive all timeframes."""
+    if not TAOSTATS_API_KEY:
+        print("❌ TAOSTATS_API_KEY not set", file=sys.stderr)
+        sys.exit(1)
+
+    store = update_candle_store(load_candle_store())
+    save_candle_store(store)
+
     result = {
         "_source": "taostats",
         "_timestamp": datetime.now(timezone.utc).isoformat(),
-        "data": {}
+        "data": build_timeframes(store),
+        "ohlcv": build_candles(store),
+        "ohlcv_interval": CANDLE_INTERVALS
     }
-    
-    for key, days in timeframes.items():
-        print(f"📊 Fetching {days}d price history...", file=sys.stderr)
-        
-        # Use detailed history for short timeframes, OHLC for longer ones
-        if days <= 3:
-            # For 1-3 days, use hourly data from detailed endpoint
-            data = fetch_price_history_detailed(days, limit=days * 24 + 10)
-        else:
-            # For longer timeframes, daily OHLC is sufficient
-            data = fetch_price_history_ohlc(days)
-        
-        if data:
-            result["data"][key] = data
-        else:
-            print(f"⚠️ No data for {key}d timeframe", file=sys.stderr)
-    
+
     if not result["data"]:
         print("❌ No price history data fetched", file=sys.stderr)
         sys.exit(1)
-    
+
     # Save to file
     output_file = "price_history.json"
     with open(output_file, "w") as f:
         json.dump(result, f, indent=2)
-    
+
     print(f"✅ Price history written to {output_file}", file=sys.stderr)
-    
+
     # Print summary
+    print(f"  store: {len(store['daily'])} daily candles, {len(store['detail'])} detailed points", file=sys.stderr)
     for key, data in result["data"].items():
-        print(f"  {key}d: {len(data)} points", file=sys.stderr)
-    
+        print(f"  {key}d: {len(data)} points, {len(result['ohlcv'].get(key, []))} {CANDLE_INTERVALS[key]} candles", file=sys.stderr)
+
     # Output JSON to stdout for workflow
     print(json.dumps(result))
 
@@ -1,141 +1,209 @@
 #!/usr/bin/env python3
 """
 Fetch average staking APY from Taostats Validator API.
-Calculates network-wide average APR from top validators.
+Calculates the network-wide stake-weighted APR distribution over all validators.
+
+Validators come from the shared validator snapshot (validator_snapshot.py):
+a fresh snapshot is reused, so this script normally costs no Taostats call.
+
+Besides `staking_apy`, a compact daily series (`staking_apy_history`, one
+row per UTC date in parallel arrays) is kept so trends can be charted
+without re-querying Taostats.
 """
 
 import os
 import sys
 import json
-import requests
 from datetime import datetime, timezone
+from typing import Dict, Optional
+
+import numpy as np
+
+from validator_snapshot import get_validator_snapshot, get_from_kv, put_to_kv
+
+# Stake-weighted percentiles reported in `distribution`
+APY_PERCENTILES = (10, 25, 50, 75, 90)
+APY_MAX_SANE = 1000.0  # Sanity cap (%), same as the old per-validator check
+APY_HISTORY_KEY = "staking_apy_history"
+APY_HISTORY_FILE = "staking_apy_history.json"
+APY_HISTORY_MAX_DAYS = 730
+APY_HISTORY_COLUMNS = ["date", "avg_apr", "median_apr", "p25_apr", "p75_apr", "validators"]
+
+
+def weighted_quantiles(values, weights, quantiles):
+    """
+    Vectorized weighted quantiles (midpoint interpolation).
+
+    Each value sits at the midpoint of its weight block on the cumulative
+    weight axis; quantiles interpolate linearly between those points. With
+    equal weights this is numpy's "hazen" quantile.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    weights = np.asarray(weights, dtype=np.float64)
+    order = np.argsort(values)
+    v = values[order]
+    w = weights[order]
+    cw = np.cumsum(w)
+    positions = (cw - 0.5 * w) / cw[-1]
+    return np.interp(np.asarray(quantiles, dtype=np.float64), positions, v)
+
 
-TAOSTATS_API_KEY = os.getenv('TAOSTATS_API_KEY')
-VALIDATOR_URL = "https://api.taostats.io/api/dtao/validator/latest/v1"
+def apr_arrays(snapshot: Dict):
+    """(apr %, stake) arrays for every validator with a usable daily return."""
+    stakes = np.array([s or 0 for s in snapshot.get("stake_raw") or []], dtype=np.float64)
+    returns = np.array([_to_float(r) for r in snapshot.get("nominator_return_per_day") or []], dtype=np.float64)
+    if stakes.size == 0 or stakes.size != returns.size:
+        return np.zeros(0), np.zeros(0), np.zeros(0, dtype=np.int64)
+    # APR = (daily_return * 365 / stake) * 100 (both in the same unit)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        apr = returns * 365.0 / stakes * 100.0
+    valid = (stakes > 0) & np.isfinite(apr) & (apr > 0) & (apr < APY_MAX_SANE)
+    return apr[valid], stakes[valid], np.flatnonzero(valid)
 
 
-def fetch_staking_apy(num_validators=50):
-    """Fetch top validators and calculate average APY."""
-    if not TAOSTATS_API_KEY:
-        print("❌ TAOSTATS_API_KEY not set", file=sys.stderr)
+def _to_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def calculate_staking_apy(snapshot, num_validators=None):
+    """Calculate the stake-weighted APR distribution from a validator snapshot (all validators by default)."""
+    if not snapshot or not snapshot.get("count"):
+        print("❌ No validator data in snapshot", file=sys.stderr)
         return None
-    
-    headers = {
-        "accept": "application/json",
-        "Authorization": TAOSTATS_API_KEY
+
+    apr, stake, idx = apr_arrays(snapshot)
+    if num_validators:
+        keep = idx < num_validators
+        apr, stake, idx = apr[keep], stake[keep], idx[keep]
+
+    print(f"📊 {apr.size}/{snapshot['count']} validators with APR data (snapshot {snapshot.get('generated_at')})", file=sys.stderr)
+    if apr.size == 0 or stake.sum() <= 0:
+        print("❌ No valid APR values found", file=sys.stderr)
+        return None
+
+    # Weighted average = sum(APR * stake) / sum(stake)
+    weighted_avg_apr = float(np.dot(apr, stake) / stake.sum())
+    simple_avg_apr = float(apr.mean())
+    q = weighted_quantiles(apr, stake, [p / 100 for p in APY_PERCENTILES])
+    distribution = {f"p{p}": round(float(v), 2) for p, v in zip(APY_PERCENTILES, q)}
+    distribution["median"] = distribution["p50"]
+    distribution["iqr"] = round(float(q[APY_PERCENTILES.index(75)] - q[APY_PERCENTILES.index(25)]), 2)
+
+    print(f"  Weighted Avg APR: {weighted_avg_apr:.2f}%", file=sys.stderr)
+    print(f"  Simple Avg APR: {simple_avg_apr:.2f}%", file=sys.stderr)
+    print(f"  Weighted median / IQR: {distribution['median']}% / {distribution['iqr']}%", file=sys.stderr)
+
+    # Top validator = largest stake in the snapshot (row 0)
+    names = snapshot.get("name") or [None]
+    dominance = snapshot.get("dominance") or [None]
+
+    now_iso = datetime.now(timezone.utc).isoformat()
+    result = {
+        "avg_apr": round(weighted_avg_apr, 2),
+        "simple_avg_apr": round(simple_avg_apr, 2),
+        "median_apr": distribution["median"],
+        "min_apr": round(float(apr.min()), 2),
+        "max_apr": round(float(apr.max()), 2),
+        "distribution": distribution,
+        "validators_analyzed": int(apr.size),
+        "stake_covered": round(float(stake.sum() / max(sum(s or 0 for s in snapshot.get("stake_raw") or []), 1e-12)), 4),
+        "top_validator": {
+            "name": names[0],
+            "dominance": dominance[0]
+        },
+        "snapshot_generated_at": snapshot.get("generated_at"),
+        "_source": snapshot.get("source", "taostats"),
+        "_timestamp": now_iso,
+        "last_updated": now_iso
     }
-    
-    try:
-        # Fetch top validators ordered by stake (descending)
-        url = f"{VALIDATOR_URL}?limit={num_validators}"
-        print(f"📊 Fetching top {num_validators} validators for APY calculation...", file=sys.stderr)
-        
-        resp = requests.get(url, headers=headers, timeout=30)
-        resp.raise_for_status()
-        data = resp.json()
-        
-        validators = data.get("data", [])
-        if not validators:
-            print("❌ No validator data returned", file=sys.stderr)
-            return None
-        
-        print(f"✅ Fetched {len(validators)} validators", file=sys.stderr)
-        
-        # Collect APR values with stake weights for weighted average
-        # Weighted average = sum(APR * stake) / sum(stake)
-        aprs = []
-        weighted_sum = 0.0
-        total_stake = 0.0
-        
-        for v in validators:
-            # Get daily return and stake (both in rao)
-            daily_return = v.get("nominator_return_per_day")
-            stake = v.get("global_weighted_stake")
-            
-            if daily_return and stake:
-                try:
-                    daily_return_val = float(daily_return)
-                    stake_val = float(stake)
-                    
-                    if stake_val > 0:
-                        # APR = (daily_return * 365 / stake) * 100
-                        apr_val = (daily_return_val * 365 / stake_val) * 100
-                        
-                        if 0 < apr_val < 1000:  # Sanity check
-                            aprs.append(apr_val)
-                            # Add to weighted calculation
-                            weighted_sum += apr_val * stake_val
-                            total_stake += stake_val
-                            
-                except (ValueError, TypeError):
-                    pass
-        
-        print(f"  Collected {len(aprs)} APR values", file=sys.stderr)
-        if aprs:
-            print(f"  Sample APRs: {[round(a, 2) for a in aprs[:5]]}", file=sys.stderr)
-        
-        if not aprs or total_stake == 0:
-            print("❌ No valid APR values found", file=sys.stderr)
-            return None
-        
-        # Calculate weighted average (realistic network APR)
-        weighted_avg_apr = weighted_sum / total_stake
-        # Simple average for comparison
-        simple_avg_apr = sum(aprs) / len(aprs)
-        min_apr = min(aprs)
-        max_apr = max(aprs)
-        
-        print(f"  Weighted Avg APR: {weighted_avg_apr:.2f}%", file=sys.stderr)
-        print(f"  Simple Avg APR: {simple_avg_apr:.2f}%", file=sys.stderr)
-        
-        # Get top validator info
-        top_validator = validators[0] if validators else None
-        
-        now_iso = datetime.now(timezone.utc).isoformat()
-        result = {
-            "avg_apr": round(weighted_avg_apr, 2),
-            "simple_avg_apr": round(simple_avg_apr, 2),
-            "min_apr": round(min_apr, 2),
-            "max_apr": round(max_apr, 2),
-            "validators_analyzed": len(aprs),
-            "top_validator": {
-                "name": top_validator.get("name") if top_validator else None,
-                "dominance": top_validator.get("dominance") if top_validator else None
-            } if top_validator else None,
-            "_source": "taostats",
-            "_timestamp": now_iso,
-            "last_updated": now_iso
-        }
-        
-        return result
-        
-    except Exception as e:
-        print(f"❌ Failed to fetch validators: {e}", file=sys.stderr)
+
+    return result
+
+
+def fetch_staking_apy(num_validators=None):
+    """Fetch (or reuse) the shared validator snapshot and calculate the APR distribution."""
+    snapshot, error_msg = get_validator_snapshot()
+    if not snapshot:
+        print(f"❌ Failed to fetch validators: {error_msg}", file=sys.stderr)
         return None
+    return calculate_staking_apy(snapshot, num_validators)
+
+
+def update_apy_history(history: Optional[Dict], result: Dict) -> Dict:
+    """
+    Upsert today's row into the columnar daily series (last run of a UTC day wins).
+
+    Layout: {"columns": [...], "date": [...], "avg_apr": [...], ...}, sorted by date.
+    """
+    rows = {}
+    if history and history.get("date"):
+        for i, date in enumerate(history["date"]):
+            rows[date] = [history.get(col, [None] * len(history["date"]))[i] for col in APY_HISTORY_COLUMNS]
+    date = result["_timestamp"][:10]
+    dist = result.get("distribution", {})
+    rows[date] = [date, result["avg_apr"], dist.get("median"), dist.get("p25"), dist.get("p75"), result["validators_analyzed"]]
+
+    dates = sorted(rows)[-APY_HISTORY_MAX_DAYS:]
+    out = {"columns": APY_HISTORY_COLUMNS}
+    for j, col in enumerate(APY_HISTORY_COLUMNS):
+        out[col] = [rows[d][j] for d in dates]
+    out["count"] = len(dates)
+    out["last_updated"] = result["_timestamp"]
+    return out
+
+
+def publish_apy_history(result: Dict) -> Dict:
+    """Update `staking_apy_history` in KV (if configured) and the local file."""
+    cf_acc = os.getenv('CF_ACCOUNT_ID')
+    cf_token = os.getenv('CF_API_TOKEN')
+    cf_ns = os.getenv('CF_KV_NAMESPACE_ID') or os.getenv('CF_METRICS_NAMESPACE_ID')
+    have_kv = all([cf_acc, cf_token, cf_ns])
+
+    history = get_from_kv(cf_acc, cf_token, cf_ns, APY_HISTORY_KEY) if have_kv else None
+    if history is None:
+        try:
+            with open(APY_HISTORY_FILE) as f:
+                history = json.load(f)
+        except (FileNotFoundError, ValueError):
+            history = None
+
+    history = update_apy_history(history, result)
+    data = json.dumps(history, separators=(',', ':'))
+    with open(APY_HISTORY_FILE, "w") as f:
+        f.write(data)
+    if have_kv:
+        put_to_kv(cf_acc, cf_token, cf_ns, APY_HISTORY_KEY, data.encode('utf-8'))
+    print(f"📈 APY history: {history['count']} days", file=sys.stderr)
+    return history
 
 
 def main():
     # Fetch staking APY data
-    result = fetch_staking_apy(50)
-    
+    result = fetch_staking_apy()
+
     if not result:
         print("❌ Failed to fetch staking APY data", file=sys.stderr)
         sys.exit(1)
-    
+
     # Save to file
     output_file = "staking_apy.json"
     with open(output_file, "w") as f:
         json.dump(result, indent=2, fp=f)
-    
+
     print(f"✅ Staking APY data written to {output_file}", file=sys.stderr)
-    
+    publish_apy_history(result)
+
     # Print summary
     print(f"\n📊 Staking APY Summary:", file=sys.stderr)
     print(f"  Weighted Avg APR: {result['avg_apr']}%", file=sys.stderr)
+    print(f"  Weighted Median APR: {result['median_apr']}% (IQR {result['distribution']['iqr']}%)", file=sys.stderr)
     print(f"  Simple Avg APR: {result['simple_avg_apr']}%", file=sys.stderr)
     print(f"  Range: {result['min_apr']}% - {result['max_apr']}%", file=sys.stderr)
     print(f"  Validators: {result['validators_analyzed']}", file=sys.stderr)
-    
+
     # Output JSON to stdout
     print(json.dumps(result))
 
@@ -1,16 +1,15 @@
 import os
 import sys
 import json
-import time
 import requests
 from datetime import datetime, timezone
-import pathlib
+
+from http_client import BudgetExceeded, get as http_get
 
 TAOSTATS_API_KEY = os.getenv("TAOSTATS_API_KEY")
 TAOSTATS_URL = os.getenv("TAOSTATS_URL", "https://api.taostats.io/api/price/latest/v1?asset=tao")
 
 MAX_RETRIES = 3
-RETRY_DELAY = 5  # seconds
 
 def _int_env(name, default):
     v = os.getenv(name)
@@ -34,33 +33,17 @@ def fetch_taostats():
         "Authorization": TAOSTATS_API_KEY
     }
 
-    for attempt in range(MAX_RETRIES):
-        try:
-            resp = requests.get(TAOSTATS_URL, headers=headers, timeout=10)
-
-            # Handle rate limiting with retry
-            if resp.status_code == 429:
-                if attempt < MAX_RETRIES - 1:
-                    wait_time = RETRY_DELAY * (attempt + 1)
-                    print(f"⚠️ Rate limited (429), waiting {wait_time}s before retry {attempt + 2}/{MAX_RETRIES}...", file=sys.stderr)
-                    time.sleep(wait_time)
-                    continue
-                else:
-                    print(f"❌ Rate limited after {MAX_RETRIES} attempts", file=sys.stderr)
-                    return None
-
-            resp.raise_for_status()
-            data = resp.json()
-            break
-        except requests.exceptions.RequestException as e:
-            if attempt < MAX_RETRIES - 1:
-                wait_time = RETRY_DELAY * (attempt + 1)
-                print(f"⚠️ Request failed: {e}, retrying in {wait_time}s ({attempt + 2}/{MAX_RETRIES})...", file=sys.stderr)
-                time.sleep(wait_time)
-                continue
-            else:
-                print(f"❌ Taostats fetch failed after {MAX_RETRIES} attempts: {e}", file=sys.stderr)
-                return None
+    # The shared HTTP layer paces Taostats calls and retries 429s / errors
+    try:
+        resp = http_get(TAOSTATS_URL, headers=headers, timeout=10, retries=MAX_RETRIES - 1)
+        if resp.status_code == 429:
+            print(f"❌ Rate limited after {MAX_RETRIES} attempts", file=sys.stderr)
+            return None
+        resp.raise_for_status()
+        data = resp.json()
+    except (requests.exceptions.RequestException, BudgetExceeded) as e:
+        print(f"❌ Taostats fetch failed after {MAX_RETRIES} attempts: {e}", file=sys.stderr)
+        return None
 
     try:
         if not data.get("data"):
@@ -101,32 +84,5 @@ if __name__ == "__main__":
             json.dump(result, f, indent=2)
         print("✅ Taostats data written to taostats_latest.json", file=sys.stderr)
         print(json.dumps(result, indent=2))
-        # Append price/volume entry to history JSON
-        try:
-            HIST_FILE = pathlib.Path("taostats_history.json")
-            # Keep history size reasonably bounded to avoid KV size issues
-            MAX_ENTRIES = _int_env('HISTORY_MAX_ENTRIES', 10000)
-            entry = {
-                "_timestamp": result.get("_timestamp"),
-                "price": result.get("price"),
-                "volume_24h": result.get("volume_24h")
-            }
-            history = []
-            if HIST_FILE.exists():
-                try:
-                    with HIST_FILE.open('r') as hf:
-                        history = json.load(hf) or []
-                except Exception:
-                    # If parsing fails, start fresh
-                    history = []
-            history.append(entry)
-            # Trim history to the last MAX_ENTRIES
-            if len(history) > MAX_ENTRIES:
-                history = history[-MAX_ENTRIES:]
-            with HIST_FILE.open('w') as hf:
-                json.dump(history, hf, indent=2)
-            print(f"✅ Taostats history written to {HIST_FILE}", file=sys.stderr)
-        except Exception as e:
-            print(f"⚠️ Failed to update history: {e}", file=sys.stderr)
     else:
         sys.exit(1)
\ No newline at end of file
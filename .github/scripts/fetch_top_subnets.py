@@ -12,11 +12,11 @@ import json
 import sys
 from typing import List, Dict, Tuple
 from datetime import datetime, timezone
-import urllib.request
-import urllib.error
-import ssl
 import re
 
+from http_client import get as http_get
+from kv_client import client as kv_client
+
 NETWORK = os.getenv('NETWORK', 'finney')
 DAILY_EMISSION = float(os.getenv('DAILY_EMISSION', '7200'))
 TAOSTATS_API_KEY = os.getenv('TAOSTATS_API_KEY')
@@ -46,23 +46,9 @@ def write_local(path: str, data: Dict[str, object]):
 
 
 def put_to_kv(account: str, token: str, namespace: str, key: str, data: bytes) -> bool:
-    url = f'https://api.cloudflare.com/client/v4/accounts/{account}/storage/kv/namespaces/{namespace}/values/{key}'
-    req = urllib.request.Request(url, data=data, method='PUT', headers={
-        'Authorization': f'Bearer {token}',
-        'Content-Type': 'application/json'
-    })
-    try:
-        with urllib.request.urlopen(req, timeout=20) as resp:
-            if resp.status in (200, 201):
-                print(f"✅ KV PUT OK ({key})")
-                return True
-            else:
-                print(f"⚠️ KV PUT returned status {resp.status}", file=sys.stderr)
-                return False
-    except urllib.error.HTTPError as e:
-        print(f"⚠️ KV PUT failed: HTTP {getattr(e, 'code', None)} - {e.read()}", file=sys.stderr)
-    except Exception as e:
-        print(f"⚠️ KV PUT failed: {e}", file=sys.stderr)
+    if kv_client(account, token, namespace).put_bytes(key, data):
+        print(f"✅ KV PUT OK ({key})")
+        return True
     return False
 
 
@@ -76,9 +62,9 @@ def fetch_top_subnets() -> Dict[str, object]:
     def _fetch_taostats(network: str, limit: int = 500) -> Tuple[Dict[int, Dict], str]:
         """Fetch Taostats subnet records and return a mapping netuid->item.
 
-        This tries a small set of plausible Taostats endpoints and performs a
-        few retries with backoff. If Taostats cannot be reached or returns no
-        usable data we return an empty dict.
+        This tries a small set of plausible Taostats endpoints; pacing and
+        retries come from the shared HTTP layer. If Taostats cannot be
+        reached or returns no usable data we return an empty dict.
         """
         out: Dict[int, Dict] = {}
         last_error = ''
@@ -87,150 +73,130 @@ def fetch_top_subnets() -> Dict[str, object]:
             f"https://api.taostats.io/api/subnet/latest/v1?network={network}&limit={limit}",
         ]
 
-        # Basic retry/backoff
+        # The shared HTTP layer paces Taostats calls and retries 429s / errors
         for url in variants:
-            attempt = 0
-            while attempt < 3:
+            try:
+                hdrs = {
+                    'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+                    'Accept': 'application/json',
+                }
+                if TAOSTATS_API_KEY:
+                    hdrs['Authorization'] = TAOSTATS_API_KEY
+                resp = http_get(url, headers=hdrs, timeout=10)
+                resp.raise_for_status()
+                data = resp.content
                 try:
-                    ctx = ssl.create_default_context()
-                    hdrs = {
-                        'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                        'Accept': 'application/json',
-                    }
-                    if TAOSTATS_API_KEY:
-                        hdrs['Authorization'] = TAOSTATS_API_KEY
-                    req = urllib.request.Request(url, method='GET', headers=hdrs)
-                    with urllib.request.urlopen(req, timeout=10, context=ctx) as resp:
-                        if resp.status and int(resp.status) >= 400:
-                            raise Exception(f"HTTP {resp.status}")
-                        data = resp.read()
-                        try:
-                            j = json.loads(data)
-                        except Exception as e:
-                            # not JSON — capture snippet & continue
-                            try:
-                                snippet = data[:240].decode('utf-8', errors='replace') if isinstance(data, (bytes, bytearray)) else str(data)
-                            except Exception:
-                                snippet = '<unreadable response>'
-                            last_error = f'Non-JSON response from {url}: {snippet[:240]}'
-                            # Try to parse JSON embedded in HTML pages (Next.js / __NEXT_DATA__ or other SSR payloads)
+                    j = json.loads(data)
+                except Exception as e:
+                    # not JSON — capture snippet & continue
+                    try:
+                        snippet = data[:240].decode('utf-8', errors='replace') if isinstance(data, (bytes, bytearray)) else str(data)
+                    except Exception:
+                        snippet = '<unreadable response>'
+                    last_error = f'Non-JSON response from {url}: {snippet[:240]}'
+                    # Try to parse JSON embedded in HTML pages (Next.js / __NEXT_DATA__ or other SSR payloads)
+                    try:
+                        html = data.decode('utf-8', errors='replace') if isinstance(data, (bytes, bytearray)) else str(data)
+                        # look for <script id="__NEXT_DATA__" type="application/json"> ... </script>
+                        m = re.search(r'<script[^>]*id=["\']__NEXT_DATA__["\'][^>]*>(.*?)</script>', html, re.S | re.I)
+                        found = False
+                        if m:
                             try:
-                                html = data.decode('utf-8', errors='replace') if isinstance(data, (bytes, bytearray)) else str(data)
-                                # look for <script id="__NEXT_DATA__" type="application/json"> ... </script>
-                                m = re.search(r'<script[^>]*id=["\']__NEXT_DATA__["\'][^>]*>(.*?)</script>', html, re.S | re.I)
-                                found = False
-                                if m:
+                                nd = json.loads(m.group(1))
+                                # recursively search for dicts with 'netuid' or 'id'
+                                def find_items(obj):
+                                    out_items = []
+                                    if isinstance(obj, dict):
+                                        if 'netuid' in obj or 'id' in obj:
+                                            out_items.append(obj)
+                                        for v in obj.values():
+                                            out_items.extend(find_items(v))
+                                    elif isinstance(obj, list):
+                                        for v in obj:
+                                            out_items.extend(find_items(v))
+                                    return out_items
+                                nd_items = find_items(nd)
+                                for item in nd_items:
                                     try:
-                                        nd = json.loads(m.group(1))
-                                        # recursively search for dicts with 'netuid' or 'id'
-                                        def find_items(obj):
-                                            out_items = []
-                                            if isinstance(obj, dict):
-                                                if 'netuid' in obj or 'id' in obj:
-                                                    out_items.append(obj)
-                                                for v in obj.values():
-                                                    out_items.extend(find_items(v))
-                                            elif isinstance(obj, list):
-                                                for v in obj:
-                                                    out_items.extend(find_items(v))
-                                            return out_items
-                                        nd_items = find_items(nd)
-                                        for item in nd_items:
-                                            try:
-                                                netuid = item.get('netuid') if isinstance(item, dict) else None
-                                                if netuid is None and isinstance(item, dict) and 'id' in item:
-                                                    netuid = item.get('id')
-                                                if netuid is None:
-                                                    continue
-                                                out[int(netuid)] = item
-                                                found = True
-                                            except Exception:
-                                                continue
+                                        netuid = item.get('netuid') if isinstance(item, dict) else None
+                                        if netuid is None and isinstance(item, dict) and 'id' in item:
+                                            netuid = item.get('id')
+                                        if netuid is None:
+                                            continue
+                                        out[int(netuid)] = item
+                                        found = True
                                     except Exception:
-                                        pass
-                                if found:
-                                    return out, last_error
+                                        continue
                             except Exception:
                                 pass
-                            # no embedded JSON found — continue to next variant
-                            break
-                        # taostats typically returns an object with a 'data' key
-                        items = j.get('data') if isinstance(j, dict) and 'data' in j else j
-                        if not items:
-                            break
-                        for item in items:
-                            try:
-                                # prefer explicit 'netuid' field, but numeric keys may exist
-                                netuid = item.get('netuid') if isinstance(item, dict) else None
-                                if netuid is None:
-                                    # some APIs use 'id' or numeric-keyed dicts
-                                    if isinstance(item, dict) and 'id' in item:
-                                        netuid = item.get('id')
-                                if netuid is None:
-                                    continue
-                                # Ensure emission or emission_share exists; if not, try documented per-subnet endpoint
-                                if isinstance(item, dict) and ('emission_share' not in item and 'emission' not in item or item.get('emission_share') in (None, 0) and item.get('emission') in (None, 0)):
-                                    # try per-subnet emission endpoint
-                                    for per_endpoint in (
-                                        f"https://api.taostats.io/api/v1/subnets/{int(netuid)}/emission",
-                                        f"https://api.taostats.io/subnets/{int(netuid)}/emission",
-                                        f"https://taostats.io/api/v1/subnets/{int(netuid)}/emission",
-                                    ):
-                                        try:
-                                            hdrs2 = {
-                                                'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                                                'Accept': 'application/json',
-                                            }
-                                            if TAOSTATS_API_KEY:
-                                                hdrs2['Authorization'] = TAOSTATS_API_KEY
-                                            preq = urllib.request.Request(per_endpoint, method='GET', headers=hdrs2)
-                                            with urllib.request.urlopen(preq, timeout=6, context=ssl.create_default_context()) as presp:
-                                                pdata = presp.read()
-                                                try:
-                                                    pj = json.loads(pdata)
-                                                    # documented response may embed emission_share or emission directly
-                                                    if isinstance(pj, dict):
-                                                        if 'emission_share' in pj and pj.get('emission_share') is not None:
-                                                            item['emission_share'] = pj.get('emission_share')
-                                                            break
-                                                        if 'emission' in pj and pj.get('emission') is not None:
-                                                            item['emission'] = pj.get('emission')
-                                                            break
-                                                        # some endpoints wrap data
-                                                        if 'data' in pj and isinstance(pj.get('data'), dict) and 'emission_share' in pj.get('data'):
-                                                            item['emission_share'] = pj.get('data').get('emission_share')
-                                                            break
-                                                        if 'data' in pj and isinstance(pj.get('data'), dict) and 'emission' in pj.get('data'):
-                                                            item['emission'] = pj.get('data').get('emission')
-                                                            break
-                                                except Exception:
-                                                    pass
-                                        except Exception:
-                                            continue
-                                out[int(netuid)] = item
-                            except Exception:
-                                continue
-                        # Successfully parsed something — return it
-                        if len(out) > 0:
+                        if found:
                             return out, last_error
-                except Exception as e:
-                    # wait a bit and retry this variant
-                    backoff = 0.5 * (2 ** attempt)
-                    try:
-                        # record the last error (HTTP status or exception repr)
-                        last_error = getattr(e, 'reason', None) or getattr(e, 'code', None) or str(e)
-                    except Exception:
-                        last_error = str(e)
-                    try:
-                        import time
-
-                        time.sleep(backoff)
                     except Exception:
                         pass
-                    attempt += 1
+                    # no embedded JSON found — continue to next variant
+                    continue
+                # taostats typically returns an object with a 'data' key
+                items = j.get('data') if isinstance(j, dict) and 'data' in j else j
+                if not items:
                     continue
-                # break out of attempts loop if we reached here without continue
-                break
+                for item in items:
+                    try:
+                        # prefer explicit 'netuid' field, but numeric keys may exist
+                        netuid = item.get('netuid') if isinstance(item, dict) else None
+                        if netuid is None:
+                            # some APIs use 'id' or numeric-keyed dicts
+                            if isinstance(item, dict) and 'id' in item:
+                                netuid = item.get('id')
+                        if netuid is None:
+                            continue
+                        # Ensure emission or emission_share exists; if not, try documented per-subnet endpoint
+                        if isinstance(item, dict) and ('emission_share' not in item and 'emission' not in item or item.get('emission_share') in (None, 0) and item.get('emission') in (None, 0)):
+                            # try per-subnet emission endpoint
+                            for per_endpoint in (
+                                f"https://api.taostats.io/api/v1/subnets/{int(netuid)}/emission",
+                                f"https://api.taostats.io/subnets/{int(netuid)}/emission",
+                                f"https://taostats.io/api/v1/subnets/{int(netuid)}/emission",
+                            ):
+                                try:
+                                    hdrs2 = {
+                                        'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+                                        'Accept': 'application/json',
+                                    }
+                                    if TAOSTATS_API_KEY:
+                                        hdrs2['Authorization'] = TAOSTATS_API_KEY
+                                    presp = http_get(per_endpoint, headers=hdrs2, timeout=6, retries=0)
+                                    presp.raise_for_status()
+                                    pdata = presp.content
+                                    try:
+                                        pj = json.loads(pdata)
+                                        # documented response may embed emission_share or emission directly
+                                        if isinstance(pj, dict):
+                                            if 'emission_share' in pj and pj.get('emission_share') is not None:
+                                                item['emission_share'] = pj.get('emission_share')
+                                                break
+                                            if 'emission' in pj and pj.get('emission') is not None:
+                                                item['emission'] = pj.get('emission')
+                                                break
+                                            # some endpoints wrap data
+                                            if 'data' in pj and isinstance(pj.get('data'), dict) and 'emission_share' in pj.get('data'):
+                                                item['emission_share'] = pj.get('data').get('emission_share')
+                                                break
+                                            if 'data' in pj and isinstance(pj.get('data'), dict) and 'emission' in pj.get('data'):
+                                                item['emission'] = pj.get('data').get('emission')
+                                                break
+                                    except Exception:
+                                        pass
+                                except Exception:
+                                    continue
+                        out[int(netuid)] = item
+                    except Exception:
+                        continue
+                # Successfully parsed something — return it
+                if len(out) > 0:
+                    return out, last_error
+            except Exception as e:
+                # record the last error (HTTP status or exception repr)
+                last_error = getattr(e, 'reason', None) or getattr(e, 'code', None) or str(e)
         return out, last_error
 
     # First, try to read Taostats data from Cloudflare KV if credentials
@@ -244,43 +210,35 @@ def fetch_top_subnets() -> Dict[str, object]:
         cf_ns = os.getenv('CF_KV_NAMESPACE_ID') or os.getenv('CF_METRICS_NAMESPACE_ID')
         if cf_acc and cf_token and cf_ns:
             try:
-                url = f'https://api.cloudflare.com/client/v4/accounts/{cf_acc}/storage/kv/namespaces/{cf_ns}/values/taostats_subnets'
-                req = urllib.request.Request(url, method='GET', headers={
-                    'Authorization': f'Bearer {cf_token}',
-                    'Accept': 'application/json'
-                })
-                with urllib.request.urlopen(req, timeout=8) as resp:
-                    if resp.status == 200:
-                        raw = resp.read()
+                kj = kv_client(cf_acc, cf_token, cf_ns).get_json('taostats_subnets')
+                try:
+                    # Expecting either a mapping or an object with 'data'
+                    if isinstance(kj, dict) and 'data' in kj and isinstance(kj.get('data'), list):
+                        items = kj.get('data')
+                    elif isinstance(kj, list):
+                        items = kj
+                    elif isinstance(kj, dict):
+                        # if the KV stores a dict of netuid->item
                         try:
-                            kj = json.loads(raw)
-                            # Expecting either a mapping or an object with 'data'
-                            if isinstance(kj, dict) and 'data' in kj and isinstance(kj.get('data'), list):
-                                items = kj.get('data')
-                            elif isinstance(kj, list):
-                                items = kj
-                            elif isinstance(kj, dict):
-                                # if the KV stores a dict of netuid->item
-                                try:
-                                    taostats_map = {int(k): v for k, v in kj.items()}
-                                except Exception:
-                                    taostats_map = {}
-                                items = None
-                            else:
-                                items = None
-                            if items:
-                                for item in items:
-                                    try:
-                                        netuid = item.get('netuid') if isinstance(item, dict) else None
-                                        if netuid is None and isinstance(item, dict) and 'id' in item:
-                                            netuid = item.get('id')
-                                        if netuid is None:
-                                            continue
-                                        taostats_map[int(netuid)] = item
-                                    except Exception:
-                                        continue
+                            taostats_map = {int(k): v for k, v in kj.items()}
                         except Exception:
                             taostats_map = {}
+                        items = None
+                    else:
+                        items = None
+                    if items:
+                        for item in items:
+                            try:
+                                netuid = item.get('netuid') if isinstance(item, dict) else None
+                                if netuid is None and isinstance(item, dict) and 'id' in item:
+                                    netuid = item.get('id')
+                                if netuid is None:
+                                    continue
+                                taostats_map[int(netuid)] = item
+                            except Exception:
+                                continue
+                except Exception:
+                    taostats_map = {}
             except Exception:
                 taostats_map = {}
     except Exception:
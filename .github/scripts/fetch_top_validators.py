@@ -1,7 +1,8 @@
 #!/usr/bin/env python3
 """Fetch top validators by stake and write JSON output.
 
-This script fetches validator data from Taostats API and/or on-chain data.
+Validator data comes from the shared validator snapshot (validator_snapshot.py),
+so top_validators and staking_apy are derived from a single Taostats fetch.
 It writes `.github/data/top_validators.json` and, if Cloudflare KV env vars
 are present, uploads the JSON into the `top_validators` KV key.
 
@@ -10,11 +11,11 @@ Designed to be run from a GitHub Actions runner (mirrors fetch_top_subnets.py).
 import os
 import json
 import sys
-from typing import List, Dict, Tuple
+from typing import Dict, Optional
 from datetime import datetime, timezone
-import urllib.request
-import urllib.error
-import ssl
+
+from kv_client import client as kv_client
+from validator_snapshot import get_validator_snapshot, snapshot_rows
 
 NETWORK = os.getenv('NETWORK', 'finney')
 TAOSTATS_API_KEY = os.getenv('TAOSTATS_API_KEY')
@@ -42,102 +43,18 @@ def write_local(path: str, data: Dict[str, object]):
 
 
 def put_to_kv(account: str, token: str, namespace: str, key: str, data: bytes) -> bool:
-    url = f'https://api.cloudflare.com/client/v4/accounts/{account}/storage/kv/namespaces/{namespace}/values/{key}'
-    req = urllib.request.Request(url, data=data, method='PUT', headers={
-        'Authorization': f'Bearer {token}',
-        'Content-Type': 'application/json'
-    })
-    try:
-        with urllib.request.urlopen(req, timeout=20) as resp:
-            if resp.status in (200, 201):
-                print(f"✅ KV PUT OK ({key})")
-                return True
-            else:
-                print(f"⚠️ KV PUT returned status {resp.status}", file=sys.stderr)
-                return False
-    except urllib.error.HTTPError as e:
-        print(f"⚠️ KV PUT failed: HTTP {getattr(e, 'code', None)} - {e.read()}", file=sys.stderr)
-    except Exception as e:
-        print(f"⚠️ KV PUT failed: {e}", file=sys.stderr)
+    if kv_client(account, token, namespace).put_bytes(key, data):
+        print(f"✅ KV PUT OK ({key})")
+        return True
     return False
 
 
-def fetch_from_taostats(network: str, limit: int = 100) -> Tuple[List[Dict], str]:
-    """Fetch validators from Taostats API.
-    
-    Returns tuple of (validators_list, error_message).
-    """
-    validators = []
-    last_error = ''
-    
-    # Taostats validator endpoints to try - dTao endpoint has names!
-    endpoints = [
-        f"https://api.taostats.io/api/dtao/validator/latest/v1?limit={limit}",  # dTao endpoint with names
-        f"https://api.taostats.io/api/validator/latest/v1?network={network}&limit={limit}",
-    ]
-    
-    ctx = ssl.create_default_context()
-    
-    for url in endpoints:
-        attempt = 0
-        while attempt < 3:
-            try:
-                hdrs = {
-                    'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                    'Accept': 'application/json',
-                }
-                if TAOSTATS_API_KEY:
-                    hdrs['Authorization'] = TAOSTATS_API_KEY
-                
-                req = urllib.request.Request(url, method='GET', headers=hdrs)
-                with urllib.request.urlopen(req, timeout=15, context=ctx) as resp:
-                    if resp.status and int(resp.status) >= 400:
-                        raise Exception(f"HTTP {resp.status}")
-                    
-                    data = resp.read()
-                    try:
-                        j = json.loads(data)
-                    except Exception as e:
-                        last_error = f'Non-JSON response from {url}'
-                        break
-                    
-                    # Taostats typically returns { "data": [...] }
-                    items = j.get('data') if isinstance(j, dict) and 'data' in j else j
-                    if not items or not isinstance(items, list):
-                        last_error = f'No data array in response from {url}'
-                        break
-                    
-                    validators = items
-                    print(f"✅ Fetched {len(validators)} validators from {url}")
-                    return validators, ''
-                    
-            except Exception as e:
-                backoff = 0.5 * (2 ** attempt)
-                last_error = str(e)
-                try:
-                    import time
-                    time.sleep(backoff)
-                except Exception:
-                    pass
-                attempt += 1
-                continue
-            break
-    
-    return validators, last_error
-
-
-def fetch_top_validators() -> Dict[str, object]:
-    """Main function to fetch and process top validators."""
-    
-    validators = []
-    error_msg = ''
-    
-    # Try Taostats API first
-    validators, error_msg = fetch_from_taostats(NETWORK, limit=100)
+def build_top_validators(snapshot: Optional[Dict], error_msg: str = '') -> Dict[str, object]:
+    """Derive the top_validators payload from a validator snapshot."""
     
-    if not validators:
-        print(f"⚠️ Could not fetch validators from Taostats: {error_msg}", file=sys.stderr)
-        # Could add on-chain fallback here if needed
+    if not snapshot or not snapshot.get('count'):
+        # validator_snapshot already tried Taostats and the on-chain fallback
+        print(f"⚠️ Could not fetch validators: {error_msg}", file=sys.stderr)
         now_iso = datetime.now(timezone.utc).isoformat()
         return {
             'generated_at': now_iso,
@@ -148,51 +65,29 @@ def fetch_top_validators() -> Dict[str, object]:
             'error': error_msg or 'No validator data available'
         }
     
-    # Process and normalize validator data
+    # Process snapshot rows (already normalized by validator_snapshot)
     processed = []
-    for v in validators:
+    for v in snapshot_rows(snapshot):
         try:
-            # Handle hotkey - can be string or object with ss58
-            hotkey_raw = v.get('hotkey') or v.get('address') or v.get('validator_hotkey')
-            if isinstance(hotkey_raw, dict):
-                hotkey = hotkey_raw.get('ss58') or hotkey_raw.get('hex')
-            else:
-                hotkey = hotkey_raw
-            
-            # Handle coldkey similarly
-            coldkey_raw = v.get('coldkey') or v.get('owner')
-            if isinstance(coldkey_raw, dict):
-                coldkey = coldkey_raw.get('ss58') or coldkey_raw.get('hex')
-            else:
-                coldkey = coldkey_raw
+            hotkey = v['hotkey']
+            coldkey = v['coldkey']
             
-            # Get stake - dTao uses global_weighted_stake (in rao), old API uses stake
-            stake_raw = v.get('global_weighted_stake') or v.get('stake') or v.get('total_stake') or v.get('root_stake') or 0
-            # Convert from rao to TAO if it's a large number (rao = 10^9 TAO)
-            stake = float(stake_raw) if stake_raw else 0
-            if stake > 1_000_000_000_000:  # Likely in rao
+            # dTao uses global_weighted_stake (in rao), old API uses stake
+            stake = v['stake_raw'] or 0
+            unit = snapshot.get('stake_unit')
+            if unit == 'rao':
+                # Full set includes small validators, so no magnitude guess here
+                stake = stake / 1_000_000_000
+            elif unit is None and stake > 1_000_000_000_000:  # Likely in rao
                 stake = stake / 1_000_000_000  # Convert to TAO
             
-            # Get nominators - dTao uses global_nominators
-            nominators = int(v.get('global_nominators') or v.get('nominators') or v.get('nominator_count') or 0)
-            
-            # Get take - may be string in dTao API
-            take_raw = v.get('take') or v.get('delegate_take') or 0
-            take = float(take_raw) if take_raw else 0
-            
-            # Get active subnets count
-            active_subnets = int(v.get('active_subnets') or v.get('vpermit_count') or 0)
-            
-            # Get dominance
-            dominance = v.get('dominance')
-            if isinstance(dominance, str):
-                try:
-                    dominance = float(dominance)
-                except:
-                    dominance = None
+            nominators = v['nominators']
+            take = v['take']
+            active_subnets = v['active_subnets']
+            dominance = v['dominance']
             
             # Get name, fallback to truncated hotkey if no name
-            name = v.get('name') or v.get('validator_name') or v.get('display_name')
+            name = v['name']
             if not name and hotkey:
                 # Show truncated hotkey: "5Dd8...rWv"
                 name = f"{hotkey[:4]}...{hotkey[-3:]}"
@@ -265,15 +160,26 @@ def fetch_top_validators() -> Dict[str, object]:
         'top_n': TOP_N,
         'total_validators': len(sorted_validators),
         'total_stake': round(total_stake, 2),
+        # True network totals only when every page of the validator set was fetched
+        'complete': bool(snapshot.get('complete')),
         'top_validators': top_list,
-        'source': 'taostats'
+        # Full stake vector of the snapshot for decentralization metrics
+        'all_stakes': [round(v.get('stake', 0), 2) for v in sorted_validators],
+        'snapshot_generated_at': snapshot.get('generated_at'),
+        'source': snapshot.get('source', 'taostats')
     }
     
     return out
 
 
-def main():
-    out = fetch_top_validators()
+def fetch_top_validators() -> Dict[str, object]:
+    """Fetch (or reuse) the shared validator snapshot and derive top validators."""
+    snapshot, error_msg = get_validator_snapshot()
+    return build_top_validators(snapshot, error_msg)
+
+
+def publish_top_validators(out: Dict[str, object]) -> None:
+    """Write top_validators locally and, if configured, to KV."""
     out_path = os.path.join(os.getcwd(), '.github', 'data', 'top_validators.json')
     write_local(out_path, out)
     print(f'Wrote {out_path}')
@@ -301,5 +207,9 @@ def main():
         print('CF credentials missing; skipped KV PUT')
 
 
+def main():
+    publish_top_validators(fetch_top_validators())
+
+
 if __name__ == '__main__':
     main()
@@ -4,13 +4,28 @@ Fetch Top 10 Wallets by Total Balance from Taostats API.
 Includes identity lookup from:
 1. Exchange list (Binance, Kraken, etc.)
 2. On-chain identities set by wallet owners
+
+Identities and the exchange list are kept in a persistent cache
+(KV `wallet_identity_cache`, or a local JSON file without CF credentials)
+with TTLs and negative caching, so only new or expired addresses cost
+Taostats calls. Lookups run concurrently under the Taostats rate limit.
+
+Besides the top 10 list (`top_wallets`), a ranked holder index of the top
+TOP_WALLETS_INDEX_SIZE wallets is published as a columnar payload
+(`top_wallets_index`), fetched with concurrent rate-limited paging and
+refreshed every TOP_WALLETS_INDEX_TTL_HOURS. Dominance uses the live
+circulating supply from `taostats_latest`.
 """
 
 import os
 import sys
 import json
-import requests
-from datetime import datetime, timezone
+import math
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone, timedelta
+
+from kv_client import get_client as get_kv_client
+from http_client import get as http_get
 
 TAOSTATS_API_KEY = os.getenv('TAOSTATS_API_KEY')
 ACCOUNT_URL = "https://api.taostats.io/api/account/latest/v1"
@@ -18,10 +33,98 @@ IDENTITY_URL = "https://api.taostats.io/api/identity/latest/v1"
 EXCHANGE_URL = "https://api.taostats.io/api/exchange/v1"
 
 
-def fetch_exchanges():
-    """Fetch known exchange addresses from Taostats."""
+def _int_env(name, default):
+    v = os.getenv(name)
+    if v is None:
+        return default
+    v2 = v.strip()
+    if v2 == '':
+        return default
+    try:
+        return int(v2)
+    except Exception:
+        print(f"Warning: environment variable {name} is invalid ({v!r}), using default {default}", file=sys.stderr)
+        return default
+
+
+# Identity cache (address -> name, source, fetched_at)
+IDENTITY_CACHE_KEY = "wallet_identity_cache"
+IDENTITY_CACHE_FILE = os.getenv('IDENTITY_CACHE_FILE', 'wallet_identity_cache.json')
+IDENTITY_TTL_HOURS = _int_env('IDENTITY_TTL_HOURS', 7 * 24)          # found identities
+IDENTITY_NEGATIVE_TTL_HOURS = _int_env('IDENTITY_NEGATIVE_TTL_HOURS', 24)  # "no identity" results
+EXCHANGES_TTL_HOURS = _int_env('EXCHANGES_TTL_HOURS', 24)
+IDENTITY_MAX_LOOKUPS = _int_env('IDENTITY_MAX_LOOKUPS', 25)  # cold cache warms up over several runs
+IDENTITY_CONCURRENCY = _int_env('IDENTITY_CONCURRENCY', 3)
+
+# Ranked holder index
+TOP_WALLETS_LIMIT = _int_env('TOP_WALLETS_LIMIT', 10)              # `top_wallets` list
+TOP_WALLETS_INDEX_SIZE = _int_env('TOP_WALLETS_INDEX_SIZE', 1000)  # `top_wallets_index` (up to thousands)
+TOP_WALLETS_INDEX_TTL_HOURS = _int_env('TOP_WALLETS_INDEX_TTL_HOURS', 6)
+IDENTITY_LOOKUP_DEPTH = _int_env('IDENTITY_LOOKUP_DEPTH', 100)     # deeper ranks use exchange/cached names only
+ACCOUNT_PAGE_SIZE = 200  # Taostats max per page
+ACCOUNT_CONCURRENCY = _int_env('ACCOUNT_CONCURRENCY', 4)
+ACCOUNT_MAX_RETRIES = 3
+INDEX_KV_KEY = "top_wallets_index"
+INDEX_FILE = "top_wallets_index.json"
+INDEX_COLUMNS = ["rank", "address", "balance_total", "balance_staked", "dominance", "identity"]
+DEFAULT_CIRCULATING_SUPPLY = float(os.getenv('CIRCULATING_SUPPLY', '10400000'))  # fallback only
+
+
+def get_from_kv(key):
+    """Read a JSON value from Cloudflare KV (None if unavailable)."""
+    kv = get_kv_client()
+    return kv.get_json(key) if kv else None
+
+
+def load_identity_cache():
+    """Load the identity cache from KV (preferred) or the local cache file."""
+    empty = {"identities": {}, "exchanges": None}
+    cache = get_from_kv(IDENTITY_CACHE_KEY)
+    if cache:
+        print(f"🗂️  Identity cache: {len(cache.get('identities', {}))} entries (KV)", file=sys.stderr)
+        return {**empty, **cache}
+    try:
+        with open(IDENTITY_CACHE_FILE) as f:
+            cache = json.load(f)
+            print(f"🗂️  Identity cache: {len(cache.get('identities', {}))} entries ({IDENTITY_CACHE_FILE})", file=sys.stderr)
+            return {**empty, **cache}
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"⚠️ Failed to load identity cache file: {e}", file=sys.stderr)
+    return empty
+
+
+def save_identity_cache(cache):
+    """Persist the identity cache to KV (if configured) and the local cache file."""
+    data = json.dumps(cache)
+    with open(IDENTITY_CACHE_FILE, "w") as f:
+        f.write(data)
+    kv = get_kv_client()
+    if kv and not kv.put_bytes(IDENTITY_CACHE_KEY, data.encode('utf-8'), compress=True):
+        print("⚠️ Failed to save identity cache to KV", file=sys.stderr)
+
+
+def _is_fresh(fetched_at, ttl_hours):
+    """Check whether an ISO timestamp is younger than ttl_hours."""
+    if not fetched_at:
+        return False
+    try:
+        ts = datetime.fromisoformat(fetched_at)
+    except (TypeError, ValueError):
+        return False
+    return datetime.now(timezone.utc) - ts < timedelta(hours=ttl_hours)
+
+
+def fetch_exchanges(cache=None):
+    """Fetch known exchange addresses from Taostats (cached for EXCHANGES_TTL_HOURS)."""
+    cached = (cache or {}).get("exchanges") or {}
+    if cached.get("addresses") and _is_fresh(cached.get("fetched_at"), EXCHANGES_TTL_HOURS):
+        print(f"🏦 Using {len(cached['addresses'])} cached exchange addresses", file=sys.stderr)
+        return dict(cached["addresses"])
+
     if not TAOSTATS_API_KEY:
-        return {}
+        return dict(cached.get("addresses") or {})
     
     headers = {
         "accept": "application/json",
@@ -32,7 +135,7 @@ def fetch_exchanges():
     
     try:
         print("🏦 Fetching known exchanges...", file=sys.stderr)
-        resp = requests.get(EXCHANGE_URL, headers=headers, timeout=30)
+        resp = http_get(EXCHANGE_URL, headers=headers, timeout=30, cache=True)
         resp.raise_for_status()
         data = resp.json()
         
@@ -44,9 +147,17 @@ def fetch_exchanges():
                 if ss58 and name:
                     exchanges[ss58] = name
             print(f"✅ Loaded {len(exchanges)} exchange addresses", file=sys.stderr)
+            if cache is not None and exchanges:
+                cache["exchanges"] = {
+                    "addresses": exchanges,
+                    "fetched_at": datetime.now(timezone.utc).isoformat(),
+                }
         
     except Exception as e:
         print(f"⚠️ Failed to fetch exchanges: {e}", file=sys.stderr)
+        if cached.get("addresses"):
+            print(f"⚠️ Using {len(cached['addresses'])} stale cached exchanges as fallback", file=sys.stderr)
+            return dict(cached["addresses"])
         # Fallback to known addresses
         exchanges = {
             "5Hd2ze5ug8n1bo3UCAcQsf66VNjKqGos8u6apNfzcU86pg4N": "Binance",
@@ -57,8 +168,44 @@ def fetch_exchanges():
     
     return exchanges
 
+def _wallet_entry(acc, rank):
+    """Normalize one Taostats account row into a wallet dict."""
+    address = acc.get("address", {})
+    ss58 = address.get("ss58", "")
+
+    # Convert from rao to TAO (1 TAO = 1e9 rao)
+    balance_total = float(acc.get("balance_total", 0)) / 1e9
+    balance_free = float(acc.get("balance_free", 0)) / 1e9
+    balance_staked = float(acc.get("balance_staked", 0)) / 1e9
+
+    return {
+        "rank": acc.get("rank") or rank,
+        "address": ss58,
+        "address_short": f"{ss58[:6]}...{ss58[-4:]}" if len(ss58) > 12 else ss58,
+        "balance_total": round(balance_total, 2),
+        "balance_free": round(balance_free, 2),
+        "balance_staked": round(balance_staked, 2),
+        "staked_percent": round((balance_staked / balance_total * 100) if balance_total > 0 else 0, 1),
+        "identity": None  # Will be filled by identity lookup
+    }
+
+
+def fetch_account_page(page, page_size, headers):
+    """Fetch one page of accounts ordered by total balance (paced and retried by http_client)."""
+    url = f"{ACCOUNT_URL}?limit={page_size}&page={page}&order=balance_total_desc"
+    resp = http_get(url, headers=headers, timeout=30, retries=ACCOUNT_MAX_RETRIES - 1)
+    resp.raise_for_status()
+    return resp.json().get("data") or []
+
+
 def fetch_top_wallets(limit=10):
-    """Fetch top wallets by total balance."""
+    """
+    Fetch the top `limit` wallets by total balance.
+
+    Pages of ACCOUNT_PAGE_SIZE are fetched concurrently under the shared
+    Taostats rate limit. Only the contiguous prefix of successful pages is kept, so
+    ranks never have gaps.
+    """
     if not TAOSTATS_API_KEY:
         print("❌ TAOSTATS_API_KEY not set", file=sys.stderr)
         return None
@@ -67,98 +214,144 @@ def fetch_top_wallets(limit=10):
         "accept": "application/json",
         "Authorization": TAOSTATS_API_KEY
     }
-    
-    try:
-        # Fetch top accounts ordered by total balance descending
-        url = f"{ACCOUNT_URL}?limit={limit}&order=balance_total_desc"
-        print(f"📊 Fetching top {limit} wallets...", file=sys.stderr)
-        
-        resp = requests.get(url, headers=headers, timeout=30)
-        resp.raise_for_status()
-        data = resp.json()
-        
-        if not data.get("data"):
-            print("❌ No account data returned", file=sys.stderr)
+    page_size = min(limit, ACCOUNT_PAGE_SIZE)
+    pages = list(range(1, math.ceil(limit / page_size) + 1))
+    print(f"📊 Fetching top {limit} wallets ({len(pages)} page(s))...", file=sys.stderr)
+
+    def fetch(page):
+        try:
+            return fetch_account_page(page, page_size, headers)
+        except Exception as e:
+            print(f"❌ Failed to fetch accounts page {page}: {e}", file=sys.stderr)
             return None
-        
-        accounts = data["data"]
-        print(f"✅ Fetched {len(accounts)} accounts", file=sys.stderr)
-        
-        # Process accounts
-        wallets = []
-        for acc in accounts[:limit]:
-            address = acc.get("address", {})
-            ss58 = address.get("ss58", "")
-            
-            # Convert from rao to TAO (1 TAO = 1e9 rao)
-            balance_total = float(acc.get("balance_total", 0)) / 1e9
-            balance_free = float(acc.get("balance_free", 0)) / 1e9
-            balance_staked = float(acc.get("balance_staked", 0)) / 1e9
-            
-            wallet = {
-                "rank": acc.get("rank", 0),
-                "address": ss58,
-                "address_short": f"{ss58[:6]}...{ss58[-4:]}" if len(ss58) > 12 else ss58,
-                "balance_total": round(balance_total, 2),
-                "balance_free": round(balance_free, 2),
-                "balance_staked": round(balance_staked, 2),
-                "staked_percent": round((balance_staked / balance_total * 100) if balance_total > 0 else 0, 1),
-                "identity": None  # Will be filled by identity lookup
-            }
-            wallets.append(wallet)
-        
-        return wallets
-        
-    except Exception as e:
-        print(f"❌ Failed to fetch accounts: {e}", file=sys.stderr)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(ACCOUNT_CONCURRENCY, len(pages)))) as pool:
+        results = list(pool.map(fetch, pages))
+
+    accounts = []
+    for page, rows in zip(pages, results):
+        if rows is None:
+            print(f"⚠️ Truncating index at page {page}", file=sys.stderr)
+            break
+        accounts.extend(rows)
+        if len(rows) < page_size:
+            break
+
+    if not accounts:
+        print("❌ No account data returned", file=sys.stderr)
         return None
 
+    print(f"✅ Fetched {len(accounts)} accounts", file=sys.stderr)
+    return [_wallet_entry(acc, i + 1) for i, acc in enumerate(accounts[:limit])]
+
+
+def fetch_circulating_supply():
+    """Live circulating supply from `taostats_latest` (CIRCULATING_SUPPLY env as fallback)."""
+    latest = get_from_kv("taostats_latest")
+    if isinstance(latest, list):
+        latest = latest[-1] if latest else None
+    supply = (latest or {}).get("circulating_supply")
+    try:
+        if supply and float(supply) > 0:
+            print(f"🪙 Circulating supply: {float(supply):,.0f} τ (taostats_latest)", file=sys.stderr)
+            return float(supply), "taostats_latest"
+    except (TypeError, ValueError):
+        pass
+    print(f"⚠️ Using fallback circulating supply {DEFAULT_CIRCULATING_SUPPLY:,.0f} τ", file=sys.stderr)
+    return DEFAULT_CIRCULATING_SUPPLY, "fallback"
+
+
+def fetch_identity(addr, headers):
+    """Look up the on-chain identity name for one address (None if unset)."""
+    url = f"{IDENTITY_URL}?address={addr}"
+    resp = http_get(url, headers=headers, timeout=10)
+    resp.raise_for_status()
+    data = resp.json()
+    if data.get("data") and len(data["data"]) > 0:
+        identity = data["data"][0]
+        # Try different identity fields
+        return identity.get("display") or identity.get("name") or identity.get("legal")
+    return None
 
-def fetch_identities(addresses, exchanges):
-    """Fetch identities for addresses from exchanges and on-chain."""
-    if not TAOSTATS_API_KEY or not addresses:
+
+def fetch_identities(addresses, exchanges, cache=None, max_lookups=None):
+    """
+    Resolve identities for addresses from exchanges, the cache and on-chain.
+
+    Fresh cache entries (including negative "no identity" entries) cost no
+    API call. Missing or expired addresses are refreshed concurrently under
+    the Taostats rate limit, at most `max_lookups` (IDENTITY_MAX_LOOKUPS)
+    per run; 0 resolves from exchanges and the cache only.
+    """
+    if not addresses:
         return {}
-    
-    headers = {
-        "accept": "application/json",
-        "Authorization": TAOSTATS_API_KEY
-    }
-    
+    if max_lookups is None:
+        max_lookups = IDENTITY_MAX_LOOKUPS
+    if cache is None:
+        cache = {"identities": {}}
+    entries = cache.setdefault("identities", {})
+    now_iso = datetime.now(timezone.utc).isoformat()
+
     identities = {}
-    
+    to_lookup = []
+
     for addr in addresses:
         # Check exchanges first (most reliable)
         if addr in exchanges:
             identities[addr] = exchanges[addr]
-            print(f"  🏦 {addr[:10]}... = {exchanges[addr]} (exchange)", file=sys.stderr)
+            entries[addr] = {"name": exchanges[addr], "source": "exchange", "fetched_at": now_iso}
             continue
-        
-        # Try to fetch on-chain identity
+
+        entry = entries.get(addr)
+        if entry:
+            ttl = IDENTITY_TTL_HOURS if entry.get("name") else IDENTITY_NEGATIVE_TTL_HOURS
+            if _is_fresh(entry.get("fetched_at"), ttl):
+                if entry.get("name"):
+                    identities[addr] = entry["name"]
+                continue
+            # Expired: keep serving the stale name until the refresh succeeds
+            if entry.get("name"):
+                identities[addr] = entry["name"]
+        to_lookup.append(addr)
+
+    if not TAOSTATS_API_KEY or not to_lookup or max_lookups <= 0:
+        print(f"  🗂️  {len(addresses) - len(to_lookup)} identities from cache, 0 lookups", file=sys.stderr)
+        return identities
+
+    deferred = len(to_lookup) - max_lookups
+    to_lookup = to_lookup[:max_lookups]
+    print(f"  🔎 {len(to_lookup)} on-chain lookups ({max(0, deferred)} deferred to later runs)", file=sys.stderr)
+
+    headers = {
+        "accept": "application/json",
+        "Authorization": TAOSTATS_API_KEY
+    }
+
+    def lookup(addr):
         try:
-            url = f"{IDENTITY_URL}?address={addr}"
-            resp = requests.get(url, headers=headers, timeout=10)
-            if resp.ok:
-                data = resp.json()
-                if data.get("data") and len(data["data"]) > 0:
-                    identity = data["data"][0]
-                    # Try different identity fields
-                    name = identity.get("display") or identity.get("name") or identity.get("legal")
-                    if name:
-                        identities[addr] = name
-                        print(f"  🔗 {addr[:10]}... = {name} (on-chain)", file=sys.stderr)
+            return addr, fetch_identity(addr, headers), None
         except Exception as e:
-            print(f"  ⚠️ Identity lookup failed for {addr[:10]}...: {e}", file=sys.stderr)
-    
+            return addr, None, e
+
+    with ThreadPoolExecutor(max_workers=max(1, IDENTITY_CONCURRENCY)) as pool:
+        for addr, name, error in pool.map(lookup, to_lookup):
+            if error is not None:
+                # Don't cache failures - retry on the next run
+                print(f"  ⚠️ Identity lookup failed for {addr[:10]}...: {error}", file=sys.stderr)
+                continue
+            entries[addr] = {"name": name, "source": "onchain" if name else "none",
+                             "fetched_at": datetime.now(timezone.utc).isoformat()}
+            if name:
+                identities[addr] = name
+                print(f"  🔗 {addr[:10]}... = {name} (on-chain)", file=sys.stderr)
+
     return identities
 
 
 def calculate_dominance(wallets, circulating_supply=None):
     """Calculate dominance percentage for each wallet."""
-    # If no supply provided, estimate from total of top wallets
-    # (This is a rough estimate - ideally get from taostats API)
     if not circulating_supply:
-        # Try to get from environment or use a reasonable estimate
-        circulating_supply = float(os.getenv('CIRCULATING_SUPPLY', '10400000'))
+        circulating_supply = DEFAULT_CIRCULATING_SUPPLY
     
     for wallet in wallets:
         wallet["dominance"] = round(
@@ -169,35 +362,90 @@ def calculate_dominance(wallets, circulating_supply=None):
     return wallets
 
 
+def build_index(wallets, circulating_supply, supply_source, index_size):
+    """
+    Columnar ranked-holder index: one array per column, row i = rank i + 1.
+
+    Parallel arrays avoid repeating keys per row (about half the size of the
+    row-object form) and let the frontend slice pages by offset.
+    """
+    index = {"columns": INDEX_COLUMNS}
+    for col in INDEX_COLUMNS:
+        index[col] = [w.get(col) for w in wallets]
+    total = sum(w["balance_total"] for w in wallets)
+    now_iso = datetime.now(timezone.utc).isoformat()
+    index.update({
+        "count": len(wallets),
+        "index_size": index_size,  # requested size; `count` is lower when fewer wallets qualify
+        "page_size": ACCOUNT_PAGE_SIZE,
+        "total_balance": round(total, 2),
+        "total_dominance": round(total / circulating_supply * 100, 2) if circulating_supply > 0 else 0,
+        "circulating_supply": round(circulating_supply, 2),
+        "supply_source": supply_source,
+        "_source": "taostats",
+        "_timestamp": now_iso,
+        "last_updated": now_iso,
+    })
+    return index
+
+
+def index_is_stale():
+    """
+    Whether the published `top_wallets_index` is older than TOP_WALLETS_INDEX_TTL_HOURS
+    or was built for a smaller TOP_WALLETS_INDEX_SIZE.
+
+    The size built for is compared, not the row count: when fewer wallets
+    qualify than requested, the index is still complete until the TTL.
+    """
+    if os.getenv('TOP_WALLETS_INDEX_FORCE', '').lower() in ('1', 'true', 'yes'):
+        return True
+    current = get_from_kv(INDEX_KV_KEY)
+    if not current or current.get("index_size", current.get("count", 0)) < TOP_WALLETS_INDEX_SIZE:
+        return True
+    return not _is_fresh(current.get("_timestamp"), TOP_WALLETS_INDEX_TTL_HOURS)
+
+
 def main():
-    # Fetch known exchanges first
-    exchanges = fetch_exchanges()
-    
-    # Fetch top 10 wallets
-    wallets = fetch_top_wallets(10)
+    # Load identity cache, then known exchanges (cached for EXCHANGES_TTL_HOURS)
+    identity_cache = load_identity_cache()
+    exchanges = fetch_exchanges(identity_cache)
+    circulating_supply, supply_source = fetch_circulating_supply()
+
+    # Deep index pages are only fetched when the published index is stale;
+    # otherwise one page covers the top list.
+    index_size = max(TOP_WALLETS_LIMIT, TOP_WALLETS_INDEX_SIZE)
+    refresh_index = index_size > TOP_WALLETS_LIMIT and index_is_stale()
+    ranked = fetch_top_wallets(index_size if refresh_index else TOP_WALLETS_LIMIT)
     
-    if not wallets:
+    if not ranked:
         print("❌ No wallet data fetched", file=sys.stderr)
         sys.exit(1)
     
-    # Fetch identities for all addresses (using exchanges + on-chain)
+    # Identities: on-chain lookups for the top IDENTITY_LOOKUP_DEPTH ranks,
+    # exchange/cached names only below that
     print("\n🔍 Looking up identities...", file=sys.stderr)
-    addresses = [w["address"] for w in wallets]
-    identities = fetch_identities(addresses, exchanges)
+    addresses = [w["address"] for w in ranked]
+    depth = max(TOP_WALLETS_LIMIT, IDENTITY_LOOKUP_DEPTH)
+    identities = fetch_identities(addresses[:depth], exchanges, identity_cache)
+    identities.update(fetch_identities(addresses[depth:], exchanges, identity_cache, max_lookups=0))
+    save_identity_cache(identity_cache)
     
     # Apply identities to wallets
-    for wallet in wallets:
+    for wallet in ranked:
         addr = wallet["address"]
         if addr in identities:
             wallet["identity"] = identities[addr]
     
-    # Calculate dominance
-    wallets = calculate_dominance(wallets)
+    # Calculate dominance against live circulating supply
+    ranked = calculate_dominance(ranked, circulating_supply)
+    wallets = ranked[:TOP_WALLETS_LIMIT]
     
     # Build result
     now_iso = datetime.now(timezone.utc).isoformat()
     result = {
         "wallets": wallets,
+        "circulating_supply": round(circulating_supply, 2),
+        "supply_source": supply_source,
         "_source": "taostats",
         "_timestamp": now_iso,
         "last_updated": now_iso,
@@ -210,9 +458,17 @@ def main():
         json.dump(result, f, indent=2)
     
     print(f"✅ Top wallets written to {output_file}", file=sys.stderr)
+
+    if refresh_index:
+        index = build_index(ranked, circulating_supply, supply_source, index_size)
+        with open(INDEX_FILE, "w") as f:
+            json.dump(index, f, separators=(',', ':'))
+        print(f"✅ Ranked index ({index['count']} wallets, {index['total_dominance']}% of supply) written to {INDEX_FILE}", file=sys.stderr)
+    else:
+        print(f"⏭️  Ranked index still fresh (< {TOP_WALLETS_INDEX_TTL_HOURS}h), not refetched", file=sys.stderr)
     
     # Print summary
-    print("\n📊 Top 10 Wallets by Balance:", file=sys.stderr)
+    print(f"\n📊 Top {len(wallets)} Wallets by Balance:", file=sys.stderr)
     for w in wallets:
         name = w["identity"] or w["address_short"]
         print(f"  #{w['rank']} {name}: {w['balance_total']:,.0f} τ ({w['dominance']}%)", file=sys.stderr)
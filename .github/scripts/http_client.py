@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+"""
+Shared HTTP fetch layer for the upstream APIs (Taostats, CoinGecko, ...).
+
+Every fetcher goes through one pooled `requests.Session` per process and the
+same pacing and retry policy, instead of each script sleeping its own fixed
+or worst-case delays:
+
+  * requests to rate-limited hosts (see rate_limiter.HOST_LIMITS; Taostats
+    is 5/min) first take a token from the host's shared bucket, so a run
+    proceeds at the fastest pace the API allows and concurrent workers share
+    the same quota
+  * each request is counted against the host's persistent monthly budget
+    (rate_limiter.budget()); past it, BudgetExceeded is raised before any
+    request is sent
+  * 429 / 5xx responses and connection errors are retried up to
+    HTTP_MAX_RETRIES times. A Retry-After (seconds or HTTP date) pauses the
+    host's bucket for every thread; otherwise full-jitter exponential
+    backoff (HTTP_BACKOFF_BASE * 2**attempt) is used
+  * `cache=True` GETs go through an on-disk HTTP cache (HTTP_CACHE_DIR):
+    a response younger than its freshness lifetime costs no request at all,
+    an older one is revalidated with If-None-Match / If-Modified-Since so an
+    unchanged upstream costs a 304 without a body. Freshness is the larger of
+    the Cache-Control max-age (or Expires) and the endpoint's minimum TTL
+    from CACHE_MIN_TTL; `no-store` responses are never stored. Callers
+    that pass `allow_stale=True` get the stale copy (`from_cache == 'stale'`)
+    when the upstream fails or the budget is spent; everyone else gets the
+    error, so their own fallbacks still run
+  * retries, failures and cache outcomes log to stderr; `summary()` has
+    per-host totals, including cache hits / 304s / misses / stale serves
+
+Typical use:
+
+    from http_client import get, get_json
+    resp = get(url, headers=headers, timeout=30)   # last response, even if 429
+    resp.raise_for_status()
+    data = get_json(url, headers=headers)          # raises on HTTP errors
+    data = get_json(url, cache=True)               # served from / revalidated against the cache
+    resp = get(url, cache=True, allow_stale=True)  # resp.fetched_at: when upstream last sent / confirmed it
+
+Environment variables:
+  HTTP_TIMEOUT        Default per-request timeout in seconds (default: 30)
+  HTTP_MAX_RETRIES    Retries after the first attempt (default: 3)
+  HTTP_BACKOFF_BASE   Backoff base in seconds (default: 1)
+  HTTP_RETRY_AFTER_MAX  Longest Retry-After honoured, in seconds (default: 120)
+  HTTP_CACHE_DIR      Response cache directory (default: .github/data/http_cache)
+  HTTP_CACHE          Use the response cache for cache=True calls (default: 1)
+  HTTP_CACHE_MIN_TTL  Override every endpoint's minimum TTL, in seconds (e.g. 0)
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import hashlib
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from rate_limiter import BudgetExceeded, budget, limiter_for
+
+
+def _int_env(name, default):
+    v = os.getenv(name)
+    if v is None:
+        return default
+    v2 = v.strip()
+    if v2 == '':
+        return default
+    try:
+        return int(v2)
+    except Exception:
+        print(f"Warning: environment variable {name} is invalid ({v!r}), using default {default}", file=sys.stderr)
+        return default
+
+
+def _float_env(name, default):
+    v = os.getenv(name)
+    if v is None or v.strip() == '':
+        return default
+    try:
+        return float(v)
+    except Exception:
+        print(f"Warning: environment variable {name} is invalid ({v!r}), using default {default}", file=sys.stderr)
+        return default
+
+
+HTTP_TIMEOUT = _float_env('HTTP_TIMEOUT', 30.0)
+HTTP_MAX_RETRIES = _int_env('HTTP_MAX_RETRIES', 3)
+HTTP_BACKOFF_BASE = _float_env('HTTP_BACKOFF_BASE', 1.0)
+HTTP_BACKOFF_MAX = 60.0
+HTTP_RETRY_AFTER_MAX = _float_env('HTTP_RETRY_AFTER_MAX', 120.0)
+HTTP_POOL_SIZE = 16
+RETRY_STATUS = (429, 500, 502, 503, 504)
+HTTP_CACHE_DIR = os.getenv('HTTP_CACHE_DIR', os.path.join('.github', 'data', 'http_cache'))
+HTTP_CACHE = os.getenv('HTTP_CACHE', '1').strip().lower() not in ('0', 'false', 'no', '')
+# Minimum freshness per endpoint ("host/path" prefix -> seconds), applied even
+# when the upstream sends no (or a shorter) max-age
+CACHE_MIN_TTL: Dict[str, int] = {
+    'api.coingecko.com/api/v3/coins/bittensor': 3600,      # ATH/ATL move rarely
+    'api.alternative.me/fng/': 3600,                       # index updates once a day
+    'api.dexscreener.com/latest/dex/tokens/': 60,          # pairs are cached ~1 min upstream
+    'api.taostats.io/api/exchange/v1': 6 * 3600,           # exchange address list
+}
+CACHE_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Cache-Control', 'Expires', 'Date', 'Age')
+
+__all__ = ['BudgetExceeded', 'get', 'get_json', 'min_ttl_for', 'request', 'session', 'summary']
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+_stats: Dict[str, Dict[str, float]] = {}
+
+
+def session() -> requests.Session:
+    """Process-wide keep-alive session shared by every fetcher."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            s = requests.Session()
+            adapter = HTTPAdapter(pool_connections=8, pool_maxsize=HTTP_POOL_SIZE)
+            s.mount('https://', adapter)
+            s.mount('http://', adapter)
+            _session = s
+        return _session
+
+
+def _retry_after(resp) -> Optional[float]:
+    """Retry-After in seconds (delta-seconds or HTTP date), capped at HTTP_RETRY_AFTER_MAX."""
+    value = resp.headers.get('Retry-After') if resp is not None else None
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds()
+        except (TypeError, ValueError):
+            return None
+    return min(max(0.0, seconds), HTTP_RETRY_AFTER_MAX)
+
+
+def _backoff(attempt: int) -> float:
+    return random.uniform(0, min(HTTP_BACKOFF_MAX, HTTP_BACKOFF_BASE * 2 ** attempt))
+
+
+def _host_stats(host: str) -> Dict[str, float]:
+    return _stats.setdefault(host, {"calls": 0, "retries": 0, "errors": 0, "ms": 0.0, "waited_s": 0.0,
+                                    "cache_hit": 0, "cache_304": 0, "cache_miss": 0, "cache_stale": 0})
+
+
+def _record(host: str, resp, elapsed: float, attempt: int, waited: float):
+    with _session_lock:
+        s = _host_stats(host)
+        s["calls"] += 1
+        s["retries"] += 1 if attempt else 0
+        s["errors"] += 1 if resp is None or resp.status_code >= 400 else 0
+        s["ms"] += elapsed * 1000
+        s["waited_s"] += waited
+
+
+def _send(method: str, url: str, timeout: float, retries: int, **kwargs) -> requests.Response:
+    host = urlsplit(url).hostname or ''
+    limiter = limiter_for(host)
+    resp, error = None, None
+    for attempt in range(retries + 1):
+        waited = 0.0
+        if limiter:
+            t0 = time.perf_counter()
+            limiter.acquire()
+            waited = time.perf_counter() - t0
+        budget().spend(host)
+        t0 = time.perf_counter()
+        try:
+            resp, error = session().request(method, url, timeout=timeout, **kwargs), None
+        except requests.exceptions.RequestException as e:
+            resp, error = None, e
+        _record(host, resp, time.perf_counter() - t0, attempt, waited)
+        if resp is not None and resp.status_code not in RETRY_STATUS:
+            return resp
+        outcome = resp.status_code if resp is not None else f"{error.__class__.__name__}: {error}"
+        if attempt == retries:
+            print(f"❌ HTTP {method} {host} {outcome} after {retries + 1} attempts", file=sys.stderr)
+            break
+        retry_after = _retry_after(resp)
+        delay = retry_after if retry_after is not None else _backoff(attempt)
+        print(f"⚠️ HTTP {method} {host} {outcome}, retrying in {delay:.1f}s "
+              f"(attempt {attempt + 1}/{retries + 1})", file=sys.stderr)
+        if retry_after is not None and limiter:
+            limiter.pause(retry_after)  # the next acquire() waits it out, for every thread
+        else:
+            time.sleep(delay)
+    if resp is None:
+        raise error
+    return resp
+
+
+# === Response cache ===
+
+def _cache_paths(url: str):
+    digest = hashlib.sha256(url.encode('utf-8')).hexdigest()[:32]
+    base = os.path.join(HTTP_CACHE_DIR, digest)
+    return base + '.json', base + '.body'
+
+
+def _cache_load(url: str) -> Optional[Dict]:
+    meta_path, body_path = _cache_paths(url)
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+        with open(body_path, 'rb') as f:
+            meta['body'] = f.read()
+    except (OSError, ValueError):
+        return None
+    return meta if meta.get('url') == url else None
+
+
+def _cache_save(entry: Dict):
+    meta_path, body_path = _cache_paths(entry['url'])
+    meta = {k: v for k, v in entry.items() if k != 'body'}
+    try:
+        os.makedirs(HTTP_CACHE_DIR, exist_ok=True)
+        if 'body' in entry:
+            with open(body_path + '.tmp', 'wb') as f:
+                f.write(entry['body'])
+            os.replace(body_path + '.tmp', body_path)
+        with open(meta_path + '.tmp', 'w') as f:
+            json.dump(meta, f)
+        os.replace(meta_path + '.tmp', meta_path)
+    except OSError as e:
+        print(f"⚠️ HTTP cache write failed: {e}", file=sys.stderr)
+
+
+def min_ttl_for(url: str) -> int:
+    """Minimum freshness for `url` from CACHE_MIN_TTL (HTTP_CACHE_MIN_TTL overrides)."""
+    override = os.getenv('HTTP_CACHE_MIN_TTL', '').strip()
+    if override:
+        try:
+            return int(override)
+        except ValueError:
+            pass
+    parts = urlsplit(url)
+    target = f"{parts.hostname or ''}{parts.path}"
+    matches = [p for p in CACHE_MIN_TTL if target.startswith(p)]
+    return CACHE_MIN_TTL[max(matches, key=len)] if matches else 0
+
+
+def _lifetime(headers) -> Optional[float]:
+    """Freshness lifetime from Cache-Control / Expires; None when the response must not be stored."""
+    cc = (headers.get('Cache-Control') or '').lower()
+    if 'no-store' in cc:
+        return None
+    if 'no-cache' in cc:
+        return 0.0
+    m = re.search(r'(?:^|[,\s])max-age=(\d+)', cc)
+    if m:
+        try:
+            age = float(headers.get('Age') or 0)
+        except ValueError:
+            age = 0.0
+        return max(0.0, int(m.group(1)) - age)
+    if headers.get('Expires'):
+        try:
+            expires = parsedate_to_datetime(headers['Expires'])
+            date = parsedate_to_datetime(headers['Date']) if headers.get('Date') else datetime.now(timezone.utc)
+            return max(0.0, (expires - date).total_seconds())
+        except (TypeError, ValueError):
+            return 0.0
+    return 0.0
+
+
+def _refresh(entry: Dict, headers, min_ttl: int):
+    """Take validators / freshness from a 200 or 304 and restart the entry's clock."""
+    for name in CACHE_HEADERS:
+        if headers.get(name) is not None:
+            entry['headers'][name] = headers[name]
+    lifetime = _lifetime(entry['headers']) or 0.0
+    entry['stored_at'] = time.time()
+    entry['fresh_until'] = entry['stored_at'] + max(lifetime, min_ttl)
+
+
+def _cached_response(entry: Dict, outcome: str) -> requests.Response:
+    resp = requests.Response()
+    resp.status_code = 200
+    resp._content = entry['body']
+    resp.headers = CaseInsensitiveDict(entry.get('headers') or {})
+    resp.url = entry['url']
+    resp.from_cache = outcome
+    resp.fetched_at = entry['stored_at']
+    return resp
+
+
+def _cache_event(host: str, kind: str, url: str, detail: str = ''):
+    with _session_lock:
+        _host_stats(host)[kind] += 1
+    print(f"🧊 HTTP cache {kind[6:]} {host}{urlsplit(url).path}{detail}", file=sys.stderr)
+
+
+def _cached_get(url: str, timeout: float, retries: int, min_ttl: Optional[int] = None,
+                allow_stale: bool = False, params=None, headers=None, **kwargs) -> requests.Response:
+    url = requests.Request('GET', url, params=params).prepare().url
+    host = urlsplit(url).hostname or ''
+    min_ttl = min_ttl_for(url) if min_ttl is None else min_ttl
+    entry = _cache_load(url)
+    now = time.time()
+    if entry and now < entry.get('fresh_until', 0):
+        _cache_event(host, 'cache_hit', url, f" (fresh for {entry['fresh_until'] - now:.0f}s)")
+        return _cached_response(entry, 'hit')
+
+    headers = dict(headers or {})
+    if entry:
+        if entry['headers'].get('ETag'):
+            headers['If-None-Match'] = entry['headers']['ETag']
+        if entry['headers'].get('Last-Modified'):
+            headers['If-Modified-Since'] = entry['headers']['Last-Modified']
+    try:
+        resp = _send('GET', url, timeout, retries, headers=headers, **kwargs)
+    except (requests.exceptions.RequestException, BudgetExceeded) as e:
+        if entry and allow_stale:
+            _cache_event(host, 'cache_stale', url, f" ({e.__class__.__name__})")
+            return _cached_response(entry, 'stale')
+        raise
+
+    if resp.status_code == 304 and entry:
+        _refresh(entry, resp.headers, min_ttl)
+        _cache_save(entry)
+        _cache_event(host, 'cache_304', url)
+        return _cached_response(entry, 'revalidated')
+    if resp.status_code == 200:
+        _cache_event(host, 'cache_miss', url, f" ({len(resp.content):,}B)")
+        if _lifetime(resp.headers) is not None:
+            entry = {'url': url, 'headers': {}, 'body': resp.content}
+            _refresh(entry, resp.headers, min_ttl)
+            _cache_save(entry)
+        resp.from_cache = 'miss'
+        resp.fetched_at = time.time()
+        return resp
+    if entry and allow_stale and (resp.status_code in RETRY_STATUS or resp.status_code == 304):
+        _cache_event(host, 'cache_stale', url, f" (HTTP {resp.status_code})")
+        return _cached_response(entry, 'stale')
+    resp.from_cache, resp.fetched_at = 'miss', time.time()
+    return resp
+
+
+def request(method: str, url: str, timeout: Optional[float] = None,
+            retries: Optional[int] = None, cache: bool = False, **kwargs) -> requests.Response:
+    """
+    Send one request under the host's rate limit and budget, with retries.
+
+    Returns the last response (possibly still a 429/5xx once retries run
+    out); raises the last connection error when no attempt got a response,
+    and BudgetExceeded when the host's monthly budget is used up.
+
+    With `cache=True` (GET only) the response cache is consulted first and
+    the returned response carries `from_cache` ('hit', 'revalidated',
+    'stale' or 'miss') and `fetched_at` (epoch seconds the upstream last
+    sent or confirmed the body); `min_ttl=` overrides the endpoint's minimum
+    TTL. Stale copies are only returned with `allow_stale=True`.
+    """
+    timeout = HTTP_TIMEOUT if timeout is None else timeout
+    retries = HTTP_MAX_RETRIES if retries is None else retries
+    if cache and HTTP_CACHE and method == 'GET':
+        return _cached_get(url, timeout, retries, **kwargs)
+    kwargs.pop('min_ttl', None)
+    kwargs.pop('allow_stale', None)
+    resp = _send(method, url, timeout, retries, **kwargs)
+    if cache:  # cache disabled: same attributes as a miss
+        resp.from_cache, resp.fetched_at = None, time.time()
+    return resp
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    return request('GET', url, **kwargs)
+
+
+def get_json(url: str, **kwargs) -> Any:
+    """GET and decode JSON; raises requests.HTTPError on a non-2xx final response."""
+    resp = get(url, **kwargs)
+    resp.raise_for_status()
+    return resp.json()
+
+
+def summary() -> Dict[str, Dict]:
+    """Per-host totals over every request made by this process."""
+    with _session_lock:
+        return {host: {k: round(v, 1) if isinstance(v, float) else v for k, v in s.items()}
+                for host, s in _stats.items()}
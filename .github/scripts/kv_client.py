@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+"""
+Shared Cloudflare Workers KV client for the fetch/publish scripts.
+
+All scripts talk to KV through one pooled `requests.Session` per process
+(keep-alive, so a run that reads a dozen chunks pays for one TLS handshake),
+with the same retry and logging behaviour everywhere:
+
+  * 429 / 5xx responses and connection errors are retried up to
+    KV_MAX_RETRIES times with full-jitter exponential backoff
+    (KV_BACKOFF_BASE * 2**attempt, honouring Retry-After when present)
+  * every call logs method, key, status, latency and bytes to stderr
+    (KV_LOG=0 silences it; `KVClient.summary()` keeps running totals either way)
+  * multi-key jobs use the bulk endpoints (`get_many` / `put_many` /
+    `delete_many`): one request per phase instead of one per key
+  * values can be gzip-compressed on write (`compress=True`, or every value
+    above KV_GZIP_MIN_BYTES when set); reads detect the gzip magic and
+    decompress transparently. Only use it for keys that no Worker reads
+    directly.
+
+Typical use:
+
+    from kv_client import get_client
+    kv = get_client()                 # from CF_* env, None when unconfigured
+    data = kv.get_json('top_validators')
+    kv.put_json('top_validators', data)
+    chunks = kv.get_many(['network_history_2025-01-01', 'network_history_2025-01-02'])
+    kv.put_many({'a': 1, 'b': [2, 3]})
+
+`client(account, token, namespace)` returns the shared client for explicit
+credentials, which is what the per-script get_from_kv/put_to_kv helpers use.
+
+Environment variables:
+  CF_ACCOUNT_ID, CF_API_TOKEN, CF_KV_NAMESPACE_ID (or CF_METRICS_NAMESPACE_ID)
+  CF_API_BASE         API base URL (default: https://api.cloudflare.com/client/v4;
+                      point it at kv_local.py for offline runs)
+  KV_TIMEOUT          Per-request timeout in seconds (default: 30)
+  KV_MAX_RETRIES      Retries after the first attempt (default: 3)
+  KV_BACKOFF_BASE     Backoff base in seconds (default: 0.5)
+  KV_GZIP_MIN_BYTES   Compress every value at least this large (default: 0 = off)
+  KV_LOG              Per-call log lines on stderr (default: 1)
+"""
+
+import os
+import sys
+import gzip
+import base64
+import json
+import time
+import random
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import quote
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+def _int_env(name, default):
+    v = os.getenv(name)
+    if v is None:
+        return default
+    v2 = v.strip()
+    if v2 == '':
+        return default
+    try:
+        return int(v2)
+    except Exception:
+        print(f"Warning: environment variable {name} is invalid ({v!r}), using default {default}", file=sys.stderr)
+        return default
+
+
+def _float_env(name, default):
+    v = os.getenv(name)
+    if v is None or v.strip() == '':
+        return default
+    try:
+        return float(v)
+    except Exception:
+        print(f"Warning: environment variable {name} is invalid ({v!r}), using default {default}", file=sys.stderr)
+        return default
+
+
+KV_API_BASE = (os.getenv('CF_API_BASE') or 'https://api.cloudflare.com/client/v4').rstrip('/')
+KV_TIMEOUT = _float_env('KV_TIMEOUT', 30.0)
+KV_MAX_RETRIES = _int_env('KV_MAX_RETRIES', 3)
+KV_BACKOFF_BASE = _float_env('KV_BACKOFF_BASE', 0.5)
+KV_BACKOFF_MAX = 20.0
+KV_GZIP_MIN_BYTES = _int_env('KV_GZIP_MIN_BYTES', 0)
+KV_LOG = os.getenv('KV_LOG', '1').strip().lower() not in ('0', 'false', 'no', '')
+KV_POOL_SIZE = 16
+RETRY_STATUS = (429, 500, 502, 503, 504)
+GZIP_MAGIC = b'\x1f\x8b'
+BULK_GET_MAX_KEYS = 100                 # Cloudflare limit per bulk get
+BULK_PUT_MAX_KEYS = 10_000              # Cloudflare limit per bulk write / delete
+BULK_PUT_MAX_BYTES = 90 * 1024 * 1024   # stay under the 100 MB request limit
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+_clients: Dict[Tuple[str, str, str], 'KVClient'] = {}
+
+
+def session() -> requests.Session:
+    """Process-wide keep-alive session shared by every KV client."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            s = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=KV_POOL_SIZE)
+            s.mount('https://', adapter)
+            s.mount('http://', adapter)
+            _session = s
+        return _session
+
+
+def _retry_after(resp) -> Optional[float]:
+    value = resp.headers.get('Retry-After') if resp is not None else None
+    try:
+        return max(0.0, float(value)) if value else None
+    except ValueError:
+        return None
+
+
+def _maybe_gunzip(data: bytes) -> bytes:
+    if data[:2] == GZIP_MAGIC:
+        try:
+            return gzip.decompress(data)
+        except OSError:
+            pass
+    return data
+
+
+def _backoff(attempt: int) -> float:
+    return random.uniform(0, min(KV_BACKOFF_MAX, KV_BACKOFF_BASE * 2 ** attempt))
+
+
+class KVClient:
+    """One KV namespace, sharing the process-wide session."""
+
+    def __init__(self, account: str, token: str, namespace: str,
+                 timeout: float = KV_TIMEOUT, retries: int = KV_MAX_RETRIES,
+                 gzip_min_bytes: int = KV_GZIP_MIN_BYTES):
+        self.account = account
+        self.token = token
+        self.namespace = namespace
+        self.timeout = timeout
+        self.retries = retries
+        self.gzip_min_bytes = gzip_min_bytes
+        self.stats: Dict[str, float] = {"calls": 0, "retries": 0, "errors": 0, "ms": 0.0, "sent": 0, "received": 0}
+        self.stats_lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        return f"{KV_API_BASE}/accounts/{self.account}/storage/kv/namespaces/{self.namespace}"
+
+    @staticmethod
+    def value_path(key: str) -> str:
+        return f"/values/{quote(key, safe='')}"
+
+    def request(self, method: str, path: str, label: str, **kwargs) -> Optional[requests.Response]:
+        """Send one KV API request with retries; None when every attempt failed to connect."""
+        headers = {"Authorization": f"Bearer {self.token}", **kwargs.pop('headers', {})}
+        sent = len(kwargs.get('data') or b'')
+        resp = None
+        for attempt in range(self.retries + 1):
+            t0 = time.perf_counter()
+            error = None
+            try:
+                resp = session().request(method, f"{self.base_url}{path}", headers=headers,
+                                         timeout=self.timeout, **kwargs)
+            except requests.exceptions.RequestException as e:
+                resp, error = None, e
+            self._record(method, label, resp, error, sent, time.perf_counter() - t0, attempt)
+            if resp is not None and resp.status_code not in RETRY_STATUS:
+                return resp
+            if attempt < self.retries:
+                time.sleep(_retry_after(resp) or _backoff(attempt))
+        return resp
+
+    def _record(self, method, label, resp, error, sent, elapsed, attempt):
+        status = resp.status_code if resp is not None else None
+        received = len(resp.content) if resp is not None else 0
+        with self.stats_lock:
+            s = self.stats
+            s["calls"] += 1
+            s["retries"] += 1 if attempt else 0
+            s["errors"] += 1 if status is None or (status >= 400 and status != 404) else 0  # 404 = missing key
+            s["ms"] += elapsed * 1000
+            s["sent"] += sent
+            s["received"] += received
+        if KV_LOG:
+            outcome = status if error is None else f"error ({error.__class__.__name__})"
+            retry = f" retry {attempt}" if attempt else ""
+            print(f"🗄️ KV {method} {label} {outcome} {elapsed * 1000:.0f}ms "
+                  f"↑{sent:,}B ↓{received:,}B{retry}", file=sys.stderr)
+
+    # === Single values ===
+
+    def read(self, key: str) -> Tuple[Optional[int], Optional[bytes]]:
+        """(HTTP status, value) — status is None when KV could not be reached, value only set on 200."""
+        resp = self.request('GET', self.value_path(key), key)
+        if resp is None:
+            return None, None
+        if resp.status_code != 200:
+            return resp.status_code, None
+        return 200, _maybe_gunzip(resp.content)
+
+    def get_bytes(self, key: str) -> Optional[bytes]:
+        """Raw value (gunzipped when stored compressed); None when missing or on error."""
+        status, data = self.read(key)
+        if status not in (200, 404):
+            print(f"⚠️ KV GET {key} returned {status}", file=sys.stderr)
+        return data
+
+    def get_json(self, key: str) -> Any:
+        """Parsed JSON value; None when missing, empty or unparsable."""
+        data = self.get_bytes(key)
+        if not data:
+            return None
+        try:
+            return json.loads(data.decode('utf-8'))
+        except ValueError:
+            print(f"⚠️ KV GET {key}: value is not JSON", file=sys.stderr)
+            return None
+
+    def _encode(self, data: bytes, compress: Optional[bool]) -> Tuple[bytes, bool]:
+        if compress is None:
+            compress = bool(self.gzip_min_bytes) and len(data) >= self.gzip_min_bytes
+        if compress:
+            return gzip.compress(data, compresslevel=6, mtime=0), True
+        return data, False
+
+    def put_bytes(self, key: str, data: bytes, content_type: str = 'application/json',
+                  compress: Optional[bool] = None) -> bool:
+        data, compressed = self._encode(data, compress)
+        if compressed:
+            content_type = 'application/octet-stream'
+        resp = self.request('PUT', self.value_path(key), key, data=data,
+                            headers={"Content-Type": content_type})
+        if resp is None:
+            return False
+        if resp.status_code not in (200, 204):
+            print(f"⚠️ KV PUT {key} returned {resp.status_code}: {resp.text[:200]}", file=sys.stderr)
+            return False
+        return True
+
+    def put_json(self, key: str, obj: Any, compact: bool = True, compress: Optional[bool] = None) -> bool:
+        separators = (',', ':') if compact else None
+        return self.put_bytes(key, json.dumps(obj, separators=separators).encode('utf-8'), compress=compress)
+
+    def delete(self, key: str) -> bool:
+        resp = self.request('DELETE', self.value_path(key), key)
+        return resp is not None and resp.status_code in (200, 204, 404)
+
+    def list_keys(self, prefix: str = '') -> Optional[List[str]]:
+        """Every key name starting with `prefix` (GET /keys, 1000 per page); None on error."""
+        names: List[str] = []
+        cursor = ''
+        while True:
+            params = {'prefix': prefix, 'limit': 1000}
+            if cursor:
+                params['cursor'] = cursor
+            resp = self.request('GET', '/keys', f"keys:{prefix}*", params=params)
+            if resp is None or resp.status_code != 200:
+                print(f"⚠️ KV list {prefix}* returned {resp.status_code if resp is not None else 'no response'}",
+                      file=sys.stderr)
+                return None
+            body = resp.json()
+            names.extend(k['name'] for k in body.get('result') or [])
+            cursor = (body.get('result_info') or {}).get('cursor') or ''
+            if not cursor:
+                return names
+
+    # === Bulk (one round trip per batch) ===
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """
+        {key: parsed JSON or None} via POST /bulk/get, BULK_GET_MAX_KEYS keys per request.
+
+        The bulk endpoint returns values as text, so keys stored gzipped or
+        as binary are re-read with a single GET; a failed batch falls back
+        to single GETs as well.
+        """
+        keys = list(dict.fromkeys(keys))
+        out: Dict[str, Any] = {}
+        for i in range(0, len(keys), BULK_GET_MAX_KEYS):
+            batch = keys[i:i + BULK_GET_MAX_KEYS]
+            body = json.dumps({"keys": batch, "type": "text"}).encode('utf-8')
+            resp = self.request('POST', '/bulk/get', f"bulk/get[{len(batch)}]", data=body,
+                                headers={"Content-Type": "application/json"})
+            values = None
+            if resp is not None and resp.status_code == 200:
+                try:
+                    values = resp.json()['result']['values']
+                except (ValueError, KeyError, TypeError):
+                    values = None
+            if not isinstance(values, dict):
+                print(f"⚠️ KV bulk get failed ({resp.status_code if resp is not None else 'no response'}); "
+                      f"falling back to {len(batch)} single GETs", file=sys.stderr)
+                for key in batch:
+                    out[key] = self.get_json(key)
+                continue
+            for key in batch:
+                text = values.get(key)
+                if text is None or text == '':
+                    out[key] = None
+                    continue
+                try:
+                    out[key] = json.loads(text) if isinstance(text, str) else text
+                except ValueError:
+                    out[key] = self.get_json(key)  # gzipped / binary value
+        return out
+
+    def put_many(self, items: Dict[str, Any], compact: bool = True, compress_keys: Iterable[str] = ()) -> bool:
+        """
+        Write JSON values via PUT /bulk (batched by BULK_PUT_MAX_KEYS / BULK_PUT_MAX_BYTES).
+
+        Keys in `compress_keys` (and values above KV_GZIP_MIN_BYTES when set)
+        are stored gzipped. Keys the API reports as failed are retried with
+        single PUTs. Returns True when every key was written.
+        """
+        separators = (',', ':') if compact else None
+        compress_keys = set(compress_keys)
+        entries = []
+        for key, obj in items.items():
+            data, compressed = self._encode(json.dumps(obj, separators=separators).encode('utf-8'),
+                                            True if key in compress_keys else None)
+            if compressed:
+                entries.append({"key": key, "value": base64.b64encode(data).decode('ascii'), "base64": True})
+            else:
+                entries.append({"key": key, "value": data.decode('utf-8')})
+
+        ok = True
+        batch: List[Dict] = []
+        size = 0
+        for entry in entries + [None]:
+            entry_size = len(entry["key"]) + len(entry["value"]) + 64 if entry else 0
+            if batch and (entry is None or len(batch) >= BULK_PUT_MAX_KEYS or size + entry_size > BULK_PUT_MAX_BYTES):
+                ok = self._put_batch(batch, items, separators, compress_keys) and ok
+                batch, size = [], 0
+            if entry:
+                batch.append(entry)
+                size += entry_size
+        return ok
+
+    def _put_batch(self, batch: List[Dict], items: Dict[str, Any], separators, compress_keys) -> bool:
+        body = json.dumps(batch, separators=(',', ':')).encode('utf-8')
+        resp = self.request('PUT', '/bulk', f"bulk[{len(batch)}]", data=body,
+                            headers={"Content-Type": "application/json"})
+        failed = [e["key"] for e in batch]
+        if resp is not None and resp.status_code == 200:
+            try:
+                result = resp.json().get('result') or {}
+                failed = list(result.get('unsuccessful_keys') or [])
+            except ValueError:
+                pass
+        if failed:
+            print(f"⚠️ KV bulk write: {len(failed)}/{len(batch)} keys failed, retrying singly", file=sys.stderr)
+        ok = True
+        for key in failed:
+            ok = self.put_json(key, items[key], compact=separators is not None,
+                               compress=True if key in compress_keys else None) and ok
+        return ok
+
+    def delete_many(self, keys: Iterable[str]) -> bool:
+        """Delete keys via POST /bulk/delete (missing keys count as deleted)."""
+        keys = list(dict.fromkeys(keys))
+        ok = True
+        for i in range(0, len(keys), BULK_PUT_MAX_KEYS):
+            batch = keys[i:i + BULK_PUT_MAX_KEYS]
+            resp = self.request('POST', '/bulk/delete', f"bulk/delete[{len(batch)}]",
+                                data=json.dumps(batch).encode('utf-8'), headers={"Content-Type": "application/json"})
+            if resp is None or resp.status_code != 200:
+                ok = all([self.delete(key) for key in batch]) and ok
+        return ok
+
+    def summary(self) -> Dict:
+        """Totals over every call made by this client."""
+        with self.stats_lock:
+            return {k: round(v, 1) if isinstance(v, float) else v for k, v in self.stats.items()}
+
+
+def client(account: str, token: str, namespace: str) -> KVClient:
+    """Shared client for the given credentials (one per namespace per process)."""
+    cfg = (account, token, namespace)
+    with _session_lock:
+        if cfg not in _clients:
+            _clients[cfg] = KVClient(*cfg)
+        return _clients[cfg]
+
+
+def env_config() -> Optional[Tuple[str, str, str]]:
+    acc = os.getenv('CF_ACCOUNT_ID')
+    tok = os.getenv('CF_API_TOKEN')
+    ns = os.getenv('CF_KV_NAMESPACE_ID') or os.getenv('CF_METRICS_NAMESPACE_ID')
+    if not all([acc, tok, ns]):
+        return None
+    return acc, tok, ns
+
+
+def get_client() -> Optional[KVClient]:
+    """Shared client from the CF_* environment; None when not configured."""
+    cfg = env_config()
+    return client(*cfg) if cfg else None
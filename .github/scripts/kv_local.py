@@ -0,0 +1,444 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for Cloudflare KV and R2, for offline pipeline runs and benchmarks.
+
+A small HTTP server (stdlib only) backed by one SQLite file that speaks the
+subset of the Cloudflare APIs the scripts use:
+
+  KV (REST, under /client/v4/accounts/{account}/storage/kv/namespaces/{ns})
+    GET|PUT|DELETE  /values/{key}
+    GET             /keys?prefix=&limit=&cursor=
+    POST            /bulk/get      {"keys": [...], "type": "text"|"json"}
+    PUT             /bulk          [{"key", "value", "base64"?}, ...]
+    POST            /bulk/delete   ["key", ...]
+
+  R2 (REST, under /client/v4/accounts/{account}/r2/buckets/{bucket})
+    GET|PUT|DELETE  /objects/{key}
+
+  R2 (S3 path style, for boto3 with endpoint_url pointing here; signatures are not checked)
+    GET|PUT|HEAD|DELETE  /{bucket}/{key}
+    GET                  /{bucket}?list-type=2&prefix=&continuation-token=
+
+  Worker passthrough
+    GET  /api/{name}   the KV value `name` of KV_LOCAL_NAMESPACE (what the
+                       Pages endpoints for top_validators/top_wallets/... return)
+
+Scripts are pointed at it with environment variables only:
+
+    CF_API_BASE=http://127.0.0.1:8787/client/v4     (kv_client.py, R2 REST uploads)
+    R2_ENDPOINT=http://127.0.0.1:8787               (boto3)
+
+`--latency-ms` adds a fixed delay per request so round-trip counts show up
+in timings the way they do against the real API; `/_stats` returns request
+counts and bytes per route.
+
+Usage:
+  python .github/scripts/kv_local.py serve [--port 8787] [--db .kv_local.sqlite] [--latency-ms 0]
+  python .github/scripts/kv_local.py seed DIR [--db ...]    # DIR/<key>.json (or any file) -> KV value <key>
+  python .github/scripts/kv_local.py dump DIR [--db ...]    # every KV value -> DIR/<key>
+  python .github/scripts/kv_local.py replay [--seed DIR] [--latency-ms 50] [script ...]
+      # seed, start the server, run the scripts in order against it, print timings
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import base64
+import hashlib
+import sqlite3
+import argparse
+import threading
+import subprocess
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+from xml.sax.saxutils import escape
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DB = '.kv_local.sqlite'
+DEFAULT_PORT = 8787
+LOCAL_ACCOUNT = 'local'
+LOCAL_NAMESPACE = os.getenv('KV_LOCAL_NAMESPACE', 'local')
+LIST_LIMIT = 1000
+
+# Default offline replay: aggregate -> decentralization -> history publish -> chart variants
+REPLAY_PIPELINE = [
+    'compute_taostats_aggregates.py',
+    'fetch_decentralization.py',
+    'publish_top_history.py',
+    'downsample_series.py',
+]
+
+_KV_RE = re.compile(r'^/client/v4/accounts/[^/]+/storage/kv/namespaces/([^/]+)(/.*)?$')
+_R2_RE = re.compile(r'^/client/v4/accounts/[^/]+/r2/buckets/([^/]+)/objects/(.+)$')
+
+
+class Store:
+    """KV values and R2 objects in one SQLite file (one lock; SQLite does the rest)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('CREATE TABLE IF NOT EXISTS kv (ns TEXT, key TEXT, value BLOB, updated REAL, '
+                        'PRIMARY KEY (ns, key))')
+        self.db.execute('CREATE TABLE IF NOT EXISTS r2 (bucket TEXT, key TEXT, value BLOB, content_type TEXT, '
+                        'etag TEXT, updated REAL, PRIMARY KEY (bucket, key))')
+        self.db.commit()
+
+    # KV
+    def kv_get(self, ns: str, key: str) -> Optional[bytes]:
+        with self.lock:
+            row = self.db.execute('SELECT value FROM kv WHERE ns=? AND key=?', (ns, key)).fetchone()
+        return row[0] if row else None
+
+    def kv_put(self, ns: str, items: Dict[str, bytes]):
+        now = time.time()
+        with self.lock:
+            self.db.executemany('INSERT OR REPLACE INTO kv VALUES (?, ?, ?, ?)',
+                                [(ns, k, v, now) for k, v in items.items()])
+            self.db.commit()
+
+    def kv_delete(self, ns: str, keys: List[str]):
+        with self.lock:
+            self.db.executemany('DELETE FROM kv WHERE ns=? AND key=?', [(ns, k) for k in keys])
+            self.db.commit()
+
+    def kv_list(self, ns: str, prefix: str = '', after: str = '', limit: int = LIST_LIMIT) -> List[str]:
+        with self.lock:
+            rows = self.db.execute('SELECT key FROM kv WHERE ns=? AND substr(key, 1, ?)=? AND key > ? '
+                                   'ORDER BY key LIMIT ?', (ns, len(prefix), prefix, after, limit)).fetchall()
+        return [r[0] for r in rows]
+
+    def kv_items(self, ns: str):
+        with self.lock:
+            return self.db.execute('SELECT key, value FROM kv WHERE ns=? ORDER BY key', (ns,)).fetchall()
+
+    # R2
+    def r2_get(self, bucket: str, key: str):
+        with self.lock:
+            return self.db.execute('SELECT value, content_type, etag, updated FROM r2 WHERE bucket=? AND key=?',
+                                   (bucket, key)).fetchone()
+
+    def r2_put(self, bucket: str, key: str, value: bytes, content_type: str) -> str:
+        etag = hashlib.md5(value).hexdigest()
+        with self.lock:
+            self.db.execute('INSERT OR REPLACE INTO r2 VALUES (?, ?, ?, ?, ?, ?)',
+                            (bucket, key, value, content_type, etag, time.time()))
+            self.db.commit()
+        return etag
+
+    def r2_delete(self, bucket: str, key: str):
+        with self.lock:
+            self.db.execute('DELETE FROM r2 WHERE bucket=? AND key=?', (bucket, key))
+            self.db.commit()
+
+    def r2_list(self, bucket: str, prefix: str = '', after: str = '', limit: int = LIST_LIMIT):
+        with self.lock:
+            return self.db.execute('SELECT key, length(value), etag, updated FROM r2 WHERE bucket=? '
+                                   'AND substr(key, 1, ?)=? AND key > ? ORDER BY key LIMIT ?',
+                                   (bucket, len(prefix), prefix, after, limit)).fetchall()
+
+
+def _envelope(result=None, success=True, errors=None) -> bytes:
+    return json.dumps({"success": success, "errors": errors or [], "messages": [], "result": result}).encode('utf-8')
+
+
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.000Z')
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    store: Store = None
+    latency = 0.0
+    stats: Dict[str, Dict[str, int]] = {}
+    stats_lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    # === plumbing ===
+
+    def _body(self) -> bytes:
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            data = b''
+            while True:
+                size = int(self.rfile.readline().strip() or b'0', 16)
+                if size == 0:
+                    self.rfile.readline()
+                    return data
+                data += self.rfile.read(size)
+                self.rfile.readline()
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def _send(self, status: int, body: bytes = b'', content_type: str = 'application/json', headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def _record(self, route: str, sent: int, received: int):
+        with self.stats_lock:
+            s = self.stats.setdefault(f"{self.command} {route}", {"requests": 0, "bytes_in": 0, "bytes_out": 0})
+            s["requests"] += 1
+            s["bytes_in"] += received
+            s["bytes_out"] += sent
+
+    def _dispatch(self):
+        if self.latency:
+            time.sleep(self.latency)
+        url = urlsplit(self.path)
+        path = unquote(url.path)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        body = self._body() if self.command in ('PUT', 'POST') else b''
+        try:
+            route, status, out, ctype, headers = self._route(path, query, body)
+        except Exception as e:  # keep serving; report like the API would
+            route, status, out, ctype, headers = 'error', 500, _envelope(None, False, [{"message": str(e)}]), \
+                'application/json', None
+        self._record(route, len(out), len(body))
+        self._send(status, out, ctype, headers)
+
+    do_GET = do_PUT = do_POST = do_DELETE = do_HEAD = _dispatch
+
+    # === routes ===
+
+    def _route(self, path: str, query: Dict[str, str], body: bytes):
+        if path == '/_stats':
+            with self.stats_lock:
+                return '_stats', 200, json.dumps(self.stats).encode('utf-8'), 'application/json', None
+        m = _KV_RE.match(path)
+        if m:
+            return self._kv(m.group(1), m.group(2) or '', query, body)
+        m = _R2_RE.match(path)
+        if m:
+            return self._r2_rest(m.group(1), m.group(2), body)
+        if path.startswith('/api/'):
+            value = self.store.kv_get(LOCAL_NAMESPACE, path[len('/api/'):].strip('/'))
+            if value is None:
+                return 'api', 404, json.dumps({"error": "not found"}).encode('utf-8'), 'application/json', None
+            return 'api', 200, value, 'application/json', None
+        parts = path.lstrip('/').split('/', 1)
+        if parts[0]:
+            return self._s3(parts[0], parts[1] if len(parts) > 1 else '', query, body)
+        return 'unknown', 404, _envelope(None, False, [{"message": f"no route for {path}"}]), 'application/json', None
+
+    def _kv(self, ns: str, rest: str, query: Dict[str, str], body: bytes):
+        store = self.store
+        if rest.startswith('/values/'):
+            key = rest[len('/values/'):]
+            if self.command == 'GET':
+                value = store.kv_get(ns, key)
+                if value is None:
+                    return 'kv/values', 404, _envelope(None, False, [{"code": 10009, "message": "get: key not found"}]), \
+                        'application/json', None
+                return 'kv/values', 200, value, 'application/octet-stream', None
+            if self.command == 'PUT':
+                store.kv_put(ns, {key: body})
+                return 'kv/values', 200, _envelope({}), 'application/json', None
+            if self.command == 'DELETE':
+                store.kv_delete(ns, [key])
+                return 'kv/values', 200, _envelope({}), 'application/json', None
+        if rest == '/keys' and self.command == 'GET':
+            limit = min(int(query.get('limit') or LIST_LIMIT), LIST_LIMIT)
+            after = base64.urlsafe_b64decode(query['cursor']).decode() if query.get('cursor') else ''
+            keys = store.kv_list(ns, query.get('prefix', ''), after, limit)
+            cursor = base64.urlsafe_b64encode(keys[-1].encode()).decode() if len(keys) == limit else ''
+            out = json.loads(_envelope([{"name": k} for k in keys]))
+            out["result_info"] = {"count": len(keys), "cursor": cursor}
+            return 'kv/keys', 200, json.dumps(out).encode('utf-8'), 'application/json', None
+        if rest == '/bulk/get' and self.command == 'POST':
+            req = json.loads(body or b'{}')
+            values = {}
+            for key in req.get('keys', []):
+                raw = store.kv_get(ns, key)
+                if raw is None:
+                    values[key] = None
+                elif req.get('type') == 'json':
+                    values[key] = json.loads(raw)
+                else:
+                    values[key] = raw.decode('utf-8', errors='replace')
+            return 'kv/bulk/get', 200, _envelope({"values": values}), 'application/json', None
+        if rest == '/bulk' and self.command == 'PUT':
+            entries = json.loads(body or b'[]')
+            store.kv_put(ns, {e['key']: base64.b64decode(e['value']) if e.get('base64') else e['value'].encode('utf-8')
+                              for e in entries})
+            return 'kv/bulk', 200, _envelope({"successful_key_count": len(entries), "unsuccessful_keys": []}), \
+                'application/json', None
+        if rest == '/bulk/delete' and self.command == 'POST':
+            keys = json.loads(body or b'[]')
+            store.kv_delete(ns, keys)
+            return 'kv/bulk/delete', 200, _envelope({"successful_key_count": len(keys), "unsuccessful_keys": []}), \
+                'application/json', None
+        return 'kv', 404, _envelope(None, False, [{"message": f"unsupported KV route {self.command} {rest}"}]), \
+            'application/json', None
+
+    def _r2_rest(self, bucket: str, key: str, body: bytes):
+        if self.command == 'PUT':
+            etag = self.store.r2_put(bucket, key, body, self.headers.get('Content-Type') or 'application/octet-stream')
+            return 'r2/objects', 200, _envelope({"key": key, "etag": etag, "size": len(body)}), 'application/json', None
+        if self.command == 'DELETE':
+            self.store.r2_delete(bucket, key)
+            return 'r2/objects', 200, _envelope({}), 'application/json', None
+        row = self.store.r2_get(bucket, key)
+        if row is None:
+            return 'r2/objects', 404, _envelope(None, False, [{"code": 10007, "message": "object not found"}]), \
+                'application/json', None
+        return 'r2/objects', 200, row[0], row[1], {"ETag": f'"{row[2]}"'}
+
+    def _s3(self, bucket: str, key: str, query: Dict[str, str], body: bytes):
+        if not key:
+            if self.command in ('PUT', 'HEAD'):
+                return 's3/bucket', 200, b'', 'application/xml', None
+            prefix = query.get('prefix', '')
+            after = query.get('continuation-token') or query.get('start-after') or ''
+            limit = min(int(query.get('max-keys') or LIST_LIMIT), LIST_LIMIT)
+            rows = self.store.r2_list(bucket, prefix, after, limit)
+            truncated = len(rows) == limit
+            contents = ''.join(
+                f"<Contents><Key>{escape(k)}</Key><LastModified>{_iso(ts)}</LastModified>"
+                f"<ETag>&quot;{etag}&quot;</ETag><Size>{size}</Size><StorageClass>STANDARD</StorageClass></Contents>"
+                for k, size, etag, ts in rows)
+            token = f"<NextContinuationToken>{escape(rows[-1][0])}</NextContinuationToken>" if truncated else ''
+            xml = (f'<?xml version="1.0" encoding="UTF-8"?><ListBucketResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">'
+                   f"<Name>{escape(bucket)}</Name><Prefix>{escape(prefix)}</Prefix><KeyCount>{len(rows)}</KeyCount>"
+                   f"<MaxKeys>{limit}</MaxKeys><IsTruncated>{'true' if truncated else 'false'}</IsTruncated>"
+                   f"{contents}{token}</ListBucketResult>")
+            return 's3/list', 200, xml.encode('utf-8'), 'application/xml', None
+        if self.command == 'PUT':
+            etag = self.store.r2_put(bucket, key, body, self.headers.get('Content-Type') or 'application/octet-stream')
+            return 's3/object', 200, b'', 'application/xml', {"ETag": f'"{etag}"'}
+        if self.command == 'DELETE':
+            self.store.r2_delete(bucket, key)
+            return 's3/object', 204, b'', 'application/xml', None
+        row = self.store.r2_get(bucket, key)
+        if row is None:
+            xml = f'<?xml version="1.0" encoding="UTF-8"?><Error><Code>NoSuchKey</Code><Key>{escape(key)}</Key></Error>'
+            return 's3/object', 404, xml.encode('utf-8'), 'application/xml', None
+        headers = {"ETag": f'"{row[2]}"', "Last-Modified": time.strftime('%a, %d %b %Y %H:%M:%S GMT', time.gmtime(row[3]))}
+        return 's3/object', 200, row[0], row[1], headers
+
+
+def make_server(db: str, port: int = DEFAULT_PORT, latency_ms: float = 0.0, host: str = '127.0.0.1'):
+    """Server bound to (host, port); port 0 picks a free one. Call serve_forever() to run it."""
+    handler = type('LocalHandler', (Handler,), {
+        'store': Store(db), 'latency': latency_ms / 1000.0, 'stats': {}, 'stats_lock': threading.Lock(),
+    })
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def local_env(port: int, namespace: str = LOCAL_NAMESPACE) -> Dict[str, str]:
+    """Environment that points every script at the stand-in on `port`."""
+    base = f"http://127.0.0.1:{port}"
+    return {
+        'CF_API_BASE': f"{base}/client/v4",
+        'CF_ACCOUNT_ID': LOCAL_ACCOUNT,
+        'CF_API_TOKEN': 'local',
+        'CF_KV_NAMESPACE_ID': namespace,
+        'CF_METRICS_NAMESPACE_ID': namespace,
+        'R2_ENDPOINT': base,
+        'R2_BUCKET': 'local',
+        'R2_ACCESS_KEY_ID': 'local',
+        'R2_SECRET_ACCESS_KEY': 'local',
+    }
+
+
+def seed(db: str, directory: str, namespace: str = LOCAL_NAMESPACE) -> int:
+    """Load DIR/<key>[.json] files as KV values (the extension is dropped for .json files)."""
+    items = {}
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if os.path.isfile(path):
+            key = name[:-5] if name.endswith('.json') else name
+            with open(path, 'rb') as f:
+                items[key] = f.read()
+    Store(db).kv_put(namespace, items)
+    return len(items)
+
+
+def dump(db: str, directory: str, namespace: str = LOCAL_NAMESPACE) -> int:
+    os.makedirs(directory, exist_ok=True)
+    rows = Store(db).kv_items(namespace)
+    for key, value in rows:
+        with open(os.path.join(directory, quote(key, safe='')), 'wb') as f:
+            f.write(value)
+    return len(rows)
+
+
+def replay(db: str, scripts: List[str], latency_ms: float = 0.0) -> List[Dict]:
+    """Run scripts in order against a fresh in-process server; per-script wall time and KV traffic."""
+    server = make_server(db, 0, latency_ms)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    env = {**os.environ, **local_env(server.server_address[1]), 'KV_LOG': os.getenv('KV_LOG', '0')}
+    results = []
+    try:
+        for script in scripts:
+            name, *args = script.split()
+            path = name if os.path.sep in name else os.path.join(SCRIPTS_DIR, name)
+            before = {k: dict(v) for k, v in server.RequestHandlerClass.stats.items()}
+            t0 = time.perf_counter()
+            proc = subprocess.run([sys.executable, path] + args, env=env, capture_output=True, text=True)
+            elapsed = time.perf_counter() - t0
+            after = server.RequestHandlerClass.stats
+            requests_made = sum(v['requests'] - before.get(k, {}).get('requests', 0) for k, v in after.items())
+            bytes_moved = sum(v['bytes_in'] + v['bytes_out'] - before.get(k, {}).get('bytes_in', 0)
+                              - before.get(k, {}).get('bytes_out', 0) for k, v in after.items())
+            results.append({"script": script, "exit": proc.returncode, "seconds": round(elapsed, 3),
+                            "requests": requests_made, "bytes": bytes_moved})
+            if proc.returncode != 0:
+                print(f"⚠️ {script} exited {proc.returncode}:\n{proc.stderr[-2000:]}", file=sys.stderr)
+    finally:
+        server.shutdown()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('command', choices=['serve', 'seed', 'dump', 'replay'])
+    parser.add_argument('args', nargs='*')
+    parser.add_argument('--db', default=os.getenv('KV_LOCAL_DB', DEFAULT_DB))
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--namespace', default=LOCAL_NAMESPACE)
+    parser.add_argument('--seed', dest='seed_dir')
+    opts = parser.parse_intermixed_args()  # options may follow the positional arguments
+
+    if opts.command == 'serve':
+        server = make_server(opts.db, opts.port, opts.latency_ms)
+        port = server.server_address[1]
+        print(f"🗄️ KV/R2 stand-in on http://127.0.0.1:{port} (db {opts.db})", file=sys.stderr)
+        for k, v in local_env(port, opts.namespace).items():
+            print(f"export {k}={v}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    elif opts.command in ('seed', 'dump'):
+        if not opts.args:
+            parser.error(f"{opts.command} needs a directory")
+        fn = seed if opts.command == 'seed' else dump
+        n = fn(opts.db, opts.args[0], opts.namespace)
+        print(f"✅ {opts.command}: {n} keys ({opts.db})", file=sys.stderr)
+    else:
+        if opts.seed_dir:
+            print(f"🌱 Seeded {seed(opts.db, opts.seed_dir, opts.namespace)} keys", file=sys.stderr)
+        results = replay(opts.db, opts.args or REPLAY_PIPELINE, opts.latency_ms)
+        print(f"{'script':40} {'exit':>4} {'seconds':>8} {'requests':>9} {'bytes':>12}")
+        for r in results:
+            print(f"{r['script']:40} {r['exit']:>4} {r['seconds']:>8.3f} {r['requests']:>9} {r['bytes']:>12,}")
+        print(json.dumps(results))
+        sys.exit(1 if any(r['exit'] for r in results) else 0)
+
+
+if __name__ == "__main__":
+    main()
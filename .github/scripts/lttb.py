@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Largest-Triangle-Three-Buckets (LTTB) downsampling.
+
+Keeps the first and last point and, for every bucket in between, the point
+forming the largest triangle with the previously kept point and the mean of
+the next bucket. Charts drawn from the result look like the full series at a
+fraction of the points.
+
+Bucket bounds, next-bucket means and the candidate matrix are computed with
+NumPy up front; the only sequential part (the previously kept point) is a
+loop over buckets, not over points. Several y columns can be ranked at once:
+each column is min-max scaled and the triangle areas are summed, so one
+index set serves every field of a multi-column history row.
+
+Usage:
+  python .github/scripts/lttb.py [N ...]   # speed / agreement benchmark
+"""
+
+import sys
+import json
+import time
+from typing import Dict, Iterable, Sequence
+
+import numpy as np
+
+LTTB_SIZES = (200, 500, 1000)
+TABLE_MAX_WIDTH = 16  # bucket width up to which the (previous pick x candidate) table beats the loop
+
+
+def lttb_indices(x, y, n_out: int) -> np.ndarray:
+    """
+    Indices of the points LTTB keeps (sorted, first and last included).
+
+    x: 1-D array (strictly increasing); y: 1-D array or 2-D (n, k) array.
+    NaNs in y count as 0 area. Returns all indices when n_out >= len(x).
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if y.ndim == 1:
+        y = y[:, None]
+    n = x.size
+    if n_out >= n or n <= 2:
+        return np.arange(n)
+    if n_out < 3:
+        return np.array([0, n - 1])
+
+    # Scale each column to [0, 1] so multi-column areas are comparable
+    lo = np.nanmin(y, axis=0)
+    span = np.nanmax(y, axis=0) - lo
+    y = np.nan_to_num((y - lo) / np.where(span > 0, span, 1.0))
+
+    # Bucket edges over the interior points [1, n-1)
+    edges = np.floor(np.linspace(1, n - 1, n_out - 1)).astype(np.int64)
+    starts, ends = edges[:-1], edges[1:]
+    counts = ends - starts
+    buckets = starts.size
+
+    # Mean of every bucket, plus the last point as the "next bucket" of the final one
+    mean_x = np.add.reduceat(x[:n - 1], starts) / counts
+    mean_y = np.add.reduceat(y[:n - 1], starts, axis=0) / counts[:, None]
+    next_x = np.append(mean_x[1:], x[-1])
+    next_y = np.vstack([mean_y[1:], y[-1:]])
+
+    # Candidate matrices: row b holds the points of bucket b (padded with its last point)
+    width = int(counts.max())
+    cand = np.minimum(starts[:, None] + np.arange(width), (ends - 1)[:, None])
+    cand_x = x[cand]
+    cand_y = y[cand]  # (buckets, width, k)
+
+    # Twice the triangle area (a, i, c) per column is |(ax-cx)*yi + (cy-ay)*xi + (cx*ay - ax*cy)|
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    cx = next_x[:, None, None]
+    cy = next_y[:, None, :]
+    if width <= TABLE_MAX_WIDTH:
+        # Narrow buckets: score every (previous pick, candidate) pair at once. The
+        # previous bucket's candidates stand in for `a` (bucket 0 follows point 0),
+        # so the sequential part is just walking the argmax table.
+        prev = np.vstack([np.zeros((1, width), dtype=np.int64), cand[:-1]])
+        ax = x[prev][:, :, None, None]
+        ay = y[prev][:, :, None, :]
+        area = np.abs(cand_y[:, None, :, :] * (ax - cx[:, None]) + cand_x[:, None, :, None] * (cy[:, None] - ay)
+                      + (cx[:, None] * ay - ax * cy[:, None])).sum(axis=3)
+        table = area.argmax(axis=2).tolist()
+        cand_list = cand.tolist()
+        j = 0
+        for b in range(buckets):
+            j = table[b][j]
+            keep[b + 1] = cand_list[b][j]
+        return keep
+
+    # Wide buckets: one step per bucket, each a few array ops over the whole bucket
+    a = 0
+    for b in range(buckets):
+        ax, ay = x[a], y[a]
+        area = np.abs(cand_y[b] * (ax - cx[b, 0, 0]) + cand_x[b][:, None] * (cy[b, 0] - ay)
+                      + (cx[b, 0, 0] * ay - ax * cy[b, 0])).sum(axis=1)
+        a = int(cand[b, int(area.argmax())])
+        keep[b + 1] = a
+    return keep
+
+
+def lttb_reference(points: Sequence, n_out: int) -> list:
+    """Plain-Python LTTB on [[x, y], ...] (used to check the vectorized version)."""
+    n = len(points)
+    if n_out >= n or n <= 2:
+        return list(range(n))
+    edges = [int(v) for v in np.floor(np.linspace(1, n - 1, n_out - 1))]
+    keep = [0]
+    a = 0
+    for b in range(len(edges) - 1):
+        s, e = edges[b], edges[b + 1]
+        if b + 1 < len(edges) - 1:
+            ns, ne = edges[b + 1], edges[b + 2]
+            cx = sum(p[0] for p in points[ns:ne]) / (ne - ns)
+            cy = sum(p[1] for p in points[ns:ne]) / (ne - ns)
+        else:
+            cx, cy = points[-1]
+        ax, ay = points[a]
+        best, best_i = -1.0, s
+        for i in range(s, e):
+            area = abs((ax - cx) * (points[i][1] - ay) - (ax - points[i][0]) * (cy - ay))
+            if area > best:
+                best, best_i = area, i
+        keep.append(best_i)
+        a = best_i
+    keep.append(n - 1)
+    return keep
+
+
+def downsample_rows(rows: list, x, y, sizes: Iterable[int] = LTTB_SIZES) -> Dict[int, list]:
+    """{n: rows kept by LTTB} for each size (rows must be sorted by x)."""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    return {n: [rows[i] for i in lttb_indices(x, y, n)] for n in sizes}
+
+
+def benchmark(count: int = 100_000, n_out: int = 1000) -> Dict:
+    rng = np.random.default_rng(7)
+    x = np.arange(count, dtype=np.float64) * 300.0
+    y = 400 + np.cumsum(rng.normal(0, 1, count))
+    t0 = time.perf_counter()
+    idx = lttb_indices(x, y, n_out)
+    vec_ms = (time.perf_counter() - t0) * 1000
+    out = {"count": count, "n_out": n_out, "vectorized_ms": round(vec_ms, 2)}
+    if count <= 200_000:
+        pts = list(zip(x.tolist(), y.tolist()))
+        t0 = time.perf_counter()
+        ref = lttb_reference(pts, n_out)
+        out["reference_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+        # Min-max scaling changes nothing for a single column up to ties
+        out["same_points"] = bool(np.array_equal(idx, ref))
+    return out
+
+
+if __name__ == "__main__":
+    sizes = [int(a) for a in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    for size in sizes:
+        for n_out in LTTB_SIZES:
+            print(json.dumps(benchmark(size, n_out)))
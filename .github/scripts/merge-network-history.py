@@ -6,9 +6,10 @@ Handles API response parsing and deduplication.
 import json
 import sys
 import os
-import subprocess
 from datetime import datetime
 
+from kv_client import client as kv_client
+
 def main():
     # Config
     cf_account_id = os.getenv('CF_ACCOUNT_ID', '')
@@ -33,19 +34,12 @@ def main():
         sys.exit(1)
     
     # Fetch existing history from KV
-    kv_url = f"https://api.cloudflare.com/client/v4/accounts/{cf_account_id}/storage/kv/namespaces/{cf_kv_namespace_id}/values/network_history"
-    try:
-        result = subprocess.run(
-            ['curl', '-s', '-H', f'Authorization: Bearer {cf_api_token}', kv_url],
-            capture_output=True,
-            text=True,
-            timeout=15
-        )
-        response_text = result.stdout.strip()
-    except Exception as e:
-        print(f"⚠️  Failed to fetch existing history: {e}", file=sys.stderr)
+    status, body = kv_client(cf_account_id, cf_api_token, cf_kv_namespace_id).read('network_history')
+    if status is None or status not in (200, 404):
+        print(f"⚠️  Failed to fetch existing history: {status or 'no response'}", file=sys.stderr)
         existing_history = []
     else:
+        response_text = body.decode('utf-8').strip() if body else ''
         if not response_text:
             print("ℹ️  No existing history in KV (first run)", file=sys.stderr)
             existing_history = []
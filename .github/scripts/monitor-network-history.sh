@@ -28,7 +28,7 @@ echo ""
 
 # 1. Check KV Namespace Accessibility
 echo -e "${BLUE}1. Checking KV Namespace...${NC}"
-KV_URL="https://api.cloudflare.com/client/v4/accounts/${CF_ACCOUNT_ID}/storage/kv/namespaces/${CF_KV_NAMESPACE_ID}"
+KV_URL="${CF_API_BASE:-https://api.cloudflare.com/client/v4}/accounts/${CF_ACCOUNT_ID}/storage/kv/namespaces/${CF_KV_NAMESPACE_ID}"
 KV_STATUS=$(curl -s -o /dev/null -w "%{http_code}" -H "Authorization: Bearer ${CF_API_TOKEN}" "$KV_URL" || echo "000")
 if [ "$KV_STATUS" -eq 200 ]; then
   echo -e "${GREEN}✅ KV Namespace accessible${NC}"
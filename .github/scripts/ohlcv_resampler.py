@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Vectorized OHLCV resampling aligned to UTC buckets.
+
+`resample_ticks` turns [ts_ms, price(, volume)] ticks into candles at any
+interval; `resample_candles` merges finer candles into coarser ones (e.g.
+1h -> 4h, 1d -> 1w). Buckets start at multiples of the interval since the
+Unix epoch, so 1h/4h/1d candles line up with UTC hours and midnights.
+
+Both work on NumPy arrays: one stable sort, bucket boundaries from
+np.diff, then ufunc.reduceat for high/low/volume and boundary picks for
+open/close, so a million ticks take milliseconds.
+
+Candles are returned as rows [t_ms, open, high, low, close, volume]; volume
+is None when the input carries none.
+
+Usage:
+  python .github/scripts/ohlcv_resampler.py [N ...]   # resampling benchmark
+"""
+
+import re
+import sys
+import json
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+_UNITS_MS = {"m": 60_000, "h": 3_600_000, "d": 86_400_000, "w": 604_800_000}
+
+
+def interval_ms(interval) -> int:
+    """'5m' / '1h' / '4h' / '1d' / '1w' (or a number of ms) -> milliseconds."""
+    if isinstance(interval, (int, np.integer)):
+        return int(interval)
+    m = re.fullmatch(r"(\d+)([mhdw])", str(interval).strip())
+    if not m:
+        raise ValueError(f"Unsupported interval {interval!r}")
+    return int(m.group(1)) * _UNITS_MS[m.group(2)]
+
+
+def _buckets(t: np.ndarray, step: int):
+    """Sort order, bucket starts and the first index of every bucket."""
+    order = np.argsort(t, kind="stable")
+    bucket = (t[order] // step) * step
+    first = np.flatnonzero(np.concatenate(([True], bucket[1:] != bucket[:-1])))
+    return order, bucket, first
+
+
+def _rows(t, o, h, l, c, v) -> List[List]:
+    cols = [t.astype(np.int64).tolist(), o.tolist(), h.tolist(), l.tolist(), c.tolist()]
+    cols.append(v.tolist() if v is not None else [None] * len(cols[0]))
+    return [list(r) for r in zip(*cols)]
+
+
+def resample_ticks(ts_ms, price, interval, volume=None) -> List[List]:
+    """Ticks -> UTC-aligned candles [t_ms, open, high, low, close, volume]."""
+    t = np.asarray(ts_ms, dtype=np.int64)
+    p = np.asarray(price, dtype=np.float64)
+    if t.size == 0:
+        return []
+    step = interval_ms(interval)
+    order, bucket, first = _buckets(t, step)
+    p = p[order]
+    last = np.append(first[1:] - 1, p.size - 1)
+    v = None
+    if volume is not None:
+        v = np.add.reduceat(np.nan_to_num(np.asarray(volume, dtype=np.float64)[order]), first)
+    return _rows(bucket[first], p[first], np.maximum.reduceat(p, first),
+                 np.minimum.reduceat(p, first), p[last], v)
+
+
+def resample_candles(candles: List[List], interval) -> List[List]:
+    """Finer candles [t, o, h, l, c(, v)] -> coarser UTC-aligned candles."""
+    if not candles:
+        return []
+    arr = np.array([list(c[:5]) + [c[5] if len(c) > 5 and c[5] is not None else np.nan] for c in candles],
+                   dtype=np.float64)
+    step = interval_ms(interval)
+    order, bucket, first = _buckets(arr[:, 0].astype(np.int64), step)
+    arr = arr[order]
+    last = np.append(first[1:] - 1, len(arr) - 1)
+    vol = arr[:, 5]
+    v = None if np.isnan(vol).all() else np.add.reduceat(np.nan_to_num(vol), first)
+    return _rows(bucket[first], arr[first, 1], np.maximum.reduceat(arr[:, 2], first),
+                 np.minimum.reduceat(arr[:, 3], first), arr[last, 4], v)
+
+
+def benchmark(count: int = 1_000_000, intervals=("1h", "4h", "1d")) -> Dict:
+    rng = np.random.default_rng(11)
+    t = np.sort(rng.integers(0, 365 * 86_400_000, count))
+    p = 400 + np.cumsum(rng.normal(0, 0.05, count))
+    v = rng.random(count) * 10
+    out: Dict[str, Optional[float]] = {"ticks": count}
+    for interval in intervals:
+        t0 = time.perf_counter()
+        candles = resample_ticks(t, p, interval, v)
+        out[f"{interval}_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+        out[f"{interval}_candles"] = len(candles)
+    hourly = resample_ticks(t, p, "1h", v)
+    t0 = time.perf_counter()
+    resample_candles(hourly, "1d")
+    out["1h->1d_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+    return out
+
+
+if __name__ == "__main__":
+    for n in [int(a) for a in sys.argv[1:]] or [100_000, 1_000_000]:
+        print(json.dumps(benchmark(n)))
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Dependency graph of the derived KV datasets, with incremental recomputation.
+
+The derived stages only read datasets other jobs publish:
+
+  taostats_history ──────────────────────────► taostats_aggregates
+  distribution, top_validators, top_subnets ─► decentralization
+  top_validators, top_subnets, top_wallets ──► top_history
+
+  * STAGES declares each stage's input datasets, PRODUCERS the collector
+    tasks that publish them, TRIGGERS the inputs whose update starts the
+    stage right away (the others are picked up on its own schedule)
+  * a stage's input hash is a sha256 per dataset over the KV value, with
+    volatile top-level timestamps (`_timestamp`, `last_updated`,
+    `generated_at`) left out so a re-fetch of identical data is not a change
+  * the hashes of the last successful run are kept in KV (`pipeline_state`);
+    a stage whose inputs hash the same is skipped
+
+collector.py runs the triggered stages as soon as a producer task succeeds
+(independent stages in parallel on its worker pool) and puts its scheduled
+stage runs through the same check. The stage workflows call `run STAGE`,
+so they skip unchanged inputs too.
+
+Cadence limits, so triggering does not change what a stage produces:
+  * top_history is never triggered: each run appends one snapshot, and
+    MAX_HISTORY_ENTRIES (672) is 14 days at its fixed 30 minute slot
+  * decentralization is only triggered by a new distribution (weekly) and
+    otherwise runs on its daily schedule, not after every hourly
+    validators / subnets fetch
+
+Usage:
+  python .github/scripts/pipeline.py graph
+  python .github/scripts/pipeline.py status                      # current vs last-run input hashes
+  python .github/scripts/pipeline.py run [STAGE ...] [--force]   # run stale stages in parallel
+"""
+
+import sys
+import json
+import hashlib
+import argparse
+import threading
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+from kv_client import get_client
+from taostats_history_store import chunk_key
+
+PIPELINE_STATE_KEY = 'pipeline_state'
+VOLATILE_FIELDS = ('_timestamp', 'last_updated', 'generated_at')
+
+# dataset -> KV keys holding it. The distribution_balances artifact is bound to
+# `distribution` by its sha256, so hashing `distribution` covers both.
+DATASETS: Dict[str, Callable[[], List[str]]] = {
+    'taostats_history': lambda: [chunk_key(datetime.now(timezone.utc).date())],
+    'distribution': lambda: ['distribution'],
+    'top_validators': lambda: ['top_validators'],
+    'top_subnets': lambda: ['top_subnets'],
+    'top_wallets': lambda: ['top_wallets'],
+}
+
+# stage (collector task) -> input datasets
+STAGES: Dict[str, List[str]] = {
+    'taostats_aggregates': ['taostats_history'],
+    'decentralization': ['distribution', 'top_validators', 'top_subnets'],
+    'top_history': ['top_validators', 'top_subnets', 'top_wallets'],
+}
+
+# producer (collector task) -> datasets it publishes
+PRODUCERS: Dict[str, List[str]] = {
+    'taostats': ['taostats_history'],
+    'distribution': ['distribution'],
+    'top_validators': ['top_validators'],
+    'top_subnets': ['top_subnets'],
+    'top_wallets': ['top_wallets'],
+}
+
+
+# stage -> input datasets whose update runs the stage immediately
+TRIGGERS: Dict[str, List[str]] = {
+    'taostats_aggregates': ['taostats_history'],
+    'decentralization': ['distribution'],
+    'top_history': [],
+}
+
+
+def dependents(task: str) -> List[str]:
+    """Stages triggered by anything `task` publishes."""
+    produced = set(PRODUCERS.get(task, []))
+    return [stage for stage, inputs in TRIGGERS.items() if produced & set(inputs)]
+
+
+def content_hash(value) -> Optional[str]:
+    """sha256 of a KV JSON value without its volatile top-level timestamps (None when missing)."""
+    if value is None:
+        return None
+    if isinstance(value, dict):
+        value = {k: v for k, v in value.items() if k not in VOLATILE_FIELDS}
+    blob = json.dumps(value, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(blob.encode('utf-8')).hexdigest()
+
+
+def input_hashes(stage: str, kv=None) -> Dict[str, Optional[str]]:
+    """Current hash per input dataset of `stage` (one bulk KV read)."""
+    kv = kv or get_client()
+    if kv is None:
+        raise RuntimeError("CF_ACCOUNT_ID, CF_API_TOKEN and CF_KV_NAMESPACE_ID are required")
+    keys = {ds: DATASETS[ds]() for ds in STAGES[stage]}
+    values = kv.get_many([k for ks in keys.values() for k in ks])
+    return {ds: content_hash(values.get(ks[0]) if len(ks) == 1 else [values.get(k) for k in ks])
+            for ds, ks in keys.items()}
+
+
+class PipelineState:
+    """Input hashes of each stage's last successful run, kept in KV."""
+
+    def __init__(self, kv=None):
+        self.kv = kv or get_client()
+        self.lock = threading.Lock()
+        self.stages: Optional[Dict[str, Dict]] = None
+        self.recorded: Dict[str, Dict] = {}  # this process's runs (KV reads can lag behind writes)
+
+    def _load(self) -> Dict[str, Dict]:
+        if self.stages is None:
+            state = self.kv.get_json(PIPELINE_STATE_KEY) if self.kv else None
+            self.stages = (state.get('stages') or {}) if isinstance(state, dict) else {}
+        return self.stages
+
+    def last(self, stage: str) -> Optional[Dict]:
+        with self.lock:
+            return self._load().get(stage)
+
+    def changed(self, stage: str, hashes: Dict[str, Optional[str]]) -> List[str]:
+        """Input datasets whose hash differs from the last successful run (all of them if it never ran)."""
+        last = (self.last(stage) or {}).get('inputs')
+        if last is None:
+            return list(hashes)
+        return [ds for ds, h in hashes.items() if last.get(ds) != h]
+
+    def record(self, stage: str, hashes: Dict[str, Optional[str]]):
+        """Store the hashes a successful run consumed (merged into a fresh read, so other writers' stages survive)."""
+        with self.lock:
+            self.recorded[stage] = {'inputs': hashes, 'ran_at': datetime.now(timezone.utc).isoformat()}
+            self.stages = None
+            stages = {**self._load(), **self.recorded}
+            self.stages = stages
+            state = {'stages': stages, '_timestamp': datetime.now(timezone.utc).isoformat()}
+            if not self.kv or not self.kv.put_json(PIPELINE_STATE_KEY, state, compact=False):
+                print(f"⚠️ Failed to save pipeline state for {stage}; it will rerun next time", file=sys.stderr)
+
+
+def print_graph():
+    for stage, inputs in STAGES.items():
+        sources = [f"{ds}{'*' if ds in TRIGGERS[stage] else ''} ({', '.join(t for t, out in PRODUCERS.items() if ds in out)})"
+                   for ds in inputs]
+        print(f"{stage} <- {', '.join(sources)}")
+    print("(* triggers the stage immediately)")
+
+
+def print_status(state: PipelineState):
+    for stage in STAGES:
+        hashes = input_hashes(stage, state.kv)
+        changed = state.changed(stage, hashes)
+        ran_at = (state.last(stage) or {}).get('ran_at', 'never')
+        label = f"stale ({', '.join(changed)})" if changed else 'up to date'
+        print(f"{stage:22} {label:60} last run: {ran_at}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('command', choices=['graph', 'status', 'run'])
+    parser.add_argument('stages', nargs='*')
+    parser.add_argument('--force', action='store_true', help='run even when the inputs are unchanged')
+    opts = parser.parse_args()
+
+    unknown = [s for s in opts.stages if s not in STAGES]
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(unknown)} (known: {', '.join(STAGES)})")
+    if opts.command == 'graph':
+        print_graph()
+        return
+    if get_client() is None:
+        print("❌ CF_ACCOUNT_ID, CF_API_TOKEN and CF_KV_NAMESPACE_ID are required", file=sys.stderr)
+        sys.exit(1)
+    if opts.command == 'status':
+        print_status(PipelineState())
+        return
+
+    # Stage scripts run in-process on the collector's worker pool
+    import collector
+    collector._prepare_process()
+    stages = [t for t in collector.TASKS if t.name in (opts.stages or STAGES)]
+    ok = collector.Collector(stages, status_file=None).run_stages(force=opts.force)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
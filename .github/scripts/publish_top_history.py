@@ -2,9 +2,11 @@
 """
 Publish Top History - Collects Top 10 snapshots and appends to history KV.
 
-This script fetches the current Top 10 Validators, Wallets, and Subnets from
-the deployed Cloudflare Pages API and appends each snapshot to their respective
-*_history KV collections.
+This script reads the current Top 10 Validators, Wallets, and Subnets from KV
+(`top_validators`, `top_wallets`, `top_subnets`, the values the Pages API
+serves, without its edge cache) in one bulk read and appends each snapshot to
+their respective *_history KV collections. Reading KV directly means the
+snapshot is the same data pipeline.py hashes to decide whether to run.
 
 KV Keys:
   - top_validators_history
@@ -25,8 +27,7 @@ Environment Variables:
   CF_ACCOUNT_ID           Cloudflare Account ID
   CF_API_TOKEN            Cloudflare API Token
   CF_KV_NAMESPACE_ID      KV Namespace ID (or CF_METRICS_NAMESPACE_ID)
-  API_BASE_URL            Base URL for API (default: https://bittensor-labs.pages.dev)
-  MAX_HISTORY_ENTRIES     Max entries to keep per collection (default: 672 = 4 weeks @ 6h)
+  MAX_HISTORY_ENTRIES     Max entries to keep per collection (default: 672 = 14 days @ 30 min)
 
 Usage:
   python .github/scripts/publish_top_history.py
@@ -35,14 +36,13 @@ Usage:
 import os
 import sys
 import json
-import urllib.request
-import urllib.error
 from datetime import datetime, timezone
 from typing import Dict, List, Optional, Any
 
+from kv_client import client as kv_client
+
 # Configuration
-API_BASE_URL = os.getenv('API_BASE_URL', 'https://bittensor-labs.pages.dev')
-MAX_HISTORY_ENTRIES = int(os.getenv('MAX_HISTORY_ENTRIES', '672'))  # 4 weeks @ 6h intervals
+MAX_HISTORY_ENTRIES = int(os.getenv('MAX_HISTORY_ENTRIES', '672'))  # 14 days @ 30 min intervals
 
 # Cloudflare credentials
 CF_ACCOUNT_ID = os.getenv('CF_ACCOUNT_ID')
@@ -50,77 +50,11 @@ CF_API_TOKEN = os.getenv('CF_API_TOKEN')
 CF_KV_NAMESPACE_ID = os.getenv('CF_KV_NAMESPACE_ID') or os.getenv('CF_METRICS_NAMESPACE_ID')
 
 
-def get_from_kv(key: str) -> Optional[Any]:
-    """Fetch a value from Cloudflare KV."""
-    if not all([CF_ACCOUNT_ID, CF_API_TOKEN, CF_KV_NAMESPACE_ID]):
-        return None
-    
-    url = f'https://api.cloudflare.com/client/v4/accounts/{CF_ACCOUNT_ID}/storage/kv/namespaces/{CF_KV_NAMESPACE_ID}/values/{key}'
-    req = urllib.request.Request(url, method='GET', headers={
-        'Authorization': f'Bearer {CF_API_TOKEN}',
-        'Accept': 'application/json'
-    })
-    
-    try:
-        with urllib.request.urlopen(req, timeout=15) as resp:
-            if resp.status == 200:
-                return json.loads(resp.read())
-    except urllib.error.HTTPError as e:
-        if e.code == 404:
-            return None  # Key doesn't exist yet
-        print(f"⚠️ KV GET failed for {key}: HTTP {e.code}", file=sys.stderr)
-    except Exception as e:
-        print(f"⚠️ KV GET failed for {key}: {e}", file=sys.stderr)
-    
-    return None
-
-
-def put_to_kv(key: str, data: Any) -> bool:
-    """Store a value in Cloudflare KV."""
-    if not all([CF_ACCOUNT_ID, CF_API_TOKEN, CF_KV_NAMESPACE_ID]):
-        print("⚠️ Missing CF credentials for KV PUT", file=sys.stderr)
-        return False
-    
-    url = f'https://api.cloudflare.com/client/v4/accounts/{CF_ACCOUNT_ID}/storage/kv/namespaces/{CF_KV_NAMESPACE_ID}/values/{key}'
-    payload = json.dumps(data).encode('utf-8')
-    
-    req = urllib.request.Request(url, data=payload, method='PUT', headers={
-        'Authorization': f'Bearer {CF_API_TOKEN}',
-        'Content-Type': 'application/json'
-    })
-    
-    try:
-        with urllib.request.urlopen(req, timeout=20) as resp:
-            if resp.status in (200, 201):
-                print(f"✅ KV PUT OK ({key})")
-                return True
-            else:
-                print(f"⚠️ KV PUT returned status {resp.status}", file=sys.stderr)
-                return False
-    except urllib.error.HTTPError as e:
-        print(f"⚠️ KV PUT failed for {key}: HTTP {e.code} - {e.read()}", file=sys.stderr)
-    except Exception as e:
-        print(f"⚠️ KV PUT failed for {key}: {e}", file=sys.stderr)
-    
-    return False
-
-
-def fetch_api(endpoint: str) -> Optional[Dict]:
-    """Fetch data from our API endpoint."""
-    url = f"{API_BASE_URL}{endpoint}"
-    req = urllib.request.Request(url, method='GET', headers={
-        'User-Agent': 'TopHistoryCollector/1.0',
-        'Accept': 'application/json'
-    })
-    
-    try:
-        with urllib.request.urlopen(req, timeout=30) as resp:
-            if resp.status == 200:
-                return json.loads(resp.read())
-    except Exception as e:
-        print(f"⚠️ API fetch failed for {endpoint}: {e}", file=sys.stderr)
-    
-    return None
+def fetch_sources() -> Dict[str, Optional[Dict]]:
+    """Read the three Top 10 source values from KV in one bulk request."""
+    kv = kv_client(CF_ACCOUNT_ID, CF_API_TOKEN, CF_KV_NAMESPACE_ID)
+    values = kv.get_many(['top_validators', 'top_wallets', 'top_subnets'])
+    return {key: v if isinstance(v, dict) else None for key, v in values.items()}
 
 
 def process_validators(data: Dict) -> List[Dict]:
@@ -213,10 +147,8 @@ def process_subnets(data: Dict) -> List[Dict]:
     return entries
 
 
-def append_to_history(history_key: str, new_entry: Dict) -> bool:
-    """Append a new entry to a history collection and store it."""
-    # Get existing history
-    history = get_from_kv(history_key)
+def append_entry(history_key: str, history: Any, new_entry: Dict) -> List[Dict]:
+    """Append a new entry to a history collection (trimmed to MAX_HISTORY_ENTRIES)."""
     if history is None:
         history = []
     
@@ -231,8 +163,20 @@ def append_to_history(history_key: str, new_entry: Dict) -> bool:
     if len(history) > MAX_HISTORY_ENTRIES:
         history = history[-MAX_HISTORY_ENTRIES:]
     
-    # Store back
-    return put_to_kv(history_key, history)
+    return history
+
+
+def append_to_histories(snapshots: Dict[str, Dict]) -> bool:
+    """Append one snapshot per history key: one bulk read, one bulk write."""
+    if not snapshots:
+        return True
+    kv = kv_client(CF_ACCOUNT_ID, CF_API_TOKEN, CF_KV_NAMESPACE_ID)
+    current = kv.get_many(list(snapshots))
+    updated = {key: append_entry(key, current.get(key), snapshot) for key, snapshot in snapshots.items()}
+    if kv.put_many(updated, compact=False):
+        print(f"✅ KV PUT OK ({', '.join(updated)})")
+        return True
+    return False
 
 
 def write_local_backup(filename: str, data: Any):
@@ -259,12 +203,15 @@ def main():
     
     timestamp = datetime.now(timezone.utc).isoformat()
     print(f"📅 Timestamp: {timestamp}")
-    print(f"🌐 API Base: {API_BASE_URL}")
     print()
+    sources = fetch_sources()
     
     success_count = 0
     error_count = 0
     
+    # Snapshots to append, keyed by history key (written together at the end)
+    history_snapshots = {}
+    
     # Collect all snapshots for local backup
     all_snapshots = {
         '_generated_at': timestamp,
@@ -275,7 +222,7 @@ def main():
     
     # === Top Validators ===
     print("📊 Fetching Top Validators...")
-    validators_data = fetch_api('/api/top_validators')
+    validators_data = sources.get('top_validators')
     if validators_data:
         entries = process_validators(validators_data)
         if entries:
@@ -289,10 +236,7 @@ def main():
             for e in entries[:3]:
                 print(f"   #{e['rank']} {e['name']}: {e['value']:,.0f} τ")
             
-            if append_to_history('top_validators_history', snapshot):
-                success_count += 1
-            else:
-                error_count += 1
+            history_snapshots['top_validators_history'] = snapshot
         else:
             print("   ⚠️ No validator entries extracted")
             error_count += 1
@@ -304,7 +248,7 @@ def main():
     
     # === Top Wallets ===
     print("💰 Fetching Top Wallets...")
-    wallets_data = fetch_api('/api/top_wallets')
+    wallets_data = sources.get('top_wallets')
     if wallets_data:
         entries = process_wallets(wallets_data)
         if entries:
@@ -318,10 +262,7 @@ def main():
             for e in entries[:3]:
                 print(f"   #{e['rank']} {e['name']}: {e['value']:,.0f} τ")
             
-            if append_to_history('top_wallets_history', snapshot):
-                success_count += 1
-            else:
-                error_count += 1
+            history_snapshots['top_wallets_history'] = snapshot
         else:
             print("   ⚠️ No wallet entries extracted")
             error_count += 1
@@ -333,7 +274,7 @@ def main():
     
     # === Top Subnets ===
     print("🔗 Fetching Top Subnets...")
-    subnets_data = fetch_api('/api/top_subnets')
+    subnets_data = sources.get('top_subnets')
     if subnets_data:
         entries = process_subnets(subnets_data)
         if entries:
@@ -347,10 +288,7 @@ def main():
             for e in entries[:3]:
                 print(f"   #{e['rank']} {e['name']}: {e['value']:,.2f} τ/day")
             
-            if append_to_history('top_subnets_history', snapshot):
-                success_count += 1
-            else:
-                error_count += 1
+            history_snapshots['top_subnets_history'] = snapshot
         else:
             print("   ⚠️ No subnet entries extracted")
             error_count += 1
@@ -360,6 +298,16 @@ def main():
     
     print()
     
+    # === Append to histories ===
+    print("📜 Appending to histories...")
+    if append_to_histories(history_snapshots):
+        success_count += len(history_snapshots)
+    else:
+        print("   ❌ KV write failed")
+        error_count += len(history_snapshots)
+    
+    print()
+    
     # Write local backup
     write_local_backup('top_history_latest.json', all_snapshots)
     
@@ -49,7 +49,7 @@ fi
 echo "Using legacy KV write (no chunking)"
 
 LOCAL_CANONICAL=$(jq -cS 'if type=="array" then . elif type=="object" then [.] else [.] end' issuance_history.json 2>/dev/null || cat issuance_history.json | jq -cS 'if type=="array" then . elif type=="object" then [.] else [.] end')
-URL="https://api.cloudflare.com/client/v4/accounts/${CF_ACCOUNT_ID}/storage/kv/namespaces/${CF_KV_NAMESPACE_ID}/values/issuance_history"
+URL="${CF_API_BASE:-https://api.cloudflare.com/client/v4}/accounts/${CF_ACCOUNT_ID}/storage/kv/namespaces/${CF_KV_NAMESPACE_ID}/values/issuance_history"
 HTTP_STATUS_KV=$(curl -s -o /tmp/kv_current.json -w "%{http_code}" -H "Authorization: Bearer ${CF_API_TOKEN}" "$URL" || true)
 echo "DEBUG: HTTP_STATUS_KV=$HTTP_STATUS_KV" >&2
 PUSH_FILE=issuance_history.json
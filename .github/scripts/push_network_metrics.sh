@@ -8,7 +8,7 @@ if [ -z "${CF_ACCOUNT_ID:-}" ] || [ -z "${CF_API_TOKEN:-}" ] || [ -z "${CF_KV_NA
   echo "CF env not configured; failing to avoid silent skips" >&2
   exit 1
 fi
-URL="https://api.cloudflare.com/client/v4/accounts/${CF_ACCOUNT_ID}/storage/kv/namespaces/${CF_KV_NAMESPACE_ID}/values/metrics"
+URL="${CF_API_BASE:-https://api.cloudflare.com/client/v4}/accounts/${CF_ACCOUNT_ID}/storage/kv/namespaces/${CF_KV_NAMESPACE_ID}/values/metrics"
 HTTP_STATUS=$(curl -s -o /tmp/network_push_out -w "%{http_code}" -X PUT "$URL" -H "Authorization: Bearer $CF_API_TOKEN" -H "Content-Type: application/json" --data-binary @network.json || true)
 if [ "$HTTP_STATUS" != "200" ] && [ "$HTTP_STATUS" != "204" ]; then
   echo "Failed to push metrics to Cloudflare KV: HTTP $HTTP_STATUS" >&2
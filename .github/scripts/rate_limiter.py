@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+Per-host rate limits shared by every upstream fetcher.
+
+Taostats allows 5 requests/min and 10k requests/month. Every request to a
+limited host takes a token from that host's process-wide bucket (burst up to
+the per-minute rate, then the refill rate) instead of sleeping a fixed
+interval, and is counted against a persistent monthly budget.
+
+The repo's own schedules already make more than 10k Taostats requests a month
+(the 5-minute price feed alone is ~8.6k), so by default the budget only
+warns. HTTP_BUDGET_ENFORCE=1 makes it a hard stop.
+
+  * `limiter_for(host)` returns the shared RateLimiter for a host (None for
+    unlimited hosts); a 429 with Retry-After pauses the whole bucket, so
+    concurrent workers back off together
+  * `budget()` is the monthly request budget. Past the monthly limit it
+    warns once per host (or raises BudgetExceeded when enforced); usage is
+    flushed at exit.
+
+The budget count is best-effort. Concurrent workflows never read-modify-write
+a shared counter: each flush writes only the requests made since the previous
+flush, to a new `http_budget_<YYYY-MM-DD>_<run>-<n>` key. The month total
+lives in `http_budget_<YYYY-MM>`, and a process start reads only that one key.
+Only `fold` (hourly: the collector daemon, or the kv - HTTP Budget workflow)
+adds the delta keys to the total and deletes them. So the total lags by up to
+an hour of other runs' requests. Without KV the counts live in
+HTTP_BUDGET_FILE.
+
+http_client.py applies both to every request; scripts normally only use
+that module.
+
+Environment variables:
+  TAOSTATS_RATE_PER_MIN     Taostats requests per minute (default: 5)
+  TAOSTATS_MONTHLY_BUDGET   Taostats requests per calendar month (default: 10000)
+  HTTP_BUDGET_ENFORCE       Raise BudgetExceeded past the monthly budget (default: 0 = warn only)
+  HTTP_BUDGET_FILE          Local budget file (default: .github/data/http_budget.json)
+
+Usage:
+  python .github/scripts/rate_limiter.py fold     # fold the delta keys into the month totals
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import atexit
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Tuple
+
+
+def _int_env(name, default):
+    v = os.getenv(name)
+    if v is None:
+        return default
+    v2 = v.strip()
+    if v2 == '':
+        return default
+    try:
+        return int(v2)
+    except Exception:
+        print(f"Warning: environment variable {name} is invalid ({v!r}), using default {default}", file=sys.stderr)
+        return default
+
+
+TAOSTATS_HOST = 'api.taostats.io'
+# host -> (requests per minute, requests per month; 0 = unlimited)
+HOST_LIMITS: Dict[str, Tuple[int, int]] = {
+    TAOSTATS_HOST: (_int_env('TAOSTATS_RATE_PER_MIN', 5), _int_env('TAOSTATS_MONTHLY_BUDGET', 10_000)),
+}
+HTTP_BUDGET_ENFORCE = _int_env('HTTP_BUDGET_ENFORCE', 0)
+HTTP_BUDGET_FILE = os.getenv('HTTP_BUDGET_FILE', os.path.join('.github', 'data', 'http_budget.json'))
+HTTP_BUDGET_KV_PREFIX = 'http_budget_'
+HTTP_BUDGET_LEGACY_KEY = 'http_budget'  # single shared counter used before the per-run keys
+
+
+class BudgetExceeded(RuntimeError):
+    """The monthly request budget for a host is used up."""
+
+
+class RateLimiter:
+    """Thread-safe token bucket (burst = rate per minute)."""
+
+    def __init__(self, per_minute: int):
+        self.capacity = max(1, per_minute)
+        self.tokens = float(self.capacity)
+        self.rate = self.capacity / 60.0
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.waited = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if now >= self.paused_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = max(self.paused_until - now, (1 - self.tokens) / self.rate)
+                self.waited += wait
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        """Hold every caller for `seconds` (server-sent Retry-After) and drain the bucket."""
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0.0
+
+
+class MonthlyBudget:
+    """Per-host request counts for the current UTC month, persisted across runs (best-effort, see above)."""
+
+    def __init__(self, path: str = HTTP_BUDGET_FILE, enforce: bool = bool(HTTP_BUDGET_ENFORCE)):
+        self.path = path
+        self.enforce = enforce
+        self.lock = threading.Lock()
+        self.io_lock = threading.Lock()                # serialises flush and fold KV writes
+        self.run = f"{os.getenv('GITHUB_RUN_ID', 'local')}-{uuid.uuid4().hex[:8]}"
+        self.seq = 0
+        self.month = self._month()
+        self.used: Dict[str, int] = {}                 # month total as loaded
+        self.flushed: Dict[str, int] = {}              # written by this process since, not yet in `used`
+        self.pending: Dict[str, Dict[str, int]] = {}   # day -> host -> requests not yet flushed
+        self.warned = set()
+        self.loaded = False
+
+    @staticmethod
+    def _month(delta_days: int = 0) -> str:
+        return (datetime.now(timezone.utc) + timedelta(days=delta_days)).strftime('%Y-%m')
+
+    @staticmethod
+    def _day() -> str:
+        return datetime.now(timezone.utc).strftime('%Y-%m-%d')
+
+    @staticmethod
+    def _hosts(value) -> Dict[str, int]:
+        return {h: int(n) for h, n in (value.get('hosts') or {}).items()} if isinstance(value, dict) else {}
+
+    def _count(self, host: str) -> int:
+        """Requests to `host` this month: loaded total + this process's flushed and pending counts."""
+        pending = sum(c.get(host, 0) for day, c in self.pending.items() if day.startswith(self.month))
+        return self.used.get(host, 0) + self.flushed.get(host, 0) + pending
+
+    def _read(self) -> Dict[str, int]:
+        """The month total from KV (preferred) or the local file."""
+        try:
+            from kv_client import get_client
+            kv = get_client()
+            status, data = kv.read(f"{HTTP_BUDGET_KV_PREFIX}{self.month}") if kv else (None, None)
+            if status == 200:
+                return self._hosts(json.loads(data.decode('utf-8')))
+            if status == 404:  # not folded yet this month
+                legacy = kv.get_json(HTTP_BUDGET_LEGACY_KEY)
+                return self._hosts(legacy) if isinstance(legacy, dict) and legacy.get('month') == self.month else {}
+        except Exception as e:
+            print(f"⚠️ Failed to read request budget from KV: {e}", file=sys.stderr)
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except (FileNotFoundError, ValueError):
+            state = None
+        if not isinstance(state, dict) or state.get('month') != self.month:
+            return {}
+        return self._hosts(state)
+
+    def _load(self):
+        if not self.loaded:
+            self.used, self.flushed = self._read(), {}
+            self.loaded = True
+
+    def spend(self, host: str):
+        """Count one request to `host`; past its monthly limit warn once, or raise BudgetExceeded when enforced."""
+        limit = HOST_LIMITS.get(host, (0, 0))[1]
+        with self.lock:
+            month = self._month()
+            if month != self.month:
+                self.month, self.used, self.flushed, self.loaded, self.warned = month, {}, {}, False, set()
+            if limit:
+                self._load()
+                used = self._count(host)
+                if used >= limit:
+                    message = f"{host}: monthly budget of {limit:,} requests used up ({self.month})"
+                    if self.enforce:
+                        raise BudgetExceeded(message)
+                    if host not in self.warned:
+                        self.warned.add(host)
+                        print(f"⚠️ {message}; not enforced (HTTP_BUDGET_ENFORCE=0)", file=sys.stderr)
+            counts = self.pending.setdefault(self._day(), {})
+            counts[host] = counts.get(host, 0) + 1
+
+    def remaining(self, host: str) -> Optional[int]:
+        limit = HOST_LIMITS.get(host, (0, 0))[1]
+        if not limit:
+            return None
+        with self.lock:
+            self._load()
+            return max(0, limit - self._count(host))
+
+    def flush(self):
+        """Write the requests since the last flush to a new delta key (no shared counter to race on)."""
+        with self.io_lock:
+            with self.lock:
+                days = {day: {h: n for h, n in counts.items() if h in HOST_LIMITS}
+                        for day, counts in self.pending.items()}
+                days = {day: hosts for day, hosts in days.items() if hosts}
+                if not days:
+                    return
+                self.pending = {}
+                self._load()
+                self.seq += 1
+                delta: Dict[str, int] = {}
+                for day, counts in days.items():
+                    if day.startswith(self.month):
+                        for host, n in counts.items():
+                            delta[host] = delta.get(host, 0) + n
+                hosts = {h: self.used.get(h, 0) + self.flushed.get(h, 0) + delta.get(h, 0)
+                         for h in set(self.used) | set(self.flushed) | set(delta)}
+                state = {'month': self.month, 'hosts': hosts,
+                         '_timestamp': datetime.now(timezone.utc).isoformat()}
+            try:
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                with open(self.path, 'w') as f:
+                    json.dump(state, f, indent=2)
+            except OSError as e:
+                print(f"⚠️ Failed to write request budget file: {e}", file=sys.stderr)
+            written = False
+            try:
+                from kv_client import get_client
+                kv = get_client()
+                written = bool(kv) and kv.put_many({f"{HTTP_BUDGET_KV_PREFIX}{day}_{self.run}-{self.seq}": {'hosts': counts}
+                                                    for day, counts in days.items()})
+            except Exception as e:
+                print(f"⚠️ Failed to save request budget to KV: {e}", file=sys.stderr)
+            with self.lock:
+                if written:
+                    for host, n in delta.items():
+                        self.flushed[host] = self.flushed.get(host, 0) + n
+                else:  # keep them for the next flush (or the file total when there is no KV)
+                    for day, counts in days.items():
+                        merged = self.pending.setdefault(day, {})
+                        for host, n in counts.items():
+                            merged[host] = merged.get(host, 0) + n
+        for host, used in hosts.items():
+            limit = HOST_LIMITS.get(host, (0, 0))[1]
+            if limit:
+                print(f"📉 {host}: {used:,}/{limit:,} requests this month", file=sys.stderr)
+
+    def fold(self) -> Optional[Dict[str, int]]:
+        """
+        Add the delta keys of this and the previous month to the month totals and delete them.
+
+        Run by one scheduled job only (the total is read-modify-written);
+        returns this month's totals, None when KV is unavailable.
+        """
+        self.flush()
+        from kv_client import get_client
+        kv = get_client()
+        if kv is None:
+            print("⚠️ No KV configured; nothing to fold", file=sys.stderr)
+            return None
+        current = None
+        with self.io_lock:
+            # last month too, for deltas flushed after the last fold before month end
+            for month in sorted({self._month(-datetime.now(timezone.utc).day), self._month()}):
+                keys = kv.list_keys(f"{HTTP_BUDGET_KV_PREFIX}{month}-")
+                if keys is None:
+                    return None
+                total_key = f"{HTTP_BUDGET_KV_PREFIX}{month}"
+                status, data = kv.read(total_key)
+                if status == 200:
+                    total = json.loads(data.decode('utf-8'))
+                elif status == 404:
+                    legacy = kv.get_json(HTTP_BUDGET_LEGACY_KEY)
+                    total = legacy if isinstance(legacy, dict) and legacy.get('month') == month else {}
+                else:
+                    print(f"⚠️ Cannot read {total_key} ({status}); not folding", file=sys.stderr)
+                    return None
+                hosts = self._hosts(total)
+                if keys:
+                    for value in kv.get_many(keys).values():
+                        for host, n in self._hosts(value).items():
+                            hosts[host] = hosts.get(host, 0) + n
+                    state = {'month': month, 'hosts': hosts, 'folded': int(total.get('folded') or 0) + len(keys),
+                             '_timestamp': datetime.now(timezone.utc).isoformat()}
+                    if not kv.put_json(total_key, state, compact=False):
+                        return None
+                    kv.delete_many(keys)
+                print(f"🧮 {total_key}: folded {len(keys)} delta keys", file=sys.stderr)
+                if month == self._month():
+                    current = hosts
+            with self.lock:
+                if self.month == self._month():
+                    self.used, self.flushed, self.loaded = dict(current), {}, True
+        for host, used in current.items():
+            limit = HOST_LIMITS.get(host, (0, 0))[1]
+            if limit:
+                print(f"📉 {host}: {used:,}/{limit:,} requests this month", file=sys.stderr)
+        return current
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_budget: Optional[MonthlyBudget] = None
+_lock = threading.Lock()
+
+
+def limiter_for(host: str) -> Optional[RateLimiter]:
+    """Process-wide token bucket for `host` (None when the host has no per-minute limit)."""
+    per_minute = HOST_LIMITS.get(host, (0, 0))[0]
+    if not per_minute:
+        return None
+    with _lock:
+        if host not in _limiters:
+            _limiters[host] = RateLimiter(per_minute)
+        return _limiters[host]
+
+
+def budget() -> MonthlyBudget:
+    """Process-wide monthly budget, flushed when the process exits."""
+    global _budget
+    with _lock:
+        if _budget is None:
+            _budget = MonthlyBudget()
+            atexit.register(_budget.flush)
+        return _budget
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ['fold']:
+        print(__doc__.split('Usage:')[1].strip(), file=sys.stderr)
+        sys.exit(2)
+    sys.exit(0 if budget().fold() is not None else 1)
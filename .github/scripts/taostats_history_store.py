@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Append-only daily chunk storage for taostats history in Cloudflare KV.
+
+Each UTC day lives in its own key, `taostats_history_YYYY-MM-DD` (compact
+JSON array, the scheme read by functions/api/taostats_history.js). A run
+reads and rewrites only today's chunk, so the write cost no longer grows
+with the history length.
+
+Chunks older than TAOSTATS_CHUNK_RETENTION_DAYS are compacted into monthly
+hourly rollups, `taostats_history_rollup_YYYY-MM`:
+
+    {"resolution": "1h", "columns": ["t", "open", "high", "low", "close", "volume", "n"],
+     "t": [...], "open": [...], ...}
+
+where `t` is the bucket start (epoch seconds), OHLC is the price, `volume`
+the mean `volume_24h` and `n` the number of samples in the hour. Compaction
+lists the chunk keys by prefix and folds every chunk past the retention
+line, so days a missed run left behind are caught up instead of expiring.
+
+Environment variables:
+  CF_ACCOUNT_ID, CF_API_TOKEN, CF_KV_NAMESPACE_ID (or CF_METRICS_NAMESPACE_ID)
+  TAOSTATS_CHUNK_RETENTION_DAYS  Daily chunks kept before compaction (default: 35)
+  TAOSTATS_CHUNK_MAX_ENTRIES     Max entries per daily chunk (default: 500)
+
+Usage:
+  python .github/scripts/taostats_history_store.py append taostats_latest.json
+  python .github/scripts/taostats_history_store.py compact
+  python .github/scripts/taostats_history_store.py export [DAYS]   # write chunk files for backup
+"""
+
+import os
+import sys
+import json
+from datetime import date, datetime, timezone, timedelta
+from typing import Dict, List, Optional
+
+from kv_client import client, env_config
+
+
+def _int_env(name, default):
+    v = os.getenv(name)
+    if v is None:
+        return default
+    v2 = v.strip()
+    if v2 == '':
+        return default
+    try:
+        return int(v2)
+    except Exception:
+        print(f"Warning: environment variable {name} is invalid ({v!r}), using default {default}", file=sys.stderr)
+        return default
+
+
+CHUNK_PREFIX = 'taostats_history_'
+ROLLUP_PREFIX = 'taostats_history_rollup_'
+LEGACY_KEY = 'taostats_history'
+CHUNK_RETENTION_DAYS = _int_env('TAOSTATS_CHUNK_RETENTION_DAYS', 35)
+CHUNK_MAX_ENTRIES = _int_env('TAOSTATS_CHUNK_MAX_ENTRIES', 500)
+ROLLUP_BUCKET_SECONDS = 3600
+ROLLUP_COLUMNS = ['t', 'open', 'high', 'low', 'close', 'volume', 'n']
+
+
+def _kv_config():
+    return env_config()
+
+
+def kv_get(cfg, key):
+    """GET a JSON value from KV; None when missing or unreadable."""
+    return client(*cfg).get_json(key)
+
+
+def kv_put(cfg, key, obj, compress=None) -> bool:
+    return client(*cfg).put_json(key, obj, compress=compress)
+
+
+def kv_delete(cfg, key) -> bool:
+    return client(*cfg).delete(key)
+
+
+def kv_get_many(cfg, keys) -> Dict:
+    """{key: JSON value or None} in one bulk request per 100 keys."""
+    return client(*cfg).get_many(keys)
+
+
+def kv_put_many(cfg, items: Dict, compress_keys=()) -> bool:
+    return client(*cfg).put_many(items, compress_keys=compress_keys)
+
+
+def kv_delete_many(cfg, keys) -> bool:
+    return client(*cfg).delete_many(keys)
+
+
+def chunk_key(day) -> str:
+    return f"{CHUNK_PREFIX}{day.isoformat()}"
+
+
+def rollup_key(day) -> str:
+    return f"{ROLLUP_PREFIX}{day.strftime('%Y-%m')}"
+
+
+def _as_list(value) -> List[Dict]:
+    if isinstance(value, list):
+        return value
+    if isinstance(value, dict):
+        return [value]
+    return []
+
+
+def history_entry(latest: Dict) -> Dict:
+    """The compact history row for one taostats_latest payload."""
+    return {
+        "_timestamp": latest.get("_timestamp") or datetime.now(timezone.utc).isoformat(),
+        "price": latest.get("price"),
+        "volume_24h": latest.get("volume_24h"),
+    }
+
+
+def merge_entries(current: List[Dict], new: List[Dict], max_entries: int = CHUNK_MAX_ENTRIES) -> List[Dict]:
+    """Append entries not already present (by _timestamp), sorted and bounded like the Worker does."""
+    seen = {e.get('_timestamp') for e in current if isinstance(e, dict)}
+    merged = list(current)
+    for e in new:
+        if e.get('_timestamp') in seen:
+            continue
+        merged.append(e)
+        seen.add(e.get('_timestamp'))
+    merged.sort(key=lambda e: _epoch(e.get('_timestamp')) or 0)
+    return merged[-max_entries:]
+
+
+def append_entries(cfg, entries: List[Dict]) -> Optional[int]:
+    """Append entries to their daily chunks (normally just today's). Returns today's chunk size."""
+    by_day: Dict = {}
+    for e in entries:
+        epoch = _epoch(e.get('_timestamp'))
+        if epoch is None:
+            continue
+        by_day.setdefault(datetime.fromtimestamp(epoch, timezone.utc).date(), []).append(e)
+    if not by_day:
+        return None
+    days = sorted(by_day)
+    current = kv_get_many(cfg, [chunk_key(day) for day in days])
+    chunks = {chunk_key(day): merge_entries(_as_list(current.get(chunk_key(day))), by_day[day]) for day in days}
+    if not kv_put_many(cfg, chunks):
+        return None
+    for key, chunk in chunks.items():
+        print(f"✅ {key}: {len(chunk)} entries", file=sys.stderr)
+    return len(chunks[chunk_key(days[-1])])
+
+
+def _epoch(ts) -> Optional[float]:
+    if not ts:
+        return None
+    try:
+        return datetime.fromisoformat(str(ts).replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return None
+
+
+def rollup_rows(entries: List[Dict]) -> Dict[int, List]:
+    """Hourly OHLC / mean-volume rows keyed by bucket start (epoch seconds)."""
+    buckets: Dict[int, List] = {}
+    for e in sorted(entries, key=lambda x: _epoch(x.get('_timestamp')) or 0):
+        epoch = _epoch(e.get('_timestamp'))
+        price = e.get('price')
+        if epoch is None or price is None:
+            continue
+        t = int(epoch // ROLLUP_BUCKET_SECONDS * ROLLUP_BUCKET_SECONDS)
+        vol = e.get('volume_24h')
+        row = buckets.get(t)
+        if row is None:
+            # t, open, high, low, close, volume sum, n, volume count
+            buckets[t] = [t, price, price, price, price, vol or 0.0, 1, 1 if vol is not None else 0]
+            continue
+        row[2] = max(row[2], price)
+        row[3] = min(row[3], price)
+        row[4] = price
+        if vol is not None:
+            row[5] += vol
+            row[7] += 1
+        row[6] += 1
+    return {t: [r[0], r[1], r[2], r[3], r[4], (r[5] / r[7]) if r[7] else None, r[6]] for t, r in buckets.items()}
+
+
+def merge_rollup(rollup: Optional[Dict], rows: Dict[int, List]) -> Dict:
+    """Upsert hourly rows into a columnar monthly rollup."""
+    existing = {}
+    if rollup and rollup.get('t'):
+        for i, t in enumerate(rollup['t']):
+            existing[t] = [rollup[col][i] for col in ROLLUP_COLUMNS]
+    existing.update(rows)
+    ts = sorted(existing)
+    out = {"resolution": "1h", "columns": ROLLUP_COLUMNS}
+    for j, col in enumerate(ROLLUP_COLUMNS):
+        out[col] = [existing[t][j] for t in ts]
+    out["count"] = len(ts)
+    out["last_updated"] = datetime.now(timezone.utc).isoformat()
+    return out
+
+
+def chunk_days(cfg) -> Optional[List[date]]:
+    """Days that have a daily chunk in KV (listed by key prefix); None when listing failed."""
+    names = client(*cfg).list_keys(CHUNK_PREFIX)
+    if names is None:
+        return None
+    days = []
+    for name in names:
+        try:
+            days.append(date.fromisoformat(name[len(CHUNK_PREFIX):]))
+        except ValueError:
+            continue  # taostats_history_rollup_YYYY-MM
+    return sorted(days)
+
+
+def compact(cfg, today=None) -> int:
+    """Fold every daily chunk that left the retention window into its monthly rollup."""
+    today = today or datetime.now(timezone.utc).date()
+    cutoff = today - timedelta(days=CHUNK_RETENTION_DAYS)
+    days = chunk_days(cfg)
+    if days is None:
+        print("❌ Could not list daily chunks; nothing compacted", file=sys.stderr)
+        return 0
+    days = [day for day in days if day <= cutoff]
+    chunks = kv_get_many(cfg, [chunk_key(day) for day in days])
+    days = [day for day in days if _as_list(chunks.get(chunk_key(day)))]
+    if not days:
+        return 0
+    # Read every touched rollup once, fold all days into it, write them back together
+    rollups = kv_get_many(cfg, sorted({rollup_key(day) for day in days}))
+    for day in days:
+        rkey = rollup_key(day)
+        rollups[rkey] = merge_rollup(rollups.get(rkey), rollup_rows(_as_list(chunks[chunk_key(day)])))
+    if not kv_put_many(cfg, rollups):
+        print(f"❌ Failed to write {', '.join(rollups)}; keeping the daily chunks", file=sys.stderr)
+        return 0
+    kv_delete_many(cfg, [chunk_key(day) for day in days])
+    for day in days:
+        key, rkey = chunk_key(day), rollup_key(day)
+        print(f"🗜️ {key} ({len(_as_list(chunks[key]))} entries) -> {rkey} ({rollups[rkey]['count']} hours)", file=sys.stderr)
+    return len(days)
+
+
+def load_recent_history(cfg, days: int = CHUNK_RETENTION_DAYS, today=None) -> Optional[List[Dict]]:
+    """
+    Entries from the last `days` daily chunks, oldest first.
+
+    Falls back to the legacy single `taostats_history` key when no chunk
+    exists yet; None when neither is present.
+    """
+    today = today or datetime.now(timezone.utc).date()
+    keys = [chunk_key(today - timedelta(days=i)) for i in range(days - 1, -1, -1)]
+    chunks = kv_get_many(cfg, keys)
+    entries: List[Dict] = []
+    found = False
+    for key in keys:
+        if chunks.get(key) is not None:
+            found = True
+            entries.extend(_as_list(chunks[key]))
+    if not found:
+        legacy = kv_get(cfg, LEGACY_KEY)
+        return _as_list(legacy) if legacy is not None else None
+    return merge_entries([], entries, max_entries=len(entries))
+
+
+def export_chunks(cfg, days: int = 2, today=None) -> List[str]:
+    """Write the last `days` daily chunks to local files (for the R2 backup)."""
+    today = today or datetime.now(timezone.utc).date()
+    paths = []
+    chunks = kv_get_many(cfg, [chunk_key(today - timedelta(days=i)) for i in range(days)])
+    for i in range(days):
+        day = today - timedelta(days=i)
+        chunk = chunks.get(chunk_key(day))
+        if not chunk:
+            continue
+        path = f"{chunk_key(day)}.json"
+        with open(path, 'w') as f:
+            json.dump(chunk, f, separators=(',', ':'))
+        paths.append(path)
+        print(f"💾 {path}: {len(_as_list(chunk))} entries", file=sys.stderr)
+    return paths
+
+
+def main():
+    cmd = sys.argv[1] if len(sys.argv) > 1 else None
+    if cmd not in ('append', 'compact', 'export'):
+        print(__doc__, file=sys.stderr)
+        sys.exit(2)
+    cfg = _kv_config()
+    if cfg is None:
+        print("❌ CF_ACCOUNT_ID, CF_API_TOKEN and CF_KV_NAMESPACE_ID are required", file=sys.stderr)
+        sys.exit(1)
+
+    if cmd == 'append':
+        path = sys.argv[2] if len(sys.argv) > 2 else 'taostats_latest.json'
+        with open(path) as f:
+            payload = json.load(f)
+        entries = [history_entry(p) for p in _as_list(payload)]
+        if append_entries(cfg, entries) is None:
+            sys.exit(1)
+    elif cmd == 'compact':
+        n = compact(cfg)
+        print(f"✅ Compacted {n} daily chunk(s)", file=sys.stderr)
+    else:
+        days = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+        export_chunks(cfg, days)
+
+
+if __name__ == "__main__":
+    main()
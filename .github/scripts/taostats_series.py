@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Multi-resolution taostats price/volume series for charts.
+
+Keeps one bounded, columnar series per resolution in KV:
+
+    taostats_series_5m   2 days of 5-minute buckets
+    taostats_series_1h   30 days of hourly buckets
+    taostats_series_4h   90 days of 4-hour buckets
+    taostats_series_1d   2 years of daily buckets
+
+Layout: {"resolution": "1h", "bucket_seconds": 3600,
+         "columns": ["t", "open", "high", "low", "close", "volume", "n"],
+         "t": [...], "open": [...], ..., "last_epoch": ...}
+
+`t` is the UTC-aligned bucket start (epoch seconds), OHLC is the price and
+`volume` the mean of the `volume_24h` samples in the bucket (`volume_24h` is
+already a rolling 24h total, so summing samples would double count). `n` is
+the number of samples in the bucket.
+
+Series are updated incrementally: only samples newer than `last_epoch` are
+folded into the last bucket or appended, then the series is trimmed to its
+point budget. compute_taostats_aggregates.py feeds the new samples every run;
+`--rebuild` recreates all series from the monthly rollups and daily chunks
+(taostats_history_store.py). The chunks only hold CHUNK_RETENTION_DAYS, so
+the 4h / 1d series get their longer range from the rollups alone. The
+incremental update therefore runs the rebuild itself when a series is missing,
+empty or has never been rebuilt (no `rebuilt_at`).
+
+Usage:
+  python .github/scripts/taostats_series.py --rebuild
+"""
+
+import sys
+import json
+from datetime import datetime, timezone, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from taostats_history_store import (
+    CHUNK_RETENTION_DAYS,
+    ROLLUP_BUCKET_SECONDS,
+    _as_list,
+    _epoch,
+    _kv_config,
+    chunk_key,
+    kv_get,
+    kv_get_many,
+    kv_put_many,
+    rollup_key,
+)
+
+SERIES_KEY_PREFIX = 'taostats_series_'
+SERIES_COLUMNS = ['t', 'open', 'high', 'low', 'close', 'volume', 'n']
+# resolution -> (bucket seconds, max points)
+SERIES_RESOLUTIONS = {
+    '5m': (300, 576),
+    '1h': (3600, 720),
+    '4h': (14400, 540),
+    '1d': (86400, 730),
+}
+
+# (epoch, open, high, low, close, mean volume, n): a raw sample is a row with n=1
+Row = Tuple[float, float, float, float, float, float, int]
+
+
+def series_key(resolution: str) -> str:
+    return f"{SERIES_KEY_PREFIX}{resolution}"
+
+
+def new_series(resolution: str) -> Dict:
+    bucket, _ = SERIES_RESOLUTIONS[resolution]
+    out = {"resolution": resolution, "bucket_seconds": bucket, "columns": SERIES_COLUMNS}
+    for col in SERIES_COLUMNS:
+        out[col] = []
+    out["last_epoch"] = None
+    return out
+
+
+def sample_rows(samples: Iterable[Tuple[float, Optional[float], Optional[float]]]) -> List[Row]:
+    """(epoch, price, volume) samples -> single-sample rows (samples without a price are dropped)."""
+    return [(e, p, p, p, p, float(v or 0.0), 1) for e, p, v in samples if p is not None]
+
+
+def update_series(series: Dict, rows: Iterable[Row]) -> int:
+    """
+    Fold rows newer than series['last_epoch'] into the series (in place).
+
+    Rows must be sorted by epoch. Returns the number of rows applied.
+    """
+    bucket, max_points = SERIES_RESOLUTIONS[series["resolution"]]
+    t_col, o_col, h_col, l_col, c_col, v_col, n_col = (series[c] for c in SERIES_COLUMNS)
+    last = series.get("last_epoch")
+    applied = 0
+    for epoch, o, h, l, c, v, n in rows:
+        if last is not None and epoch <= last:
+            continue
+        t = int(epoch // bucket * bucket)
+        if t_col and t_col[-1] == t:
+            h_col[-1] = max(h_col[-1], h)
+            l_col[-1] = min(l_col[-1], l)
+            c_col[-1] = c
+            total = n_col[-1] + n
+            v_col[-1] = (v_col[-1] * n_col[-1] + v * n) / total
+            n_col[-1] = total
+        elif not t_col or t > t_col[-1]:
+            for col, value in zip((t_col, o_col, h_col, l_col, c_col, v_col, n_col), (t, o, h, l, c, v, n)):
+                col.append(value)
+        else:
+            continue
+        last = epoch
+        applied += 1
+    if len(t_col) > max_points:
+        for col in SERIES_COLUMNS:
+            del series[col][:-max_points]
+    series["last_epoch"] = last
+    series["count"] = len(t_col)
+    return applied
+
+
+def _valid_series(series, resolution: str) -> Dict:
+    if not isinstance(series, dict) or series.get("columns") != SERIES_COLUMNS:
+        return new_series(resolution)
+    return series
+
+
+def load_series(cfg, resolution: str) -> Dict:
+    return _valid_series(kv_get(cfg, series_key(resolution)) if cfg else None, resolution)
+
+
+def _needs_rebuild(series) -> bool:
+    """Missing, empty, malformed, or only ever fed by incremental updates (no rollup history)."""
+    return (not isinstance(series, dict) or series.get("columns") != SERIES_COLUMNS
+            or not series.get("t") or not series.get("rebuilt_at"))
+
+
+def publish_series(cfg, samples: List[Tuple[float, Optional[float], Optional[float]]]) -> Dict[str, int]:
+    """
+    Apply new (epoch, price, volume) samples to every resolution and write changed series.
+
+    Falls back to rebuild_series (the samples are already in the daily
+    chunks) when any series needs it; the counts are then the rebuilt sizes.
+    """
+    stored = kv_get_many(cfg, [series_key(r) for r in SERIES_RESOLUTIONS])
+    stale = [r for r in SERIES_RESOLUTIONS if _needs_rebuild(stored.get(series_key(r)))]
+    if stale:
+        print(f"📈 Rebuilding series from rollups and chunks ({', '.join(stale)} missing or never rebuilt)",
+              file=sys.stderr)
+        return {r: series["count"] for r, series in rebuild_series(cfg).items()}
+    rows = sample_rows(sorted(samples, key=lambda s: s[0]))
+    applied = {}
+    changed = {}
+    for resolution in SERIES_RESOLUTIONS:
+        series = _valid_series(stored.get(series_key(resolution)), resolution)
+        applied[resolution] = update_series(series, rows)
+        if applied[resolution]:
+            series["last_updated"] = datetime.now(timezone.utc).isoformat()
+            changed[series_key(resolution)] = series
+    if changed:
+        kv_put_many(cfg, changed)
+    return applied
+
+
+def rollup_rows(rollup: Optional[Dict]) -> List[Row]:
+    """Hourly rollup (taostats_history_rollup_YYYY-MM) -> pre-aggregated rows."""
+    if not rollup or not rollup.get("t"):
+        return []
+    # Rows are stamped at the end of their hour so newer chunk samples of the same hour still apply
+    return [(t + ROLLUP_BUCKET_SECONDS - 1, o, h, l, c, float(v or 0.0), n)
+            for t, o, h, l, c, v, n in zip(*(rollup[col] for col in SERIES_COLUMNS))]
+
+
+def rebuild_series(cfg, today=None) -> Dict[str, Dict]:
+    """Recreate every series from the monthly rollups (>= 1h resolutions) and the daily chunks."""
+    today = today or datetime.now(timezone.utc).date()
+    # Months covered by the longest series
+    longest = max(b * m for b, m in SERIES_RESOLUTIONS.values())
+    month = (today - timedelta(seconds=longest)).replace(day=1)
+    rollup_keys = []
+    while month <= today:
+        rollup_keys.append(rollup_key(month))
+        month = (month + timedelta(days=32)).replace(day=1)
+    chunk_keys = [chunk_key(today - timedelta(days=i)) for i in range(CHUNK_RETENTION_DAYS - 1, -1, -1)]
+    stored = kv_get_many(cfg, chunk_keys + rollup_keys)
+
+    chunk_samples = []
+    for key in chunk_keys:
+        for e in _as_list(stored.get(key)):
+            epoch = _epoch(e.get('_timestamp'))
+            if epoch is not None:
+                chunk_samples.append((epoch, e.get('price'), e.get('volume_24h')))
+    chunk_rows = sample_rows(sorted(chunk_samples, key=lambda s: s[0]))
+    first_chunk = chunk_rows[0][0] if chunk_rows else float('inf')
+
+    hourly: List[Row] = []
+    for key in rollup_keys:
+        hourly.extend(r for r in rollup_rows(stored.get(key)) if r[0] < first_chunk)
+
+    out = {}
+    for resolution, (bucket, _) in SERIES_RESOLUTIONS.items():
+        series = new_series(resolution)
+        update_series(series, (hourly if bucket >= ROLLUP_BUCKET_SECONDS else []) + chunk_rows)
+        series["last_updated"] = series["rebuilt_at"] = datetime.now(timezone.utc).isoformat()
+        out[resolution] = series
+        print(f"📈 {series_key(resolution)}: {series['count']} points", file=sys.stderr)
+    kv_put_many(cfg, {series_key(r): series for r, series in out.items()})
+    return out
+
+
+def main():
+    if '--rebuild' not in sys.argv[1:]:
+        print(__doc__, file=sys.stderr)
+        sys.exit(2)
+    cfg = _kv_config()
+    if cfg is None:
+        print("❌ CF_ACCOUNT_ID, CF_API_TOKEN and CF_KV_NAMESPACE_ID are required", file=sys.stderr)
+        sys.exit(1)
+    out = rebuild_series(cfg)
+    print(json.dumps({r: s['count'] for r, s in out.items()}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,455 @@
+#!/usr/bin/env python3
+"""Shared validator snapshot stage.
+
+Fetches the FULL validator set from Taostats ONCE (concurrent pagination
+under the shared token bucket) and persists it as a compact
+columnar snapshot (`.github/data/validator_snapshot.json`, KV
+`validator_snapshot`). `top_validators`, `staking_apy` and the validator
+inputs of the decentralization score are all derived from that snapshot,
+so every consumer sees the same view and the quota is spent once per hour.
+
+Run as a script it performs the whole stage in one pass: fetch snapshot,
+persist it, then write top_validators and staking_apy. If Taostats is
+unavailable the snapshot is built from on-chain delegates (bittensor SDK).
+
+The SDK is optional: when every Taostats source fails and bittensor is not
+installed, the stage exits with CHAIN_FALLBACK_EXIT (3) before publishing,
+so CI can install bittensor and rerun with VALIDATOR_SOURCE=chain.
+
+Usage:
+  python .github/scripts/validator_snapshot.py              # snapshot stage
+  python .github/scripts/validator_snapshot.py --benchmark  # Taostats vs on-chain latency
+
+Other scripts call `get_validator_snapshot()`, which reuses a snapshot
+younger than VALIDATOR_SNAPSHOT_MAX_AGE_MINUTES (local file, then KV) and
+only fetches when none is available. Progress goes to stderr so callers
+can keep printing their JSON on stdout.
+"""
+import os
+import sys
+import json
+import time
+import importlib.util
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime, timezone, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+from kv_client import client as kv_client
+from http_client import get_json as http_get_json
+
+NETWORK = os.getenv('NETWORK', 'finney')
+TAOSTATS_API_KEY = os.getenv('TAOSTATS_API_KEY')
+
+
+def _int_env(name, default):
+    v = os.getenv(name)
+    if v is None:
+        return default
+    v2 = v.strip()
+    if v2 == '':
+        return default
+    try:
+        return int(v2)
+    except Exception:
+        print(f"Warning: environment variable {name} is invalid ({v!r}), using default {default}", file=sys.stderr)
+        return default
+
+
+DTAO_VALIDATOR_URL = "https://api.taostats.io/api/dtao/validator/latest/v1"
+VALIDATOR_PAGE_SIZE = 200  # Taostats max per page
+VALIDATOR_MAX_PAGES = _int_env('VALIDATOR_MAX_PAGES', 25)
+VALIDATOR_CONCURRENCY = _int_env('VALIDATOR_CONCURRENCY', 4)
+VALIDATOR_SNAPSHOT_MAX_AGE_MINUTES = _int_env('VALIDATOR_SNAPSHOT_MAX_AGE_MINUTES', 55)
+SNAPSHOT_KV_KEY = 'validator_snapshot'
+VALIDATOR_SOURCE = os.getenv('VALIDATOR_SOURCE', 'auto')  # 'chain' skips Taostats
+CHAIN_FALLBACK_EXIT = 3
+SNAPSHOT_PATH = os.path.join(os.getcwd(), '.github', 'data', 'validator_snapshot.json')
+
+# Column order of the snapshot; row i of every column describes validator i
+SNAPSHOT_COLUMNS = [
+    'hotkey', 'coldkey', 'name', 'stake_raw', 'nominators', 'active_subnets',
+    'take', 'dominance', 'nominator_return_per_day', 'validator_return_per_day', 'rank',
+]
+
+
+def _kv_config() -> Tuple[Optional[str], Optional[str], Optional[str]]:
+    return (os.getenv('CF_ACCOUNT_ID'), os.getenv('CF_API_TOKEN'),
+            os.getenv('CF_KV_NAMESPACE_ID') or os.getenv('CF_METRICS_NAMESPACE_ID'))
+
+
+def get_from_kv(account: str, token: str, namespace: str, key: str) -> Optional[Dict]:
+    return kv_client(account, token, namespace).get_json(key)
+
+
+def put_to_kv(account: str, token: str, namespace: str, key: str, data: bytes) -> bool:
+    if kv_client(account, token, namespace).put_bytes(key, data):
+        print(f"✅ KV PUT OK ({key})", file=sys.stderr)
+        return True
+    return False
+
+
+def _get_json(url: str, attempts: int = 3):
+    """GET a Taostats URL through the shared HTTP layer (token bucket, Retry-After, retries)."""
+    hdrs = {
+        'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+        'Accept': 'application/json',
+    }
+    if TAOSTATS_API_KEY:
+        hdrs['Authorization'] = TAOSTATS_API_KEY
+    try:
+        return http_get_json(url, headers=hdrs, timeout=15, retries=attempts - 1)
+    except Exception as e:
+        raise Exception(f"{url}: {e}")
+
+
+def fetch_all_validators() -> Tuple[List[Dict], Dict]:
+    """
+    Fetch every validator from the dTao endpoint.
+
+    Page 1 reveals `pagination.total_pages`; remaining pages are fetched
+    concurrently under the shared Taostats token bucket. Returns (items,
+    meta) where meta records pages fetched and whether the set is complete.
+    """
+    def page_url(page: int) -> str:
+        return f"{DTAO_VALIDATOR_URL}?limit={VALIDATOR_PAGE_SIZE}&page={page}"
+
+    first = _get_json(page_url(1))
+    items = list(first.get('data') or [])
+    pagination = first.get('pagination') or {}
+    total_pages = int(pagination.get('total_pages') or 1)
+    pages = min(total_pages, VALIDATOR_MAX_PAGES)
+    total_items = pagination.get('total_items') or pagination.get('total_count')
+
+    failed = []
+    if pages > 1:
+        def fetch(page):
+            try:
+                return _get_json(page_url(page)).get('data') or []
+            except Exception as e:
+                print(f"⚠️ Validator page {page} failed: {e}", file=sys.stderr)
+                failed.append(page)
+                return []
+
+        with ThreadPoolExecutor(max_workers=max(1, VALIDATOR_CONCURRENCY)) as pool:
+            for rows in pool.map(fetch, range(2, pages + 1)):
+                items.extend(rows)
+
+    meta = {
+        'pages': pages,
+        'total_pages': total_pages,
+        'total_items': total_items,
+        'failed_pages': sorted(failed),
+        'complete': not failed and pages == total_pages,
+    }
+    print(f"✅ Fetched {len(items)} validators ({pages}/{total_pages} pages)", file=sys.stderr)
+    return items, meta
+
+
+def fetch_from_taostats(network: str, limit: int = 100) -> Tuple[List[Dict], str]:
+    """Fetch top validators from the legacy (non-dTao) endpoint in one request.
+
+    Returns tuple of (validators_list, error_message).
+    """
+    url = f"https://api.taostats.io/api/validator/latest/v1?network={network}&limit={limit}"
+    try:
+        j = _get_json(url)
+    except Exception as e:
+        return [], str(e)
+    # Taostats typically returns { "data": [...] }
+    items = j.get('data') if isinstance(j, dict) and 'data' in j else j
+    if not items or not isinstance(items, list):
+        return [], f'No data array in response from {url}'
+    print(f"✅ Fetched {len(items)} validators from {url}", file=sys.stderr)
+    return items, ''
+
+
+def _tao(value) -> float:
+    """TAO amount from an SDK Balance, a {netuid: Balance} dict or a number."""
+    if value is None:
+        return 0.0
+    if isinstance(value, dict):
+        return sum(_tao(v) for v in value.values())
+    if hasattr(value, 'tao'):
+        return float(value.tao)
+    return float(value)
+
+
+def fetch_from_chain(network: str) -> Tuple[List[Dict], str]:
+    """Fetch all delegates on-chain with the bittensor SDK.
+
+    `get_delegates()` is a single runtime API call returning every delegate,
+    so the whole set costs one batched query (plus one for subnet prices and
+    one for identities). Rows use the Taostats field names so they go through
+    the same normalize_validator() path.
+
+    Stake is the TAO value of the delegate's stake: root TAO plus alpha on
+    each subnet times its price (alpha only when prices are unavailable).
+    Returns tuple of (validators_list, error_message).
+    """
+    try:
+        import bittensor as bt
+    except Exception as e:
+        return [], f'bittensor import failed: {e}'
+
+    try:
+        subtensor = bt.Subtensor(network=network)
+        delegates = subtensor.get_delegates()
+    except Exception as e:
+        return [], f'get_delegates failed: {e}'
+
+    prices = {}
+    try:
+        prices = {int(k): _tao(v) for k, v in (subtensor.get_subnet_prices() or {}).items()}
+    except Exception as e:
+        print(f"⚠️ Subnet prices unavailable ({e}), using raw alpha stake", file=sys.stderr)
+
+    identities = {}
+    try:
+        fn = getattr(subtensor, 'get_delegate_identities', None)
+        identities = fn() if callable(fn) else {}
+    except Exception:
+        pass
+
+    items = []
+    for d in delegates:
+        take = float(getattr(d, 'take', 0) or 0)
+        take = take / 100 if take > 1 else take  # fraction (0.18); tolerate percent
+        # total_daily_return is the delegate's whole return, before take; nominators get the rest
+        daily_return = _tao(getattr(d, 'total_daily_return', None))
+        hotkey = getattr(d, 'hotkey_ss58', None)
+        total_stake = getattr(d, 'total_stake', None)
+        if isinstance(total_stake, dict):
+            stake = sum(_tao(b) * (1.0 if int(n) == 0 else prices.get(int(n), 1.0)) for n, b in total_stake.items())
+        else:
+            stake = _tao(total_stake)
+        identity = identities.get(hotkey) if isinstance(identities, dict) else None
+        items.append({
+            'hotkey': hotkey,
+            'coldkey': getattr(d, 'owner_ss58', None),
+            'name': getattr(identity, 'name', None) or (identity.get('name') if isinstance(identity, dict) else None),
+            'stake': stake,
+            'nominators': len(getattr(d, 'nominators', None) or []),
+            'take': take,
+            'active_subnets': len(getattr(d, 'validator_permits', None) or []),
+            'nominator_return_per_day': daily_return * (1 - take) if daily_return else None,
+        })
+
+    print(f"✅ Fetched {len(items)} delegates on-chain ({network})", file=sys.stderr)
+    return items, ''
+
+
+def _ss58(raw) -> Optional[str]:
+    """Hotkey/coldkey can be a string or an object with ss58."""
+    if isinstance(raw, dict):
+        return raw.get('ss58') or raw.get('hex')
+    return raw
+
+
+def _float_or_none(value) -> Optional[float]:
+    try:
+        return float(value) if value not in (None, '') else None
+    except (TypeError, ValueError):
+        return None
+
+
+def normalize_validator(v: Dict) -> Dict:
+    """Reduce one raw Taostats validator row to the snapshot columns."""
+    stake_raw = v.get('global_weighted_stake') or v.get('stake') or v.get('total_stake') or v.get('root_stake') or 0
+    return {
+        'hotkey': _ss58(v.get('hotkey') or v.get('address') or v.get('validator_hotkey')),
+        'coldkey': _ss58(v.get('coldkey') or v.get('owner')),
+        'name': v.get('name') or v.get('validator_name') or v.get('display_name'),
+        'stake_raw': float(stake_raw) if stake_raw else 0.0,
+        'nominators': int(v.get('global_nominators') or v.get('nominators') or v.get('nominator_count') or 0),
+        'active_subnets': int(v.get('active_subnets') or v.get('vpermit_count') or 0),
+        'take': float(v.get('take') or v.get('delegate_take') or 0),
+        'dominance': _float_or_none(v.get('dominance')),
+        'nominator_return_per_day': v.get('nominator_return_per_day'),
+        'validator_return_per_day': v.get('validator_return_per_day'),
+        'rank': v.get('rank'),
+    }
+
+
+def build_snapshot(validators: List[Dict], source: str = 'taostats', meta: Optional[Dict] = None) -> Dict:
+    """Columnar snapshot (one array per column) from raw validator rows, sorted by stake."""
+    rows = []
+    for v in validators:
+        try:
+            rows.append(normalize_validator(v))
+        except Exception as e:
+            print(f"⚠️ Error processing validator: {e}", file=sys.stderr)
+    # Pages can arrive in any order; dedupe by hotkey and rank by stake
+    unique = {}
+    for r in rows:
+        key = r['hotkey'] or id(r)
+        if key not in unique or r['stake_raw'] > unique[key]['stake_raw']:
+            unique[key] = r
+    rows = sorted(unique.values(), key=lambda r: r['stake_raw'], reverse=True)
+    snapshot = {'columns': SNAPSHOT_COLUMNS}
+    for col in SNAPSHOT_COLUMNS:
+        snapshot[col] = [r[col] for r in rows]
+    now_iso = datetime.now(timezone.utc).isoformat()
+    snapshot.update({
+        'count': len(rows),
+        'network': NETWORK,
+        'source': source,
+        # dTao reports global_weighted_stake in rao, the SDK in TAO;
+        # legacy rows are unit-ambiguous
+        'stake_unit': {'taostats': 'rao', 'chain': 'tao'}.get(source),
+        'complete': bool(meta.get('complete')) if meta else False,
+        'pages': meta.get('pages') if meta else None,
+        'generated_at': now_iso,
+        'last_updated': now_iso,
+    })
+    return snapshot
+
+
+def snapshot_rows(snapshot: Dict) -> List[Dict]:
+    """Row view (list of dicts) of a columnar snapshot."""
+    columns = snapshot.get('columns') or SNAPSHOT_COLUMNS
+    count = snapshot.get('count', len(snapshot.get(columns[0], [])))
+    return [{col: (snapshot.get(col) or [None] * count)[i] for col in columns} for i in range(count)]
+
+
+def fetch_validator_snapshot() -> Tuple[Optional[Dict], str]:
+    """Fetch the full validator set once and build the snapshot.
+
+    Sources in order: dTao pagination, legacy top 100 endpoint, on-chain SDK
+    (only the SDK with VALIDATOR_SOURCE=chain).
+    """
+    if VALIDATOR_SOURCE == 'chain':
+        validators, chain_error = fetch_from_chain(NETWORK)
+        if not validators:
+            return None, f"chain: {chain_error}"
+        return build_snapshot(validators, source='chain', meta={'complete': True}), ''
+    try:
+        validators, meta = fetch_all_validators()
+        if validators:
+            return build_snapshot(validators, meta=meta), ''
+        error_msg = 'No data array in dTao validator response'
+    except Exception as e:
+        error_msg = str(e)
+    print(f"⚠️ dTao validator pagination failed ({error_msg}), trying legacy endpoint", file=sys.stderr)
+    validators, legacy_error = fetch_from_taostats(NETWORK, limit=100)
+    if validators:
+        return build_snapshot(validators, source='taostats_legacy'), ''
+    print(f"⚠️ Legacy endpoint failed ({legacy_error}), falling back to on-chain delegates", file=sys.stderr)
+    validators, chain_error = fetch_from_chain(NETWORK)
+    if not validators:
+        return None, f"taostats: {legacy_error or error_msg}; chain: {chain_error}"
+    return build_snapshot(validators, source='chain', meta={'complete': True}), ''
+
+
+def save_validator_snapshot(snapshot: Dict, path: str = SNAPSHOT_PATH) -> None:
+    """Persist the snapshot locally and (if configured) to KV."""
+    data = json.dumps(snapshot, separators=(',', ':')).encode('utf-8')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+    print(f"💾 Validator snapshot: {snapshot['count']} validators, {len(data):,} bytes -> {path}", file=sys.stderr)
+    cf_acc, cf_token, cf_ns = _kv_config()
+    if cf_acc and cf_token and cf_ns:
+        put_to_kv(cf_acc, cf_token, cf_ns, SNAPSHOT_KV_KEY, data)
+
+
+def _is_fresh(snapshot: Optional[Dict], max_age_minutes: int) -> bool:
+    if not snapshot or not snapshot.get('count'):
+        return False
+    try:
+        ts = datetime.fromisoformat(snapshot.get('generated_at'))
+    except (TypeError, ValueError):
+        return False
+    return datetime.now(timezone.utc) - ts < timedelta(minutes=max_age_minutes)
+
+
+def load_validator_snapshot(path: str = SNAPSHOT_PATH) -> Optional[Dict]:
+    """Load the persisted snapshot (local file first, then KV)."""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"⚠️ Failed to read {path}: {e}", file=sys.stderr)
+    cf_acc, cf_token, cf_ns = _kv_config()
+    if cf_acc and cf_token and cf_ns:
+        return get_from_kv(cf_acc, cf_token, cf_ns, SNAPSHOT_KV_KEY)
+    return None
+
+
+def get_validator_snapshot(max_age_minutes: int = VALIDATOR_SNAPSHOT_MAX_AGE_MINUTES) -> Tuple[Optional[Dict], str]:
+    """Reuse a fresh persisted snapshot, otherwise fetch and persist a new one."""
+    snapshot = load_validator_snapshot()
+    if _is_fresh(snapshot, max_age_minutes):
+        print(f"♻️  Reusing validator snapshot from {snapshot['generated_at']} ({snapshot['count']} validators)", file=sys.stderr)
+        return snapshot, ''
+    snapshot, error_msg = fetch_validator_snapshot()
+    if snapshot:
+        save_validator_snapshot(snapshot)
+    return snapshot, error_msg
+
+
+def benchmark_sources() -> Dict:
+    """Fetch the validator set from Taostats and on-chain and compare latency / agreement."""
+    report = {'network': NETWORK}
+    snapshots = {}
+    for source, fetch in (('taostats', lambda: fetch_all_validators()[0]),
+                          ('chain', lambda: fetch_from_chain(NETWORK)[0])):
+        t0 = time.perf_counter()
+        try:
+            rows = fetch()
+        except Exception as e:
+            print(f"⚠️ {source} benchmark failed: {e}", file=sys.stderr)
+            rows = []
+        elapsed = time.perf_counter() - t0
+        snapshot = build_snapshot(rows, source=source, meta={'complete': True}) if rows else None
+        snapshots[source] = snapshot
+        scale = 1e9 if source == 'taostats' else 1.0
+        report[source] = {
+            'latency_s': round(elapsed, 2),
+            'validators': snapshot['count'] if snapshot else 0,
+            'total_stake': round(sum(snapshot['stake_raw']) / scale, 2) if snapshot else None,
+        }
+    if all(snapshots.values()):
+        top_a = set(snapshots['taostats']['hotkey'][:10])
+        top_b = set(snapshots['chain']['hotkey'][:10])
+        report['top10_overlap'] = len(top_a & top_b)
+    return report
+
+
+def main():
+    if '--benchmark' in sys.argv[1:]:
+        print(json.dumps(benchmark_sources(), indent=2))
+        return
+
+    from fetch_top_validators import build_top_validators, publish_top_validators
+    from fetch_staking_apy import calculate_staking_apy, publish_apy_history
+
+    snapshot, error_msg = fetch_validator_snapshot()
+    if snapshot:
+        save_validator_snapshot(snapshot)
+    else:
+        print(f"⚠️ Could not fetch validators: {error_msg}", file=sys.stderr)
+        if importlib.util.find_spec('bittensor') is None:
+            print("⚠️ bittensor not installed; install it and rerun with VALIDATOR_SOURCE=chain", file=sys.stderr)
+            sys.exit(CHAIN_FALLBACK_EXIT)
+
+    # 1) top_validators (+ full stake vector for decentralization)
+    publish_top_validators(build_top_validators(snapshot, error_msg))
+
+    # 2) staking_apy from the same snapshot
+    apy = calculate_staking_apy(snapshot) if snapshot else None
+    if not apy:
+        print("❌ Failed to derive staking APY from snapshot", file=sys.stderr)
+        sys.exit(1)
+    with open('staking_apy.json', 'w') as f:
+        json.dump(apy, f, indent=2)
+    print(f"✅ Staking APY ({apy['avg_apr']}% weighted) written to staking_apy.json", file=sys.stderr)
+    cf_acc, cf_token, cf_ns = _kv_config()
+    if cf_acc and cf_token and cf_ns:
+        put_to_kv(cf_acc, cf_token, cf_ns, 'staking_apy', json.dumps(apy).encode('utf-8'))
+    publish_apy_history(apy)
+
+
+if __name__ == '__main__':
+    main()
@@ -54,6 +54,16 @@ export async function onRequest(context) {
       const days = Math.min(parseInt(url.searchParams.get('days') || '7', 10), 30);
       const limit = parseInt(url.searchParams.get('limit') || '0', 10);
 
+      // Pre-downsampled (LTTB) variant: ?points=200|500|1000 for days=7|30
+      // (published by .github/scripts/downsample_series.py; falls through to raw history if missing)
+      const points = parseInt(url.searchParams.get('points') || '0', 10);
+      if ([200, 500, 1000].includes(points) && [7, 30].includes(days)) {
+        const variant = await KV.get(`issuance_history_lttb_${days}d_${points}`);
+        if (variant) {
+          return new Response(variant, { status: 200, headers: { ...cors, 'X-Downsampled': `lttb-${points}` } });
+        }
+      }
+
       // Try to load chunked data first
       const chunkKeys = getChunkKeys(days);
       const chunks = await Promise.all(chunkKeys.map(k => KV.get(k)));
@@ -21,7 +21,13 @@ export async function onRequest(context) {
     const url = new URL(context.request.url);
     const range = url.searchParams.get('range') || '7';
     
-    const raw = await KV.get('price_history');
+    // ?points=200|500|1000 reads the LTTB-downsampled copy (downsample_series.py), raw otherwise
+    const points = parseInt(url.searchParams.get('points') || '0', 10);
+    let raw = null;
+    if ([200, 500, 1000].includes(points)) {
+      raw = await KV.get(`price_history_lttb_${points}`);
+    }
+    if (!raw) raw = await KV.get('price_history');
     if (!raw) {
       return new Response(JSON.stringify({ 
         error: 'No price history found', 
@@ -54,8 +60,11 @@ export async function onRequest(context) {
     }
     
     // Return in CoinGecko-compatible format: { prices: [[ts, price], ...] }
+    // UTC-aligned OHLCV candles for the same range: [[t_ms, open, high, low, close, volume], ...]
     return new Response(JSON.stringify({
       prices: rangeData,
+      ohlcv: data.ohlcv?.[range] || null,
+      ohlcv_interval: data.ohlcv_interval?.[range] || null,
       _source: 'taostats',
       _timestamp: data._timestamp,
       range: range
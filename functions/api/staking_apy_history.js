@@ -0,0 +1,45 @@
+/**
+ * Staking APY History API
+ * Returns the daily stake-weighted APR series (columnar: date, avg_apr, median_apr, p25_apr, p75_apr, validators).
+ */
+export async function onRequest(context) {
+  const cors = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Methods': 'GET, OPTIONS',
+    'Access-Control-Allow-Headers': '*',
+    'Content-Type': 'application/json; charset=utf-8',
+    'Cache-Control': 'public, max-age=300, s-maxage=600'
+  };
+
+  if (context.request.method === 'OPTIONS') {
+    return new Response(null, { status: 204, headers: cors });
+  }
+
+  const KV = context.env?.METRICS_KV;
+  if (!KV) {
+    return new Response(JSON.stringify({ error: 'KV not bound' }), { status: 500, headers: cors });
+  }
+
+  try {
+    const raw = await KV.get('staking_apy_history');
+    if (!raw) {
+      return new Response(JSON.stringify({ 
+        error: 'No staking APY history found', 
+        _source: 'staking_apy_history', 
+        _status: 'empty' 
+      }), {
+        status: 404,
+        headers: cors
+      });
+    }
+    return new Response(raw, { status: 200, headers: cors });
+  } catch (e) {
+    return new Response(JSON.stringify({ 
+      error: 'Failed to fetch staking APY history', 
+      details: e.message 
+    }), {
+      status: 500,
+      headers: cors
+    });
+  }
+}
@@ -19,6 +19,40 @@ function getChunkKeys(days = 7) {
   return keys;
 }
 
+// Daily chunks older than this are compacted into monthly hourly rollups
+// (taostats_history_rollup_YYYY-MM) by .github/scripts/taostats_history_store.py
+const CHUNK_RETENTION_DAYS = 35;
+
+// Helper: Rollup keys (YYYY-MM) covering the last N days
+function getRollupKeys(days) {
+  const keys = [];
+  const now = new Date();
+  const start = new Date(now);
+  start.setUTCDate(start.getUTCDate() - days + 1);
+  const d = new Date(Date.UTC(start.getUTCFullYear(), start.getUTCMonth(), 1));
+  while (d <= now) {
+    keys.push(`taostats_history_rollup_${d.getUTCFullYear()}-${String(d.getUTCMonth() + 1).padStart(2, '0')}`);
+    d.setUTCMonth(d.getUTCMonth() + 1);
+  }
+  return keys;
+}
+
+// Helper: Expand a columnar hourly rollup into history entries
+function parseRollup(raw) {
+  if (!raw) return [];
+  try {
+    const r = JSON.parse(raw);
+    if (!r || !Array.isArray(r.t)) return [];
+    return r.t.map((t, i) => ({
+      _timestamp: new Date(t * 1000).toISOString(),
+      price: r.close[i],
+      volume_24h: r.volume[i],
+      _resolution: r.resolution || '1h'
+    }));
+  } catch (e) { /* ignore */ }
+  return [];
+}
+
 // Helper: Parse KV value to array
 function parseHistory(raw) {
   if (!raw) return [];
@@ -51,11 +85,21 @@ export async function onRequest(context) {
   try {
     if (context.request.method === 'GET') {
       const url = new URL(context.request.url);
-      const days = Math.min(parseInt(url.searchParams.get('days') || '7', 10), 30);
+      const days = Math.min(parseInt(url.searchParams.get('days') || '7', 10), 365);
       const limit = parseInt(url.searchParams.get('limit') || '0', 10);
 
+      // Pre-downsampled (LTTB) variant: ?points=200|500|1000 for days=7|30
+      // (published by .github/scripts/downsample_series.py; falls through to raw history if missing)
+      const points = parseInt(url.searchParams.get('points') || '0', 10);
+      if ([200, 500, 1000].includes(points) && [7, 30].includes(days)) {
+        const variant = await KV.get(`taostats_history_lttb_${days}d_${points}`);
+        if (variant) {
+          return new Response(variant, { status: 200, headers: { ...cors, 'X-Downsampled': `lttb-${points}` } });
+        }
+      }
+
       // Try to load chunked data first
-      const chunkKeys = getChunkKeys(days);
+      const chunkKeys = getChunkKeys(Math.min(days, CHUNK_RETENTION_DAYS));
       const chunks = await Promise.all(chunkKeys.map(k => KV.get(k)));
 
       let combined = [];
@@ -68,6 +112,19 @@ export async function onRequest(context) {
         }
       }
 
+      // Older ranges come from the monthly hourly rollups
+      if (days > CHUNK_RETENTION_DAYS) {
+        const rollups = await Promise.all(getRollupKeys(days).map(k => KV.get(k)));
+        const cutoff = Date.now() - days * 86400000;
+        for (const raw of rollups) {
+          const entries = parseRollup(raw).filter(e => new Date(e._timestamp).getTime() >= cutoff);
+          if (entries.length) {
+            usedChunks = true;
+            combined = combined.concat(entries);
+          }
+        }
+      }
+
       // Fallback to legacy single key if no chunks found
       if (!usedChunks) {
         const legacyRaw = await KV.get('taostats_history');
@@ -155,23 +212,26 @@ export async function onRequest(context) {
       // Write to today's chunk
       await KV.put(todayKey, JSON.stringify(current));
 
-      // Also write to legacy key for backward compatibility (parallel operation)
-      try {
-        const legacyRaw = await KV.get('taostats_history');
-        let legacy = parseHistory(legacyRaw);
-        const legacySeen = new Set(legacy.map(e => e?._timestamp || JSON.stringify(e)));
-        for (const e of newEntries) {
-          const k = e?._timestamp || JSON.stringify(e);
-          if (legacySeen.has(k)) continue;
-          legacy.push(e);
+      // Legacy single-key history is a full read/rewrite per append; only kept
+      // up to date when explicitly enabled (LEGACY_HISTORY_WRITE=true)
+      if (context.env?.LEGACY_HISTORY_WRITE === 'true') {
+        try {
+          const legacyRaw = await KV.get('taostats_history');
+          let legacy = parseHistory(legacyRaw);
+          const legacySeen = new Set(legacy.map(e => e?._timestamp || JSON.stringify(e)));
+          for (const e of newEntries) {
+            const k = e?._timestamp || JSON.stringify(e);
+            if (legacySeen.has(k)) continue;
+            legacy.push(e);
+          }
+          legacy.sort((a, b) => new Date(a._timestamp || 0) - new Date(b._timestamp || 0));
+          const maxLegacy = parseInt(context.env?.HISTORY_MAX_ENTRIES || '10000', 10);
+          if (legacy.length > maxLegacy) legacy = legacy.slice(-maxLegacy);
+          await KV.put('taostats_history', JSON.stringify(legacy));
+        } catch (e) {
+          // Legacy write failed, but chunk succeeded - continue
+          console.error('Legacy KV write failed:', e.message);
         }
-        legacy.sort((a, b) => new Date(a._timestamp || 0) - new Date(b._timestamp || 0));
-        const maxLegacy = parseInt(context.env?.HISTORY_MAX_ENTRIES || '10000', 10);
-        if (legacy.length > maxLegacy) legacy = legacy.slice(-maxLegacy);
-        await KV.put('taostats_history', JSON.stringify(legacy));
-      } catch (e) {
-        // Legacy write failed, but chunk succeeded - continue
-        console.error('Legacy KV write failed:', e.message);
       }
 
       return new Response(JSON.stringify({
@@ -0,0 +1,78 @@
+/**
+ * Taostats Series API
+ * Returns a pre-aggregated price/volume series (columnar: t, open, high, low, close, volume, n)
+ * at a resolution picked from the requested range, so a chart always reads at most ~720 points.
+ *
+ *   ?range=1d|7d|30d|90d|1y (default 7d)  or  ?resolution=5m|1h|4h|1d
+ */
+const RESOLUTIONS = ['5m', '1h', '4h', '1d'];
+
+// Range (days) -> finest resolution whose series covers it
+function resolutionForDays(days) {
+  if (days <= 2) return '5m';
+  if (days <= 30) return '1h';
+  if (days <= 90) return '4h';
+  return '1d';
+}
+
+function parseRangeDays(range) {
+  const m = /^(\d+)([dy])$/.exec(range || '7d');
+  if (!m) return 7;
+  return parseInt(m[1], 10) * (m[2] === 'y' ? 365 : 1);
+}
+
+export async function onRequest(context) {
+  const cors = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Methods': 'GET, OPTIONS',
+    'Access-Control-Allow-Headers': '*',
+    'Content-Type': 'application/json; charset=utf-8',
+    'Cache-Control': 'public, max-age=60, s-maxage=120'
+  };
+
+  if (context.request.method === 'OPTIONS') {
+    return new Response(null, { status: 204, headers: cors });
+  }
+
+  const KV = context.env?.METRICS_KV;
+  if (!KV) {
+    return new Response(JSON.stringify({ error: 'KV not bound' }), { status: 500, headers: cors });
+  }
+
+  try {
+    const url = new URL(context.request.url);
+    const days = parseRangeDays(url.searchParams.get('range'));
+    const requested = url.searchParams.get('resolution');
+    const resolution = RESOLUTIONS.includes(requested) ? requested : resolutionForDays(days);
+
+    const series = await KV.get(`taostats_series_${resolution}`, { type: 'json' });
+    if (!series || !Array.isArray(series.t)) {
+      return new Response(JSON.stringify({
+        error: 'No taostats series found',
+        _source: 'taostats_series',
+        _status: 'empty'
+      }), { status: 404, headers: cors });
+    }
+
+    // Trim to the requested range (only when the range picked the resolution)
+    if (!requested) {
+      const cutoff = Date.now() / 1000 - days * 86400;
+      let start = 0;
+      while (start < series.t.length && series.t[start] < cutoff) start++;
+      if (start > 0) {
+        for (const col of series.columns) series[col] = series[col].slice(start);
+        series.count = series.t.length;
+      }
+    }
+
+    return new Response(JSON.stringify(series), { status: 200, headers: cors });
+  } catch (e) {
+    return new Response(JSON.stringify({
+      error: 'Failed to fetch taostats series',
+      details: e.message
+    }), {
+      status: 500,
+      headers: cors
+    });
+  }
+}
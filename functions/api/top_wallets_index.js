@@ -0,0 +1,65 @@
+/**
+ * Top Wallets Index API
+ * Returns a page of the ranked holder index (columnar arrays, row i = rank offset + i + 1).
+ *
+ * Query params:
+ *   ?offset=N   - First row to return (default: 0)
+ *   ?limit=N    - Rows per page (default: 100, max: 1000)
+ */
+export async function onRequest(context) {
+  const cors = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Methods': 'GET, OPTIONS',
+    'Access-Control-Allow-Headers': '*',
+    'Content-Type': 'application/json; charset=utf-8',
+    'Cache-Control': 'public, max-age=600, s-maxage=1800'
+  };
+
+  if (context.request.method === 'OPTIONS') {
+    return new Response(null, { status: 204, headers: cors });
+  }
+
+  if (context.request.method !== 'GET') {
+    return new Response(JSON.stringify({ error: 'Method not allowed' }), { status: 405, headers: cors });
+  }
+
+  const KV = context.env?.METRICS_KV;
+  if (!KV) {
+    return new Response(JSON.stringify({ error: 'KV not bound' }), { status: 500, headers: cors });
+  }
+
+  try {
+    const index = await KV.get('top_wallets_index', { type: 'json' });
+    if (!index) {
+      return new Response(JSON.stringify({
+        error: 'No top wallets index found',
+        _source: 'taostats',
+        _status: 'empty'
+      }), {
+        status: 404,
+        headers: cors
+      });
+    }
+
+    const url = new URL(context.request.url);
+    const offset = Math.max(0, parseInt(url.searchParams.get('offset') || '0', 10) || 0);
+    const limit = Math.min(1000, Math.max(1, parseInt(url.searchParams.get('limit') || '100', 10) || 100));
+
+    const columns = Array.isArray(index.columns) ? index.columns : [];
+    const page = { ...index, offset, limit };
+    for (const col of columns) {
+      page[col] = Array.isArray(index[col]) ? index[col].slice(offset, offset + limit) : [];
+    }
+    page.returned = columns.length ? page[columns[0]].length : 0;
+
+    return new Response(JSON.stringify(page), { status: 200, headers: cors });
+  } catch (e) {
+    return new Response(JSON.stringify({
+      error: 'Failed to fetch top wallets index',
+      details: e.message
+    }), {
+      status: 500,
+      headers: cors
+    });
+  }
+}
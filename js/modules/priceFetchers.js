@@ -94,14 +94,15 @@ export async function fetchTaoPrice() {
  * @param {string} range - Time range ('1', '3', '7', '30', '60', '90', 'max')
  * @param {Object} options - Options
  * @param {boolean} options.needsOHLCV - Whether OHLCV data is needed (candlestick/volume mode)
+ * @param {boolean} options.needsVolume - Whether volume bars are needed (volume mode)
  * @returns {Promise<{prices: Array, ohlcv: Array|null, volume: Array|null, source: string}|null>}
  */
 export async function fetchPriceHistory(range = '7', options = {}) {
-  const { needsOHLCV = false } = options;
+  const { needsOHLCV = false, needsVolume = false } = options;
   const key = normalizeRange(range);
 
   // Use different cache key for OHLCV mode
-  const cacheKey = needsOHLCV ? `${key}_ohlcv` : key;
+  const cacheKey = needsOHLCV ? `${key}_ohlcv${needsVolume ? '_vol' : ''}` : key;
 
   const cached = getCachedPrice?.(cacheKey);
   if (cached) return cached;
@@ -110,16 +111,23 @@ export async function fetchPriceHistory(range = '7', options = {}) {
   const days = isMax ? 1000 : parseInt(key, 10);
 
   // Try Taostats first (preferred source, skip for max)
-  // Skip Taostats if we need OHLCV data (candle/volume mode)
-  if (!isMax && !needsOHLCV) {
+  // Candle/volume mode uses the pre-resampled Taostats candles when present
+  if (!isMax) {
     try {
-      const taostatsEndpoint = `${API_BASE}/price_history?range=${key}`;
+      const taostatsEndpoint = `${API_BASE}/price_history?range=${key}&points=500`;
       const res = await fetch(taostatsEndpoint, { cache: 'no-store' });
       if (res.ok) {
         const data = await res.json();
-        if (data?.prices?.length) {
+        const candles = data?.ohlcv?.length ? data.ohlcv : null;
+        const hasVolume = !!candles && candles.some(k => k[5] != null);
+        if (data?.prices?.length && (!needsOHLCV || candles) && (!needsVolume || hasVolume)) {
           if (window._debug) console.debug(`Price history from Taostats (${key}d):`, data.prices.length, 'points');
-          const result = { prices: data.prices, ohlcv: null, volume: null, source: 'taostats' };
+          // Candle rows: [t_ms, open, high, low, close, volume]
+          const ohlcv = candles ? candles.map(k => ({ x: k[0], o: k[1], h: k[2], l: k[3], c: k[4] })) : null;
+          const volume = hasVolume
+            ? candles.map(k => ({ x: k[0], y: k[5] ?? 0 }))
+            : null;
+          const result = { prices: data.prices, ohlcv, volume, source: 'taostats' };
           setCachedPrice?.(cacheKey, result);
           return result;
         }
@@ -102,7 +102,7 @@ let showVolume = localStorage.getItem('showVolume') === 'true';
 
 // Wrapper: fetchPriceHistory with current OHLCV mode
 async function fetchPriceHistory(range = '7') {
-  return _fetchPriceHistory(range, { needsOHLCV: showCandleChart || showVolume });
+  return _fetchPriceHistory(range, { needsOHLCV: showCandleChart || showVolume, needsVolume: showVolume });
 }
 
 // Wrapper: fetchEurUsdRate that syncs local eurUsdRate
@@ -5,6 +5,7 @@ import * as issuance from './functions/api/issuance_history.js';
 import * as topSubnets from './functions/api/top_subnets.js';
 import * as taostats from './functions/api/taostats.js';
 import * as taostatsHistory from './functions/api/taostats_history.js';
+import * as taostatsSeries from './functions/api/taostats_series.js';
 import * as fearAndGreed from './functions/api/fear_and_greed_index.js';
 
 export default {
@@ -42,6 +43,11 @@ export default {
       if (typeof taostatsHistory.onRequest === 'function') return taostatsHistory.onRequest(context);
     }
 
+    // Taostats multi-resolution series endpoint
+    if (url.pathname === '/api/taostats_series' || url.pathname.startsWith('/api/taostats_series')) {
+      if (typeof taostatsSeries.onRequest === 'function') return taostatsSeries.onRequest(context);
+    }
+
     // Taostats latest endpoint
     if (url.pathname === '/api/taostats' || url.pathname.startsWith('/api/taostats')) {
       if (typeof taostats.onRequest === 'function') return taostats.onRequest(context);